@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+列式视图基准测试 - 100 万条合成记录
+
+对比逐条遍历 dict/Record 与 ColumnarView 向量化计算的耗时：
+- 今日提交数、AI 使用率、最活跃班级、AI 评语平均长度（/stats）
+- 按班级 + 日期筛选（/export）
+- AI 耗时 p50/p90/p99
+
+用法:
+    python benchmarks/bench_analytics.py [--records 1000000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classroom_mvp.record import Record  # noqa: E402
+from classroom_mvp.analytics import ColumnarView  # noqa: E402
+
+
+def make_records(n, seed=42):
+    """生成 n 条合成记录（40 个班级、2000 名学生、一年内均匀分布）"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    records = []
+    for i in range(n):
+        ai = rng.random() < 0.7
+        created = start + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        uid = f"{i:08x}"
+        records.append(Record(
+            id=uid,
+            class_name=f"班级{rng.randrange(40)}",
+            student=f"学生{rng.randrange(2000)}",
+            comment="写得很好笔顺正确",
+            ai_generated=ai,
+            ai_requested=ai or rng.random() < 0.05,
+            comment_length=rng.randrange(20, 120),
+            collage_url=f"/c_{uid}.jpg",
+            created_at=created.isoformat(),
+            ai_model="qwen-vl-max" if ai else None,
+            generation_time_ms=int(rng.lognormvariate(7.5, 0.4)) if ai else None,
+        ))
+    return records
+
+
+def timed(label, func, repeat=3):
+    """运行 repeat 次取最快一次，打印毫秒数"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    print(f"  {label:<28} {best * 1000:10.1f} ms")
+    return result
+
+
+def loop_stats(records, today):
+    today_count = sum(1 for r in records if r.get("created_at", "").startswith(today))
+    ai_records = [r for r in records if r.get("ai_generated")]
+    class_counts = {}
+    for r in records:
+        class_counts[r.get("class", "")] = class_counts.get(r.get("class", ""), 0) + 1
+    return (
+        today_count,
+        round(len(ai_records) / len(records) * 100, 1),
+        max(class_counts.items(), key=lambda x: x[1]),
+        round(sum(r.get("comment_length", 0) for r in ai_records) / len(ai_records), 1),
+    )
+
+
+def view_stats(view, today):
+    return (
+        int(view.mask(date_str=today).sum()),
+        view.ai_usage_rate(),
+        view.most_active_class(),
+        view.avg_ai_comment_length(),
+    )
+
+
+def loop_percentiles(records):
+    values = sorted(r.get("generation_time_ms") for r in records if r.get("generation_time_ms"))
+    return {q: values[min(int(q / 100 * len(values)), len(values) - 1)] for q in (50, 90, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列式视图基准测试")
+    parser.add_argument("--records", type=int, default=1_000_000, help="合成记录数")
+    args = parser.parse_args()
+
+    print(f"生成 {args.records} 条合成记录...")
+    records = make_records(args.records)
+    today, class_name = "2025-06-15", "班级7"
+
+    print("构建列式视图:")
+    view = timed("ColumnarView.build", lambda: ColumnarView.build(records), repeat=1)
+
+    print("/stats 汇总:")
+    expected = timed("逐条遍历", lambda: loop_stats(records, today))
+    actual = timed("列式视图", lambda: view_stats(view, today))
+    assert expected == actual, (expected, actual)
+
+    print("/export 按班级 + 日期筛选:")
+    expected = timed("逐条遍历", lambda: [
+        r for r in records if r.get("class") == class_name and r.get("created_at", "").startswith(today)
+    ])
+    actual = timed("列式视图", lambda: view.select(view.mask(class_name, today)))
+    assert [r.id for r in expected] == [r.id for r in actual]
+
+    print("/export 按班级 + 月份筛选:")
+    timed("逐条遍历", lambda: [
+        r for r in records if r.get("class") == class_name and r.get("created_at", "").startswith(today[:7])
+    ])
+    timed("列式视图", lambda: view.select(view.mask(class_name, today[:7])))
+
+    print("AI 耗时分位数:")
+    timed("逐条遍历（排序）", lambda: loop_percentiles(records))
+    timed("列式视图", lambda: view.latency_percentiles())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准 - 用 python -X importtime 测量应用模块的冷启动导入耗时
+
+每轮启动一个新的解释器导入目标模块（可选再调用 create_app()），取多轮中位数；
+列出由本项目模块直接导入、累计耗时最多的依赖，便于发现新加的顶层重依赖。
+中位数超过 --budget-ms 时退出码为 1，可放进部署前检查防止 worker 启动变慢。
+
+用法:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --create-app --repeat 7 --top 15
+    python benchmarks/import_time.py --module classroom_mvp.asgi --budget-ms 800
+    python benchmarks/import_time.py --json benchmarks/results/import_time.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_PACKAGE = "classroom_mvp"
+
+# 在临时工作目录中运行，create_app() 创建的上传目录等不落在仓库里
+SNIPPET = """
+import time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+if {create_app}:
+    target.create_app()
+print((imported - started) * 1000, (time.perf_counter() - imported) * 1000)
+"""
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出
+
+    Returns:
+        [(模块名, 父模块名或 None, 自身微秒, 累计微秒)]；子模块先于父模块输出，按缩进还原父子关系
+    """
+    entries, pending = [], {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        self_us, cumulative_us, raw = int(fields[0]), int(fields[1]), fields[2]
+        # 模块名前有一个分隔空格，之后每层嵌套两个空格
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        name = raw.strip()
+        index = len(entries)
+        entries.append([name, None, self_us, cumulative_us])
+        for child in pending.pop(depth + 1, []):
+            entries[child][1] = name
+        pending.setdefault(depth, []).append(index)
+    return [tuple(entry) for entry in entries]
+
+
+def run_once(module, create_app):
+    """在新解释器中导入一次，返回 (导入毫秒, create_app 毫秒, importtime 条目)"""
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SNIPPET.format(module=module, create_app=create_app)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=False,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    import_ms, create_ms = (float(v) for v in result.stdout.split()[-2:])
+    return import_ms, create_ms, parse_importtime(result.stderr)
+
+
+def heaviest_dependencies(entries, top):
+    """由本项目模块直接导入的外部依赖，按累计耗时排序"""
+    deps = [
+        (cumulative / 1000, name, parent)
+        for name, parent, _, cumulative in entries
+        if parent and parent.startswith(PROJECT_PACKAGE) and not name.startswith(PROJECT_PACKAGE)
+    ]
+    return sorted(deps, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用模块冷启动导入耗时")
+    parser.add_argument("--module", default="classroom_mvp.app", help="要导入的模块")
+    parser.add_argument("--create-app", action="store_true", help="导入后再调用 create_app()")
+    parser.add_argument("--repeat", type=int, default=5, help="测量轮数（另有一轮预热生成字节码缓存）")
+    parser.add_argument("--budget-ms", type=float, default=400, help="导入耗时中位数预算（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="列出的依赖数")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    run_once(args.module, args.create_app)  # 预热：生成 __pycache__，与部署后的 worker 启动一致
+    runs = [run_once(args.module, args.create_app) for _ in range(args.repeat)]
+    import_times = [r[0] for r in runs]
+    median_ms = statistics.median(import_times)
+    create_ms = statistics.median(r[1] for r in runs) if args.create_app else None
+    # 明细取导入耗时最接近中位数的一轮
+    _, _, entries = min(runs, key=lambda r: abs(r[0] - median_ms))
+    heaviest = heaviest_dependencies(entries, args.top)
+
+    ok = median_ms <= args.budget_ms
+    print(f"{args.module} 导入耗时: 中位数 {median_ms:.0f}ms"
+          f"（{args.repeat} 轮: {', '.join(f'{t:.0f}' for t in import_times)}）")
+    if create_ms is not None:
+        print(f"create_app(): 中位数 {create_ms:.1f}ms")
+    print("\n本项目模块直接导入、累计耗时最多的依赖:")
+    for ms, name, parent in heaviest:
+        print(f"  {ms:8.1f}ms  {name:<28} ← {parent}")
+    print(f"\n{'✅' if ok else '❌'} 预算 {args.budget_ms:.0f}ms")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "module": args.module,
+                "python": sys.version.split()[0],
+                "budget_ms": args.budget_ms,
+                "median_ms": round(median_ms, 1),
+                "runs_ms": [round(t, 1) for t in import_times],
+                "create_app_ms": round(create_ms, 1) if create_ms is not None else None,
+                "heaviest": [{"module": n, "imported_by": p, "ms": round(ms, 1)} for ms, n, p in heaviest],
+            }, f, ensure_ascii=False, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
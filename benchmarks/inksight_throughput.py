@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+InkSight 推理吞吐基准 - 逐张推理 vs 动态微批推理 vs 预取流水线 vs 特征缓存
+
+对比：
+- sequential: InkSightExtractor.extract_digital_ink 逐张处理
+- batch=N: 用 --concurrency 个线程同时提交图像（模拟并发的分析请求），InkSightBatchServer 合并成最多 N 张的批次
+- pipeline=N: iter_extract 批量处理（--workers 个线程预取、解码、预处理，模型每批 N 张）
+- cached: 特征缓存已有这些图像时重跑 iter_extract（只哈希文件、查表）
+前几种模式不使用特征缓存；cached 使用临时目录中的缓存，不影响 utils/.inksight_cache。
+报告吞吐（张/秒）、平均批大小和单个请求延迟。需要安装 torch 和 transformers。
+
+用法:
+    python benchmarks/inksight_throughput.py                         # 64 张合成图像
+    python benchmarks/inksight_throughput.py --images uploads --count 128 --batch-sizes 1,4,8,16 --workers 8
+    python benchmarks/inksight_throughput.py --max-wait-ms 20 --json benchmarks/results/inksight_throughput.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from utils.inksight_wrapper import InkSightExtractor  # noqa: E402
+from utils.inksight_batcher import InkSightBatchServer  # noqa: E402
+from utils.inksight_cache import FeatureCache  # noqa: E402
+
+
+def make_images(folder, count, seed=42):
+    """生成 count 张白底随机笔画的合成图像"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (640, 480), "white")
+        draw = ImageDraw.Draw(img)
+        for _ in range(rng.randint(5, 20)):
+            points = [(rng.randint(0, 639), rng.randint(0, 479)) for _ in range(3)]
+            draw.line(points, fill="black", width=rng.randint(4, 14))
+        path = os.path.join(folder, f"ink_{i:04d}.jpg")
+        img.save(path, quality=85)
+        paths.append(path)
+    return paths
+
+
+def list_images(folder, count):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    paths = [os.path.join(folder, n) for n in names]
+    if not paths:
+        raise SystemExit(f"目录中没有图像: {folder}")
+    # 图像不足 count 张时循环使用
+    return [paths[i % len(paths)] for i in range(count)]
+
+
+def summarize(name, results, seconds):
+    latencies = sorted(r["processing_time_ms"] for r in results)
+    ok = sum(1 for r in results if r["success"])
+    return {
+        "mode": name,
+        "images": len(results),
+        "ok": ok,
+        "seconds": round(seconds, 3),
+        "images_per_second": round(len(results) / seconds, 2),
+        "avg_batch_size": round(statistics.mean(r.get("batch_size", 1) for r in results), 2),
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1),
+    }
+
+
+def run_sequential(extractor, paths):
+    started = time.perf_counter()
+    results = [extractor.extract_digital_ink(p) for p in paths]
+    return summarize("sequential", results, time.perf_counter() - started)
+
+
+def run_batched(extractor, paths, batch_size, max_wait_ms, concurrency):
+    server = InkSightBatchServer(extractor, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    server.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(server.extract_digital_ink, paths))
+    seconds = time.perf_counter() - started
+    server.stop()
+    summary = summarize(f"batch={batch_size}", results, seconds)
+    summary["compute_images_per_second"] = server.stats()["images_per_second"]
+    return summary
+
+
+def run_pipeline(extractor, paths, batch_size, workers):
+    started = time.perf_counter()
+    results = list(extractor.iter_extract(paths, batch_size=batch_size, workers=workers))
+    return summarize(f"pipeline={batch_size}", results, time.perf_counter() - started)
+
+
+def run_cached(extractor, paths, batch_size, workers, cache_root):
+    extractor.feature_cache = FeatureCache(extractor.model_version, root=cache_root)
+    try:
+        list(extractor.iter_extract(paths, batch_size=batch_size, workers=workers))  # 写入缓存
+        started = time.perf_counter()
+        results = list(extractor.iter_extract(paths, batch_size=batch_size, workers=workers))
+        return summarize("cached", results, time.perf_counter() - started)
+    finally:
+        extractor.feature_cache = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="InkSight 逐张推理、微批推理与预取流水线吞吐对比")
+    parser.add_argument("--images", help="图像目录（默认生成合成图像）")
+    parser.add_argument("--count", type=int, default=64, help="每种模式处理的图像数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发提交线程数")
+    parser.add_argument("--batch-sizes", default="1,4,8,16", help="要测试的 max_batch_size，逗号分隔")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="微批最长等待（毫秒）")
+    parser.add_argument("--workers", type=int, default=4, help="流水线预取线程数")
+    parser.add_argument("--device", default="cpu", help="计算设备")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list_images(args.images, args.count) if args.images else make_images(tmp, args.count)
+
+        extractor = InkSightExtractor(device=args.device, feature_cache=False)
+        extractor.extract_digital_ink(paths[0])  # 预热：加载模型
+
+        rows = [run_sequential(extractor, paths)]
+        for batch_size in (int(v) for v in args.batch_sizes.split(",")):
+            rows.append(run_batched(extractor, paths, batch_size, args.max_wait_ms, args.concurrency))
+            rows.append(run_pipeline(extractor, paths, batch_size, args.workers))
+        rows.append(run_cached(extractor, paths, max(int(v) for v in args.batch_sizes.split(",")),
+                               args.workers, os.path.join(tmp, "feature_cache")))
+
+    print(f"\n{args.count} 张图像，{args.concurrency} 个并发线程，max_wait_ms={args.max_wait_ms:g}，设备 {args.device}")
+    print(f"{'模式':<14}{'张/秒':>10}{'平均批大小':>12}{'p50 ms':>10}{'p99 ms':>10}{'成功':>8}")
+    for row in rows:
+        print(f"{row['mode']:<14}{row['images_per_second']:>10.2f}{row['avg_batch_size']:>12.2f}"
+              f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['ok']:>8}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "count": args.count,
+                "concurrency": args.concurrency,
+                "max_wait_ms": args.max_wait_ms,
+                "workers": args.workers,
+                "device": args.device,
+                "results": rows,
+            }, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+端到端压测 - 回放"一节课结束后全班集中提交"的流量
+
+模拟多个班级同时下课：每个班级一位老师，依次为本班学生拍照提交（两次提交之间有拍照、
+填写的间隔），各班开始时间错开。照片为手机原图尺寸的 JPEG；按 --ai-ratio 比例留空评语
+走 AI 生成，其余填写评语。
+
+报告：
+- 吞吐（成功提交/秒）、成功率、按错误信息分组的失败次数
+- 总延迟 p50/p90/p99/max（区分 AI 与手写评语）
+- 各处理阶段延迟（upload/ai/collage/push/save，取自响应的 Server-Timing 头）
+
+配合本地模拟服务使用，不消耗 API 额度也不会推送到真实家长群:
+    python benchmarks/mock_dashscope.py --port 9100 --latency-median 2500 &
+    python benchmarks/mock_wechat.py --port 9200 &
+    DASHSCOPE_BASE_URL=http://127.0.0.1:9100/api/v1 DASHSCOPE_API_KEY=mock \\
+        WECHAT_WEBHOOK="http://127.0.0.1:9200/cgi-bin/webhook/send?key=loadtest" \\
+        gunicorn -w 4 -b 127.0.0.1:8000 run:app &
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --classes 6 --students 30
+"""
+
+import io
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+
+STAGE_ORDER = ("upload", "ai", "collage", "push", "save", "total")
+
+
+def make_photo(width, height, quality, seed=0):
+    """生成接近手机原图的 JPEG（纹理 + 噪点 + 深色笔画，压缩后体积与真实照片相当）"""
+    from PIL import Image, ImageChops, ImageDraw
+
+    coarse = Image.effect_noise((width // 8, height // 8), 60).resize((width, height), Image.BICUBIC)
+    gray = ImageChops.add(coarse, Image.effect_noise((width, height), 6), offset=-128)
+    image = Image.merge("RGB", (gray, gray.point(lambda v: v * 0.95), gray.point(lambda v: v * 0.85)))
+
+    rng = random.Random(seed)
+    draw = ImageDraw.Draw(image)
+    reach = max(width, height) // 10
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        end = (x + rng.randrange(-reach, reach), y + rng.randrange(-reach, reach))
+        draw.line([(x, y), end], fill=(20, 20, 20), width=rng.randrange(20, 60))
+
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def parse_server_timing(header):
+    """解析 Server-Timing 头 → {阶段: 毫秒}"""
+    stages = {}
+    for name, dur in re.findall(r"([\w-]+);dur=([\d.]+)", header or ""):
+        stages[name] = float(dur)
+    return stages
+
+
+def percentile(values, q):
+    """最近秩分位数（values 已排序）"""
+    if not values:
+        return None
+    return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+class LoadTest:
+    """按班级并发、班内顺序提交的压测驱动"""
+
+    def __init__(self, url, photo, args):
+        self.url = url
+        self.photo = photo
+        self.args = args
+        self.results = []
+        self.lock = threading.Lock()
+
+    def teacher(self, class_index, start_delay, rng):
+        import requests
+
+        session = requests.Session()
+        class_name = f"压测{class_index + 1}班"
+        time.sleep(start_delay)
+        for student in range(self.args.students):
+            use_ai = rng.random() < self.args.ai_ratio
+            data = {
+                "class_name": class_name,
+                "student_name": f"学生{student + 1:02d}",
+                "comment": "" if use_ai else "今天写得很认真，笔画有力，继续保持！",
+            }
+            files = {
+                "posture": ("posture.jpg", self.photo, "image/jpeg"),
+                "work": ("work.jpg", self.photo, "image/jpeg"),
+            }
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{self.url}/api/submit", data=data, files=files,
+                                         timeout=self.args.timeout)
+                body = response.json() if response.headers.get("Content-Type", "").startswith("application/json") else {}
+                ok = response.ok and bool(body.get("success"))
+                msg = body.get("msg") or f"HTTP {response.status_code}"
+                stages = parse_server_timing(response.headers.get("Server-Timing"))
+            except Exception as e:
+                ok, msg, stages = False, type(e).__name__, {}
+            latency = (time.perf_counter() - started) * 1000
+
+            with self.lock:
+                self.results.append({
+                    "class": class_name, "ai": use_ai, "ok": ok,
+                    "msg": msg, "latency_ms": latency, "stages": stages,
+                })
+            if student < self.args.students - 1:
+                time.sleep(rng.expovariate(1 / self.args.think) if self.args.think > 0 else 0)
+
+    def run(self):
+        rng = random.Random(self.args.seed)
+        threads = []
+        for i in range(self.args.classes):
+            delay = rng.uniform(0, self.args.stagger)
+            thread = threading.Thread(
+                target=self.teacher, args=(i, delay, random.Random(rng.random())), daemon=True
+            )
+            threads.append(thread)
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """汇总压测结果（同时用于打印和 --json 输出）"""
+    ok = [r for r in results if r["ok"]]
+
+    def dist(values):
+        values = sorted(values)
+        return {
+            "count": len(values),
+            "p50": percentile(values, 50), "p90": percentile(values, 90),
+            "p99": percentile(values, 99), "max": values[-1] if values else None,
+        }
+
+    stage_values = defaultdict(list)
+    for r in ok:
+        for name, ms in r["stages"].items():
+            stage_values[name].append(ms)
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "submitted": len(results),
+        "succeeded": len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0,
+        "errors": dict(Counter(r["msg"] for r in results if not r["ok"]).most_common(10)),
+        "ai_fallback": sum(1 for r in ok if r["ai"] and "AI" not in r["msg"]),
+        "latency": {
+            "all": dist(r["latency_ms"] for r in ok),
+            "ai": dist(r["latency_ms"] for r in ok if r["ai"]),
+            "manual": dist(r["latency_ms"] for r in ok if not r["ai"]),
+        },
+        "stages": {
+            name: dist(stage_values[name])
+            for name in sorted(stage_values, key=lambda n: (STAGE_ORDER + (n,)).index(n))
+        },
+    }
+
+
+def print_report(summary):
+    def row(label, d):
+        if not d["count"]:
+            return f"  {label:<10} {'-':>8}"
+        return (f"  {label:<10} {d['count']:>6} {d['p50']:>9.0f} {d['p90']:>9.0f} "
+                f"{d['p99']:>9.0f} {d['max']:>9.0f}")
+
+    header = f"  {'':<10} {'次数':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(f"\n耗时 {summary['elapsed_s']}s，提交 {summary['submitted']} 次，成功 {summary['succeeded']} 次，"
+          f"吞吐 {summary['throughput_rps']} 次/秒，错误率 {summary['error_rate'] * 100:.1f}%")
+    if summary["ai_fallback"]:
+        print(f"AI 生成失败改用默认评语 {summary['ai_fallback']} 次")
+    for msg, count in summary["errors"].items():
+        print(f"  ❌ {count:>4} × {msg}")
+
+    print("\n总延迟:")
+    print(header)
+    print(row("全部", summary["latency"]["all"]))
+    print(row("AI 评语", summary["latency"]["ai"]))
+    print(row("手写评语", summary["latency"]["manual"]))
+
+    print("\n分阶段延迟（Server-Timing）:")
+    print(header)
+    for name, d in summary["stages"].items():
+        print(row(name, d))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测（班级集中提交）")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="被测服务地址")
+    parser.add_argument("--classes", type=int, default=4, help="同时下课的班级数（并发老师数）")
+    parser.add_argument("--students", type=int, default=30, help="每班学生数")
+    parser.add_argument("--think", type=float, default=8.0, help="老师两次提交之间的平均间隔（秒，指数分布）")
+    parser.add_argument("--stagger", type=float, default=10.0, help="各班开始时间错开范围（秒）")
+    parser.add_argument("--ai-ratio", type=float, default=0.6, help="留空评语走 AI 生成的比例")
+    parser.add_argument("--photo-size", default="3024x4032", help="照片尺寸（宽x高）")
+    parser.add_argument("--photo-quality", type=int, default=88, help="照片 JPEG 质量")
+    parser.add_argument("--timeout", type=float, default=120, help="单次提交超时（秒）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子（同一种子回放同样的流量）")
+    parser.add_argument("--json", help="把汇总结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.photo_size.lower().split("x"))
+    photo = make_photo(width, height, args.photo_quality, args.seed)
+    print(f"🚀 {args.classes} 个班 × {args.students} 名学生 → {args.url}（照片 {args.photo_size}，"
+          f"{len(photo) / 1024 / 1024:.1f}MB；AI 比例 {args.ai_ratio:g}；间隔均值 {args.think:g}s）")
+
+    test = LoadTest(args.url.rstrip("/"), photo, args)
+    elapsed = test.run()
+    summary = summarize(test.results, elapsed)
+    print_report(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.json}")
+    return 0 if summary["succeeded"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
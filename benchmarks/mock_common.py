@@ -0,0 +1,173 @@
+"""
+本地模拟服务公共部分 - 延迟分布、错误注入、限流
+
+功能职责：
+- LatencyModel - 对数正态延迟（中位数 + 离散度，可设上下限）
+- SlidingWindowLimiter - 按 key 的滑动窗口限流（每窗口最多 N 次）
+- MockHandler - JSON 请求/响应的 HTTP 处理器基类，统计各结果次数（GET /_stats 查看）
+- create_server() / add_fault_args() / serve() - 创建服务、命令行参数与启动
+
+由 mock_dashscope.py、mock_wechat.py 使用。
+"""
+
+import json
+import math
+import time
+import random
+import threading
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class LatencyModel:
+    """对数正态延迟：大多数请求接近中位数，少数请求拖出长尾"""
+
+    def __init__(self, median_ms, sigma=0.0, min_ms=0, max_ms=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+
+    def sample(self):
+        """采样一次延迟（毫秒）"""
+        if self.median_ms <= 0:
+            return 0
+        value = random.lognormvariate(math.log(self.median_ms), self.sigma)
+        if self.max_ms is not None:
+            value = min(value, self.max_ms)
+        return max(value, self.min_ms)
+
+    def sleep(self):
+        time.sleep(self.sample() / 1000)
+
+
+class SlidingWindowLimiter:
+    """每个 key 在 window 秒内最多 limit 次（limit <= 0 表示不限流）"""
+
+    def __init__(self, limit, window=60):
+        self.limit = limit
+        self.window = window
+        self._hits = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def allow(self, key="default"):
+        if self.limit <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits[key]
+            while hits and now - hits[0] >= self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False
+            hits.append(now)
+            return True
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """JSON 模拟服务处理器基类（子类实现 handle_get / handle_post）
+
+    server 上需要有 latency、error_rate、limiter、stats、stats_lock 属性（见 serve()）。
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # 压测时每个请求一行日志太多
+        pass
+
+    @property
+    def path_only(self):
+        return urlsplit(self.path).path
+
+    @property
+    def query(self):
+        return {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def count(self, outcome):
+        with self.server.stats_lock:
+            self.server.stats[outcome] += 1
+
+    def should_fail(self):
+        return random.random() < self.server.error_rate
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path_only == "/_stats":
+            with self.server.stats_lock:
+                self.send_json(200, dict(self.server.stats))
+            return
+        self.handle_get()
+
+    def do_POST(self):
+        self.handle_post()
+
+    def handle_get(self):
+        self.send_json(404, {"message": "not found"})
+
+    def handle_post(self):
+        self.send_json(404, {"message": "not found"})
+
+
+def add_fault_args(parser, median_ms, sigma, limit, limit_help):
+    """延迟 / 错误率 / 限流命令行参数"""
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency-median", type=float, default=median_ms, help="延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=sigma, help="对数正态离散度，0 为固定延迟")
+    parser.add_argument("--latency-max", type=float, default=None, help="延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机失败比例（0~1）")
+    parser.add_argument("--rate-limit", type=int, default=limit, help=limit_help)
+
+
+class MockServer(ThreadingHTTPServer):
+    """每个连接一个线程；监听队列足够容纳异步入口发起的数百个并发连接（默认只有 5）"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def create_server(handler_class, host="127.0.0.1", port=0, latency=None, error_rate=0.0,
+                  rate_limit=0, **attrs):
+    """创建模拟服务（port=0 时自动分配端口，基准测试在后台线程中运行）"""
+    server = MockServer((host, port), handler_class)
+    server.latency = latency or LatencyModel(0)
+    server.error_rate = error_rate
+    server.limiter = SlidingWindowLimiter(rate_limit)
+    server.stats = Counter()
+    server.stats_lock = threading.Lock()
+    for name, value in attrs.items():
+        setattr(server, name, value)
+    return server
+
+
+def serve(handler_class, host, port, args, **attrs):
+    """按命令行参数启动多线程模拟服务（阻塞直到 Ctrl+C）"""
+    server = create_server(
+        handler_class, host, port,
+        latency=LatencyModel(args.latency_median, args.latency_sigma, max_ms=args.latency_max),
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        **attrs,
+    )
+
+    print(f"🚀 {handler_class.__doc__.splitlines()[0]} 运行在 http://{host}:{port}"
+          f"（延迟中位数 {args.latency_median:g}ms σ={args.latency_sigma:g}，"
+          f"错误率 {args.error_rate:g}，限流 {args.rate_limit or '无'}/分钟）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 请求统计: {dict(server.stats)}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+本地模拟 DashScope 多模态服务 - 压测 /api/submit 时代替真实的 Qwen-VL（不消耗额度）
+
+模拟 SDK 处理本地图片时的完整调用链：
+- GET  {base}/uploads?action=getPolicy - 返回上传凭证（upload_host 指向本服务）
+- POST /oss/upload - 接收图片（multipart），返回 200
+- POST {base}/services/aigc/multimodal-generation/generation - 按延迟分布等待后返回评语
+
+故障注入：
+- --error-rate 比例的生成请求返回 500 InternalError
+- 每个 API Key 每分钟超过 --rate-limit 次返回 429 Throttling.RateQuota
+
+用法:
+    python benchmarks/mock_dashscope.py --port 9100 --latency-median 2500 --latency-sigma 0.4
+    DASHSCOPE_BASE_URL=http://127.0.0.1:9100/api/v1 DASHSCOPE_API_KEY=mock python run.py
+"""
+
+import os
+import sys
+import uuid
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_common import MockHandler, LatencyModel, add_fault_args, serve  # noqa: E402
+
+COMMENT_PARTS = (
+    ("这幅作品笔画干净利落，", "今天的字结构匀称，", "横平竖直的基本功越来越扎实，"),
+    ("撇捺舒展有力，起笔收笔都很到位。", "每个字的重心都放得很稳。", "字与字之间的间距把握得不错。"),
+    ("下次注意竖画再写直一些，", "个别字的点画可以再饱满一些，", "注意保持坐姿，手腕放松，"),
+    ("继续加油，期待下一次的进步！", "坚持练习一定会越写越好！", "老师为你的认真感到骄傲！"),
+)
+
+
+class DashScopeHandler(MockHandler):
+    """模拟 DashScope 服务"""
+
+    def _api_key(self):
+        return self.headers.get("Authorization", "").replace("Bearer ", "") or "anonymous"
+
+    def _error(self, status, code, message):
+        self.send_json(status, {"request_id": str(uuid.uuid4()), "code": code, "message": message})
+
+    def handle_get(self):
+        if not self.path_only.endswith("/uploads") or self.query.get("action") != "getPolicy":
+            return super().handle_get()
+        self.count("policy")
+        host, port = self.server.server_address[:2]
+        self.send_json(200, {
+            "request_id": str(uuid.uuid4()),
+            "data": {
+                "upload_host": f"http://{host}:{port}/oss/upload",
+                "upload_dir": f"mock/{self.query.get('model', 'model')}",
+                "oss_access_key_id": "mock",
+                "signature": "mock",
+                "policy": "mock",
+                "x_oss_object_acl": "private",
+                "x_oss_forbid_overwrite": "true",
+                "expire_in_seconds": 300,
+                "max_file_size_mb": 100,
+                "capacity_limit_mb": 1000,
+            },
+        })
+
+    def handle_post(self):
+        body = self.read_body()
+        if self.path_only == "/oss/upload":
+            self.server.upload_latency.sleep()
+            self.count("upload")
+            with self.server.stats_lock:
+                self.server.stats["upload_bytes"] += len(body)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if not self.path_only.endswith("/multimodal-generation/generation"):
+            return super().handle_post()
+
+        if not self.server.limiter.allow(self._api_key()):
+            self.count("throttled")
+            return self._error(429, "Throttling.RateQuota", "Requests rate limit exceeded, please try again later.")
+
+        self.server.latency.sleep()
+        if self.should_fail():
+            self.count("error")
+            return self._error(500, "InternalError", "mock injected failure")
+
+        self.count("ok")
+        text = "".join(random.choice(part) for part in COMMENT_PARTS)
+        self.send_json(200, {
+            "request_id": str(uuid.uuid4()),
+            "output": {
+                "choices": [{
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": [{"text": text}]},
+                }],
+            },
+            "usage": {"input_tokens": 1260, "output_tokens": len(text), "image_tokens": 1196},
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 DashScope 多模态服务")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--upload-latency", type=float, default=80, help="图片上传延迟中位数（毫秒）")
+    add_fault_args(parser, median_ms=2500, sigma=0.4, limit=0,
+                   limit_help="每个 API Key 每分钟最多生成次数，0 为不限")
+    args = parser.parse_args()
+    serve(DashScopeHandler, args.host, args.port, args,
+          upload_latency=LatencyModel(args.upload_latency, 0.3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+本地模拟企业微信群机器人 - 压测时代替真实家长群（不会打扰家长）
+
+- POST /cgi-bin/webhook/send?key=... - 按延迟分布等待后返回 errcode
+- 每个 key 每分钟超过 --rate-limit 条（企业微信默认 20 条）返回 45009
+- --error-rate 比例的请求返回 -1 系统繁忙
+
+用法:
+    python benchmarks/mock_wechat.py --port 9200
+    WECHAT_WEBHOOK="http://127.0.0.1:9200/cgi-bin/webhook/send?key=loadtest" python run.py
+
+班级路由表（wechat_routes.json）中的 webhook 也可以指向本服务的不同 key，模拟多个家长群。
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_common import MockHandler, add_fault_args, serve  # noqa: E402
+
+
+class WeChatHandler(MockHandler):
+    """模拟企业微信群机器人"""
+
+    def handle_post(self):
+        body = self.read_body()
+        if self.path_only != "/cgi-bin/webhook/send":
+            return super().handle_post()
+
+        key = self.query.get("key")
+        if not key:
+            self.count("invalid_key")
+            return self.send_json(200, {"errcode": 93000, "errmsg": "invalid webhook url"})
+        try:
+            msgtype = json.loads(body or b"{}").get("msgtype", "unknown")
+        except ValueError:
+            self.count("bad_request")
+            return self.send_json(200, {"errcode": 40008, "errmsg": "invalid message type"})
+
+        self.server.latency.sleep()
+        if not self.server.limiter.allow(key):
+            self.count("throttled")
+            return self.send_json(200, {"errcode": 45009, "errmsg": "api freq out of limit"})
+        if self.should_fail():
+            self.count("error")
+            return self.send_json(200, {"errcode": -1, "errmsg": "system busy"})
+
+        self.count(f"ok:{msgtype}")
+        self.send_json(200, {"errcode": 0, "errmsg": "ok"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟企业微信群机器人")
+    parser.add_argument("--port", type=int, default=9200)
+    add_fault_args(parser, median_ms=120, sigma=0.3, limit=20,
+                   limit_help="每个 key 每分钟最多消息数（企业微信为 20），0 为不限")
+    args = parser.parse_args()
+    serve(WeChatHandler, args.host, args.port, args)
+
+
+if __name__ == "__main__":
+    main()
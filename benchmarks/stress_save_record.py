@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+记录写入压力测试 - 多进程并发 save_record 不丢记录
+
+两种模式：
+- 默认：启动 N 个写进程（模拟 gunicorn worker）各保存 M 条记录，同时一个读进程不断读取，
+  检查读到的文件始终完整（条数不减少、不会读到半个文件），结束后核对总条数
+- --url：向运行中的服务（如 gunicorn -w 4 run:app）并发提交表单，结束后核对记录文件条数
+
+用法:
+    python benchmarks/stress_save_record.py --workers 8 --per-worker 200
+    WECHAT_PUSH_MODE=digest gunicorn -w 4 -b 127.0.0.1:8000 run:app &
+    python benchmarks/stress_save_record.py --url http://127.0.0.1:8000 --records records.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import tempfile
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _writer(db_path, worker, count):
+    from classroom_mvp.data_manager import save_record
+
+    failures = 0
+    for i in range(count):
+        ok = save_record(
+            {
+                "id": uuid.uuid4().hex[:8],
+                "class": f"压测班{worker}",
+                "student": f"学生{i}",
+                "comment": "压力测试",
+                "created_at": datetime.now().isoformat(),
+            },
+            db_path,
+        )
+        failures += not ok
+    return failures
+
+
+def _reader(db_path, stop, result):
+    """不加锁读取：每次都应读到完整的 JSON，条数单调不减"""
+    reads = errors = regressions = last = 0
+    while not stop.is_set():
+        try:
+            with open(db_path, "r", encoding="utf-8") as f:
+                count = len(json.load(f))
+        except FileNotFoundError:
+            continue
+        except ValueError:
+            errors += 1
+            continue
+        reads += 1
+        if count < last:
+            regressions += 1
+        last = count
+    result.update(reads=reads, errors=errors, regressions=regressions)
+
+
+def run_local(workers, per_worker):
+    import logging
+    logging.disable(logging.INFO)
+
+    db_path = os.path.join(tempfile.mkdtemp(), "records.json")
+    ctx = multiprocessing.get_context("spawn")
+    manager = ctx.Manager()
+    stop, reader_result = manager.Event(), manager.dict()
+
+    reader = ctx.Process(target=_reader, args=(db_path, stop, reader_result))
+    reader.start()
+    started = time.time()
+    with ctx.Pool(workers) as pool:
+        failures = sum(pool.starmap(_writer, [(db_path, w, per_worker) for w in range(workers)]))
+    elapsed = time.time() - started
+    stop.set()
+    reader.join()
+
+    with open(db_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    expected = workers * per_worker - failures
+    ids = {r["id"] for r in records}
+
+    print(f"写进程 {workers} × {per_worker} 条，耗时 {elapsed:.1f}s（{workers * per_worker / elapsed:.0f} 条/秒）")
+    print(f"保存失败 {failures} 条；文件中 {len(records)} 条（期望 {expected}），ID 去重后 {len(ids)} 条")
+    print(f"读进程读取 {reader_result['reads']} 次：解析失败 {reader_result['errors']} 次，"
+          f"条数倒退 {reader_result['regressions']} 次")
+
+    ok = len(records) == expected == len(ids) and not reader_result["errors"] and not reader_result["regressions"]
+    print("✅ 没有丢失记录" if ok else "❌ 发现丢失或损坏")
+    return 0 if ok else 1
+
+
+def _jpeg():
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (180, 120, 60)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def run_http(url, records_path, total, concurrency):
+    import requests
+
+    def count():
+        if not os.path.exists(records_path):
+            return 0
+        with open(records_path, "r", encoding="utf-8") as f:
+            return len(json.load(f))
+
+    image = _jpeg()
+
+    def submit(i):
+        response = requests.post(
+            f"{url}/api/submit",
+            data={"class_name": "压测班", "student_name": f"学生{i}", "comment": "压力测试"},
+            files={"posture": ("p.jpg", image, "image/jpeg"), "work": ("w.jpg", image, "image/jpeg")},
+            timeout=60,
+        )
+        return response.ok and response.json().get("success")
+
+    before = count()
+    started = time.time()
+    with ThreadPoolExecutor(concurrency) as pool:
+        succeeded = sum(1 for ok in pool.map(submit, range(total)) if ok)
+    elapsed = time.time() - started
+    added = count() - before
+
+    print(f"提交 {total} 次（并发 {concurrency}），成功 {succeeded} 次，耗时 {elapsed:.1f}s")
+    print(f"记录文件新增 {added} 条")
+    ok = added == succeeded
+    print("✅ 没有丢失记录" if ok else "❌ 成功提交数与新增记录数不一致")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记录写入压力测试")
+    parser.add_argument("--workers", type=int, default=8, help="写进程数")
+    parser.add_argument("--per-worker", type=int, default=200, help="每个写进程保存的记录数")
+    parser.add_argument("--url", help="压测运行中的服务（如 http://127.0.0.1:8000）")
+    parser.add_argument("--records", default="records.json", help="--url 模式下服务的记录文件")
+    parser.add_argument("--total", type=int, default=400, help="--url 模式下的提交次数")
+    parser.add_argument("--concurrency", type=int, default=16, help="--url 模式下的并发数")
+    args = parser.parse_args()
+
+    if args.url:
+        return run_http(args.url.rstrip("/"), args.records, args.total, args.concurrency)
+    return run_local(args.workers, args.per_worker)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
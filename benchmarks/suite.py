@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+微基准测试套件 - 存储、渲染和 AI 调用热点路径的回归检查
+
+覆盖：
+- data.load_records / data.save_record / data.filter_records / data.records_to_csv
+  （1k、100k、1M 条合成记录）
+- image.create_collage（手机原图尺寸的姿势 + 作品照片）
+- ai.generate_ai_comment（进程内的模拟 DashScope，无网络延迟，只测 SDK 与上传开销）
+
+每项先预热一次，再至少运行 --repeat 次且累计不少于 --min-time 秒，记录 min/median/mean/stdev。
+结果写入 JSON（含提交号、Python 版本、机器信息），compare 按中位数对比两次结果，
+超过阈值的变慢项返回非零退出码，可直接用于检查存储或渲染改动。
+
+用法:
+    python benchmarks/suite.py list
+    python benchmarks/suite.py run --output baseline.json
+    python benchmarks/suite.py run --sizes 1000,100000 --filter data. --output new.json
+    python benchmarks/suite.py compare baseline.json new.json --threshold 0.1
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import threading
+import uuid
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+PHOTO_SIZE = (3024, 4032)
+
+# name -> (setup, 是否按记录数参数化)；setup(param) 返回被计时的无参函数
+BENCHMARKS = {}
+
+
+def benchmark(name, sized=False):
+    """注册基准测试"""
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, sized)
+        return setup
+    return decorator
+
+
+class Workspace:
+    """临时目录中的测试数据（同一次运行内按记录数缓存）"""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="classroom-bench-")
+        self._datasets = {}
+        self._photos = None
+
+    def dataset(self, size):
+        """包含 size 条合成记录的目录（records.json）"""
+        if size not in self._datasets:
+            from bench_analytics import make_records
+            from classroom_mvp.data_manager import write_records
+
+            path = os.path.join(self.root, f"records-{size}")
+            os.makedirs(path)
+            print(f"  生成 {size} 条合成记录...", flush=True)
+            write_records(make_records(size), os.path.join(path, "records.json"))
+            self._datasets[size] = path
+        return self._datasets[size]
+
+    def scratch_copy(self, size):
+        """可写入的数据副本（save_record 会追加记录）"""
+        path = os.path.join(self.root, f"scratch-{size}-{uuid.uuid4().hex[:6]}.json")
+        shutil.copyfile(os.path.join(self.dataset(size), "records.json"), path)
+        return path
+
+    def photos(self):
+        """(姿势照片, 作品照片) 路径，手机原图尺寸"""
+        if self._photos is None:
+            from loadtest import make_photo
+
+            self._photos = []
+            for seed, name in enumerate(("posture.jpg", "work.jpg")):
+                path = os.path.join(self.root, name)
+                with open(path, "wb") as f:
+                    f.write(make_photo(*PHOTO_SIZE, quality=88, seed=seed))
+                self._photos.append(path)
+        return self._photos
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+WORKSPACE = None
+
+
+def _new_record():
+    return {
+        "id": uuid.uuid4().hex[:8],
+        "class": "基准班",
+        "student": "基准学生",
+        "comment": "写得很好笔顺正确",
+        "ai_generated": False,
+        "comment_length": 8,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+# ====== 存储 ======
+
+@benchmark("data.load_records", sized=True)
+def _load_records(size):
+    from classroom_mvp.data_manager import load_records
+
+    db_path = os.path.join(WORKSPACE.dataset(size), "records.json")
+    return lambda: load_records(db_path)
+
+
+@benchmark("data.save_record", sized=True)
+def _save_record(size):
+    from classroom_mvp.data_manager import save_record
+
+    db_path = WORKSPACE.scratch_copy(size)
+    return lambda: save_record(_new_record(), db_path)
+
+
+@benchmark("data.filter_records", sized=True)
+def _filter_records(size):
+    from classroom_mvp.data_manager import filter_records
+
+    # filter_records 读取当前目录的 records.json（与线上一致）；预热后列式视图已缓存
+    os.chdir(WORKSPACE.dataset(size))
+    return lambda: filter_records("班级7", "2025-06")
+
+
+@benchmark("data.records_to_csv", sized=True)
+def _records_to_csv(size):
+    from classroom_mvp.data_manager import load_records, records_to_csv
+
+    records = load_records(os.path.join(WORKSPACE.dataset(size), "records.json"))
+    return lambda: records_to_csv(records)
+
+
+# ====== 图片 ======
+
+@benchmark("image.create_collage")
+def _create_collage(_):
+    from classroom_mvp.image_processor import create_collage
+
+    posture, work = WORKSPACE.photos()
+    output = os.path.join(WORKSPACE.root, "collage.jpg")
+    comment = "这幅作品笔画干净利落，撇捺舒展有力。下次注意竖画再写直一些，继续加油！"
+    return lambda: create_collage(posture, work, output, "基准班", "基准学生", comment)
+
+
+# ====== AI ======
+
+@benchmark("ai.generate_ai_comment")
+def _generate_ai_comment(_):
+    import dashscope
+    from mock_common import LatencyModel, create_server
+    from mock_dashscope import DashScopeHandler
+    from classroom_mvp.ai_engine import generate_ai_comment
+
+    server = create_server(DashScopeHandler, upload_latency=LatencyModel(0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    dashscope.base_http_api_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+    _, work = WORKSPACE.photos()
+
+    def run():
+        comment, error, _ = generate_ai_comment(work, "基准学生")
+        if comment is None:
+            raise RuntimeError(error)
+    return run
+
+
+def measure(func, min_repeat, min_time, max_repeat=50):
+    """预热一次后重复计时，返回每次耗时（秒）"""
+    func()
+    gc.collect()
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_repeat and (len(times) < min_repeat or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _metadata():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    from PIL import __version__ as pillow_version
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy_version,
+        "pillow": pillow_version,
+    }
+
+
+def _expand(sizes, name_filter):
+    """展开参数化基准 → [(结果名, setup, 参数)]"""
+    cases = []
+    for name, (setup, sized) in BENCHMARKS.items():
+        for size in (sizes if sized else (None,)):
+            full_name = f"{name}[{size}]" if sized else name
+            if name_filter and not any(f in full_name for f in name_filter):
+                continue
+            cases.append((full_name, setup, size))
+    return cases
+
+
+def run(args):
+    global WORKSPACE
+
+    # 只允许调用模拟服务：API Key 在导入 classroom_mvp 之前设置
+    os.environ["DASHSCOPE_API_KEY"] = "mock"
+    os.environ.pop("DASHSCOPE_BASE_URL", None)
+
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else DEFAULT_SIZES
+    cases = _expand(sizes, args.filter)
+    if not cases:
+        print("❌ 没有匹配的基准测试")
+        return 1
+
+    cwd = os.getcwd()
+    WORKSPACE = Workspace()
+    results = {}
+    try:
+        for full_name, setup, size in cases:
+            print(f"▶ {full_name}", flush=True)
+            func = setup(size)
+            times = measure(func, args.repeat, args.min_time)
+            results[full_name] = {
+                "min": min(times),
+                "median": statistics.median(times),
+                "mean": statistics.fmean(times),
+                "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+                "repeat": len(times),
+                "unit": "s",
+            }
+            print(f"  中位数 {_format_seconds(results[full_name]['median'])}"
+                  f"（最快 {_format_seconds(results[full_name]['min'])}，{len(times)} 次）", flush=True)
+    finally:
+        os.chdir(cwd)
+        WORKSPACE.cleanup()
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{datetime.now():%Y%m%d-%H%M%S}-{_git('rev-parse', '--short', 'HEAD') or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": _metadata(), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已写入 {output}")
+    return 0
+
+
+def _format_seconds(value):
+    if value >= 1:
+        return f"{value:.2f}s"
+    if value >= 1e-3:
+        return f"{value * 1e3:.1f}ms"
+    return f"{value * 1e6:.0f}µs"
+
+
+def compare(args):
+    """按中位数对比两次结果；变慢超过阈值时返回 1"""
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+
+    base_meta, cur_meta = baseline.get("meta", {}), current.get("meta", {})
+    print(f"基线 {base_meta.get('commit') or '?'}（{base_meta.get('created_at', '?')}）→ "
+          f"当前 {cur_meta.get('commit') or '?'}（{cur_meta.get('created_at', '?')}）")
+    if base_meta.get("machine") != cur_meta.get("machine") or base_meta.get("python") != cur_meta.get("python"):
+        print("⚠️ 两次结果的机器或 Python 版本不同，对比仅供参考")
+
+    regressions = 0
+    print(f"\n{'基准':<36} {'基线':>10} {'当前':>10} {'比值':>7}")
+    names = list(baseline["results"]) + [n for n in current["results"] if n not in baseline["results"]]
+    for name in names:
+        base, cur = baseline["results"].get(name), current["results"].get(name)
+        if base is None or cur is None:
+            print(f"{name:<36} {'仅' + ('当前' if base is None else '基线'):>10}")
+            continue
+        ratio = cur["median"] / base["median"] if base["median"] else float("inf")
+        if ratio > 1 + args.threshold:
+            flag = "🔺 变慢"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "🔻 变快"
+        else:
+            flag = ""
+        print(f"{name:<36} {_format_seconds(base['median']):>10} {_format_seconds(cur['median']):>10} "
+              f"{ratio:>6.2f}x {flag}")
+
+    if regressions:
+        print(f"\n❌ {regressions} 项变慢超过 {args.threshold:.0%}")
+        return 1
+    print(f"\n✅ 没有超过 {args.threshold:.0%} 的性能退化")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="微基准测试套件")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="列出全部基准测试")
+
+    run_parser = sub.add_parser("run", help="运行基准测试并保存 JSON 结果")
+    run_parser.add_argument("--sizes", help="记录数，逗号分隔（默认 1000,100000,1000000）")
+    run_parser.add_argument("--filter", action="append", help="只运行名称包含该字符串的基准（可重复）")
+    run_parser.add_argument("--repeat", type=int, default=3, help="每项至少运行次数")
+    run_parser.add_argument("--min-time", type=float, default=1.0, help="每项至少累计运行秒数")
+    run_parser.add_argument("--output", help="结果文件（默认 benchmarks/results/<时间>-<提交>.json）")
+
+    compare_parser = sub.add_parser("compare", help="对比两次结果")
+    compare_parser.add_argument("baseline", help="基线结果 JSON")
+    compare_parser.add_argument("current", help="当前结果 JSON")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="判定变慢/变快的相对阈值")
+
+    args = parser.parse_args()
+    if args.command == "list":
+        for full_name, _, _ in _expand(DEFAULT_SIZES, None):
+            print(full_name)
+        return 0
+    if args.command == "run":
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
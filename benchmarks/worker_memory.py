@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+worker 内存基准 - 统计 gunicorn master 和各 worker 的 RSS / PSS / 共享 / 私有内存（Linux）
+
+PSS 把共享页按共享进程数分摊，各进程 PSS 之和即服务实际占用的物理内存；
+preload + 预热（gunicorn.conf.py）时 worker 的大部分页与 master 共享，私有内存应明显小于 RSS。
+可先用 loadtest.py 压测一轮，再看请求处理后被写时复制的页有多少。
+
+用法:
+    python benchmarks/worker_memory.py --pid-file gu.pid
+    python benchmarks/worker_memory.py --master 12345 --json benchmarks/results/worker_memory.json
+"""
+
+import os
+import json
+import argparse
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid):
+    """读取 /proc/<pid>/smaps_rollup，返回 {字段: KB}"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def children(pid):
+    """直接子进程 pid 列表"""
+    pids = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{tid}/children", "r") as f:
+            pids.extend(int(p) for p in f.read().split())
+    return sorted(pids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn 各进程内存占用")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--pid-file", help="gunicorn --pid 写入的文件")
+    group.add_argument("--master", type=int, help="gunicorn master pid")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    master = args.master
+    if args.pid_file:
+        with open(args.pid_file, "r") as f:
+            master = int(f.read().strip())
+
+    rows = [("master", master, smaps_rollup(master))]
+    rows += [("worker", pid, smaps_rollup(pid)) for pid in children(master)]
+
+    print(f"{'进程':<8}{'pid':>8}{'RSS':>10}{'PSS':>10}{'共享':>10}{'私有':>10}  (MB)")
+    for role, pid, mem in rows:
+        print(f"{role:<8}{pid:>8}" + "".join(f"{mem[k] / 1024:>10.1f}" for k in ("rss", "pss", "shared", "private")))
+    total_rss = sum(mem["rss"] for _, _, mem in rows) / 1024
+    total_pss = sum(mem["pss"] for _, _, mem in rows) / 1024
+    print(f"\n合计 RSS {total_rss:.1f}MB，合计 PSS（实际占用）{total_pss:.1f}MB")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "processes": [{"role": role, "pid": pid, **mem} for role, pid, mem in rows],
+                "total_rss_kb": sum(mem["rss"] for _, _, mem in rows),
+                "total_pss_kb": sum(mem["pss"] for _, _, mem in rows),
+            }, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,8 +6,24 @@ classroom_mvp - 雅趣智能课堂反馈系统
 - ai_engine: AI 评语生成
 - data_manager: 数据处理
 - wechat_notifier: 企业微信推送
+- wechat_router: 班级 → 家长群路由与并发推送
+- wechat_outbox: 企业微信推送队列（限速、重试、合并）
+- digest: 每日汇总推送（digest 模式）
 - image_processor: 图片拼图生成
-- app: Flask 应用主体
+- response_cache: 页面响应缓存（gzip + ETag）
+- stats_engine: 按天/班级分桶的统计时间序列（耗时直方图）
+- search_index: 评语和学生姓名全文检索（中文二元组倒排索引）
+- maintenance: 数据维护（冷数据归档、原图压缩、上传文件清理）
+- record: 紧凑的记录对象（__slots__）与存储格式版本
+- analytics: 记录的 NumPy 列式视图（统计和导出筛选向量化）
+- storage: 原子写入与跨进程文件锁
+- timing: 请求分阶段计时（Server-Timing 响应头、请求 ID、慢请求日志）
+- metrics: Prometheus 指标（多 worker 汇总，/metrics）
+- profiler: 按需采样剖析（/admin/profile、SIGUSR2，折叠栈 + tracemalloc）
+- logging_setup: 结构化日志（队列异步写出、按模块设置级别、高频日志采样、text/json 格式）
+- warmup: 启动预热（字体、模板、记录索引、模型；gunicorn preload 时在 fork 前执行，worker 共享；/readyz）
+- app: Flask 应用主体（create_app() 工厂；templates/ 模板，static/ 样式）
+- asgi: ASGI 入口（异步处理提交接口，其余路由挂载 Flask 应用；uvicorn classroom_mvp.asgi:app）
 """
 
 __version__ = "2.0.0"
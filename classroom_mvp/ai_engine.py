@@ -3,19 +3,57 @@ AI 评语生成引擎模块
 
 功能职责：
 - generate_ai_comment(image_path, student_name, style) - 调用 Qwen-VL 生成评语
+- generate_ai_comment_async() - 异步版本（供 classroom_mvp.asgi 使用：图片由 SDK 在线程中上传，生成请求用 httpx 异步等待）
 - 支持多风格评语生成（预留）
 - 完整的容错和重试机制
 - 详细的日志记录
 """
 
+import os
 import time
+import asyncio
 import logging
-from dashscope import MultiModalConversation
-from .config import DASHSCOPE_API_KEY, AI_MAX_RETRIES, AI_RETRY_DELAY, AI_MODEL
+from .config import (
+    DASHSCOPE_API_KEY,
+    DASHSCOPE_BASE_URL,
+    AI_MAX_RETRIES,
+    AI_RETRY_DELAY,
+    AI_MODEL,
+    AI_HTTP_TIMEOUT,
+)
+from .metrics import AI_CALLS
 
 logger = logging.getLogger(__name__)
 
 
+
+def _dashscope():
+    """DashScope SDK（连带 aiohttp、requests 导入约 0.4s，第一次调用 AI 时才加载）"""
+    import dashscope
+    if DASHSCOPE_BASE_URL:
+        # 上传凭证、文件上传和生成接口都基于这个地址
+        dashscope.base_http_api_url = DASHSCOPE_BASE_URL.rstrip("/")
+    return dashscope
+
+
+# 根据风格选择提示词（第三周支持多风格）
+PROMPTS = {
+    "warm": "请根据这张书法作品，给出一段温暖、具体的评语，适合家长阅读。评语应该包括：(1)正面评价点，(2)可改进的地方，(3)鼓励语言。",
+    "strict": "请根据这张书法作品，从技法角度给出专业的评语。重点分析笔画、笔顺、布局等方面的优缺点。",
+    "encouraging": "请根据这张书法作品，给出一段激励式评语，强调进步和努力。",
+}
+UNAVAILABLE_MSG = "AI 评语生成暂时不可用，请稍后重试，或手动填写评语。"
+
+
+def _comment_text(content):
+    """模型返回的 content 可能是文本，也可能是 [{"text": ...}, ...] 列表"""
+    if isinstance(content, list):
+        for item in content:
+            if isinstance(item, dict) and "text" in item:
+                return str(item["text"])
+    return str(content)
+
+
 def generate_ai_comment(image_path, student_name="学生", style="warm"):
     """调用 Qwen-VL 多模态大模型生成书法评语
 
@@ -31,24 +69,18 @@ def generate_ai_comment(image_path, student_name="学生", style="warm"):
     """
     if not DASHSCOPE_API_KEY:
         error_msg = "API Key 未配置"
-        logger.error(f"❌ {error_msg}")
+        logger.error("❌ %s", error_msg)
         return None, error_msg, 0
 
-    # 根据风格选择提示词（第三周支持多风格）
-    prompt_map = {
-        "warm": "请根据这张书法作品，给出一段温暖、具体的评语，适合家长阅读。评语应该包括：(1)正面评价点，(2)可改进的地方，(3)鼓励语言。",
-        "strict": "请根据这张书法作品，从技法角度给出专业的评语。重点分析笔画、笔顺、布局等方面的优缺点。",
-        "encouraging": "请根据这张书法作品，给出一段激励式评语，强调进步和努力。",
-    }
-    prompt = prompt_map.get(style, prompt_map["warm"])
+    prompt = PROMPTS.get(style, PROMPTS["warm"])
 
     for attempt in range(AI_MAX_RETRIES):
         try:
             # 日志记录
             if attempt == 0:
-                logger.info(f"🔍 正在为 {student_name} 调用 Qwen-VL (风格: {style})...")
+                logger.info("🔍 正在为 %s 调用 Qwen-VL (风格: %s)...", student_name, style)
             else:
-                logger.info(f"🔄 重试第 {attempt} 次调用 Qwen-VL...")
+                logger.info("🔄 重试第 %s 次调用 Qwen-VL...", attempt)
 
             start_time = time.time()
 
@@ -64,7 +96,7 @@ def generate_ai_comment(image_path, student_name="学生", style="warm"):
             ]
 
             # 调用 Qwen-VL 多模态对话 API
-            response = MultiModalConversation.call(
+            response = _dashscope().MultiModalConversation.call(
                 model=AI_MODEL,
                 messages=messages,
                 api_key=DASHSCOPE_API_KEY,
@@ -73,28 +105,20 @@ def generate_ai_comment(image_path, student_name="学生", style="warm"):
             # 检查响应
             if response.status_code == 200:
                 # 提取生成的评语
-                comment = response.output.choices[0].message.content
-                # 如果是列表，取第一个文本内容
-                if isinstance(comment, list):
-                    for item in comment:
-                        if isinstance(item, dict) and item.get("type") == "text":
-                            comment = item.get("text", "")
-                            break
+                comment = _comment_text(response.output.choices[0].message.content)
 
                 elapsed_ms = int((time.time() - start_time) * 1000)
-                logger.info(
-                    f"✅ AI 评语生成成功（耗时 {elapsed_ms}ms, 风格: {style}）"
-                )
-                return str(comment), None, elapsed_ms
+                AI_CALLS.inc(result="ok")
+                logger.info("✅ AI 评语生成成功（耗时 %sms, 风格: %s）", elapsed_ms, style)
+                return comment, None, elapsed_ms
             else:
                 error_msg = (
                     response.message
                     if hasattr(response, "message")
                     else "未知错误"
                 )
-                logger.warning(
-                    f"⚠️ AI 调用失败 (HTTP {response.status_code}): {error_msg}"
-                )
+                AI_CALLS.inc(result="throttled" if response.status_code == 429 else "error")
+                logger.warning("⚠️ AI 调用失败 (HTTP %s): %s", response.status_code, error_msg)
 
                 # 如果不是最后一次尝试，等待后重试
                 if attempt < AI_MAX_RETRIES - 1:
@@ -106,15 +130,116 @@ def generate_ai_comment(image_path, student_name="学生", style="warm"):
         except Exception as e:
             error_type = type(e).__name__
             error_msg = str(e)
-            logger.warning(f"⚠️ AI 调用异常 ({error_type}): {error_msg}")
+            AI_CALLS.inc(result="exception")
+            logger.warning("⚠️ AI 调用异常 (%s): %s", error_type, error_msg)
 
             # 如果不是最后一次尝试，等待后重试
             if attempt < AI_MAX_RETRIES - 1:
-                logger.info(f"   将在 {AI_RETRY_DELAY} 秒后重试...")
+                logger.info("   将在 %s 秒后重试...", AI_RETRY_DELAY)
                 time.sleep(AI_RETRY_DELAY)
                 continue
             else:
-                return None, "AI 评语生成暂时不可用，请稍后重试，或手动填写评语。", 0
+                return None, UNAVAILABLE_MSG, 0
 
     # 如果所有重试都失败
-    return None, "AI 评语生成暂时不可用，请稍后重试，或手动填写评语。", 0
+    return None, UNAVAILABLE_MSG, 0
+
+
+# ====== 异步版本（classroom_mvp.asgi）======
+
+def _api_base():
+    return (DASHSCOPE_BASE_URL or _dashscope().base_http_api_url).rstrip("/")
+
+
+def _upload_image(image_path):
+    """用 SDK 把本地图片上传到 DashScope 临时存储，返回 oss:// 地址
+
+    上传凭证和 OSS 表单是 SDK 内部协议，交给 SDK 处理；阻塞调用，异步入口在线程中执行。
+    """
+    _dashscope()
+    from dashscope.utils.oss_utils import upload_file
+
+    return upload_file(AI_MODEL, f"file://{os.path.abspath(image_path)}", DASHSCOPE_API_KEY)
+
+
+async def generate_ai_comment_async(image_path, student_name="学生", style="warm", client=None):
+    """generate_ai_comment 的异步版本：等待 DashScope 期间不占用线程
+
+    Args:
+        image_path: 书法作品照片路径
+        student_name: 学生名字（用于日志记录）
+        style: 评语风格
+        client: 共享的 httpx.AsyncClient（连接池复用），为 None 时临时创建
+
+    Returns:
+        (comment, error, elapsed_ms)，含义同 generate_ai_comment
+    """
+    import httpx  # 只有异步入口需要
+
+    if not DASHSCOPE_API_KEY:
+        error_msg = "API Key 未配置"
+        logger.error("❌ %s", error_msg)
+        return None, error_msg, 0
+
+    if client is None:
+        async with httpx.AsyncClient(timeout=AI_HTTP_TIMEOUT) as client:
+            return await generate_ai_comment_async(image_path, student_name, style, client)
+
+    headers = {"Authorization": f"Bearer {DASHSCOPE_API_KEY}"}
+    prompt = PROMPTS.get(style, PROMPTS["warm"])
+    image_url = None
+
+    for attempt in range(AI_MAX_RETRIES):
+        try:
+            if attempt == 0:
+                logger.info("🔍 正在为 %s 调用 Qwen-VL (风格: %s)...", student_name, style)
+            else:
+                logger.info("🔄 重试第 %s 次调用 Qwen-VL...", attempt)
+
+            start_time = time.time()
+            if image_url is None:
+                # 上传走 SDK（线程中执行），只有生成请求由 httpx 异步等待
+                image_url = await asyncio.to_thread(_upload_image, image_path)
+
+            response = await client.post(
+                f"{_api_base()}/services/aigc/multimodal-generation/generation",
+                headers={**headers, "X-DashScope-OssResourceResolve": "enable"},
+                json={
+                    "model": AI_MODEL,
+                    "input": {
+                        "messages": [
+                            {"role": "user", "content": [{"image": image_url}, {"text": prompt}]}
+                        ]
+                    },
+                    "parameters": {},
+                },
+            )
+
+            if response.status_code == 200:
+                comment = _comment_text(response.json()["output"]["choices"][0]["message"]["content"])
+                elapsed_ms = int((time.time() - start_time) * 1000)
+                AI_CALLS.inc(result="ok")
+                logger.info("✅ AI 评语生成成功（耗时 %sms, 风格: %s）", elapsed_ms, style)
+                return comment, None, elapsed_ms
+
+            try:
+                error_msg = response.json().get("message") or "未知错误"
+            except ValueError:
+                error_msg = "未知错误"
+            AI_CALLS.inc(result="throttled" if response.status_code == 429 else "error")
+            logger.warning("⚠️ AI 调用失败 (HTTP %s): %s", response.status_code, error_msg)
+            if attempt < AI_MAX_RETRIES - 1:
+                await asyncio.sleep(AI_RETRY_DELAY)
+                continue
+            return None, f"AI 调用失败: {error_msg}", 0
+
+        except Exception as e:
+            AI_CALLS.inc(result="exception")
+            logger.warning("⚠️ AI 调用异常 (%s): %s", type(e).__name__, e)
+            if attempt < AI_MAX_RETRIES - 1:
+                logger.info("   将在 %s 秒后重试...", AI_RETRY_DELAY)
+                await asyncio.sleep(AI_RETRY_DELAY)
+                continue
+            return None, UNAVAILABLE_MSG, 0
+
+    return None, UNAVAILABLE_MSG, 0
@@ -0,0 +1,212 @@
+"""
+列式分析模块 - 记录的 NumPy 列式视图
+
+功能职责：
+- ColumnarView.build() - 把记录列表转换为列（班级/学生字典编码、时间戳、AI 标记、评语长度、耗时）
+- ColumnarView.mask() - 按班级、日期（年/月/日）向量化筛选
+- count_by_class() / ai_usage_rate() / latency_percentiles() 等 - 向量化计数、分组和分位数
+- ColumnarView.select() - 按筛选结果取回原记录（导出 CSV 用）
+
+numpy 未安装时 HAS_NUMPY 为 False，调用方退回逐条遍历记录。
+numpy 在第一次构建视图时才导入，不拖慢 worker 启动。
+"""
+
+import logging
+import importlib.util
+
+# 只检查是否安装（精简部署可以不装 numpy）
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+np = None
+
+logger = logging.getLogger(__name__)
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _encode(values):
+    """字典编码：返回 (编码数组, 取值列表)"""
+    dictionary = {}
+    codes = np.fromiter(
+        (dictionary.setdefault(v, len(dictionary)) for v in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, list(dictionary)
+
+
+def _parse_created(values):
+    """created_at 字符串列 → datetime64[s]
+
+    ISO 时间截到秒后由 numpy 整列解析；有无法解析的值（手工编辑、导入的记录）时逐条解析，
+    完整时间解析失败再只取日期部分，仍失败或缺失的记为 NaT，不让一条坏数据拖垮整个视图。
+    """
+    texts = [(v or "NaT")[:19] if isinstance(v, str) else "NaT" for v in values]
+    try:
+        return np.array(texts, dtype="datetime64[s]")
+    except ValueError:
+        pass
+
+    created = np.empty(len(texts), dtype="datetime64[s]")
+    bad = 0
+    for i, text in enumerate(texts):
+        for candidate in (text, text[:10]):
+            try:
+                created[i] = np.datetime64(candidate, "s")
+                break
+            except ValueError:
+                continue
+        else:
+            created[i] = np.datetime64("NaT", "s")
+            bad += 1
+    if bad:
+        logger.warning("⚠️ %d 条记录的 created_at 无法解析，按无日期处理", bad)
+    return created
+
+
+class ColumnarView:
+    """记录的只读列式视图（记录变化后重新构建）
+
+    列：
+        class_codes / student_codes: int32 字典编码（取值见 classes / students）
+        created: datetime64[s]，按记录中的本地时间
+        ai_generated / ai_requested: bool
+        comment_length: int32
+        generation_ms: float32，没有 AI 耗时的记录为 NaN
+    """
+
+    def __init__(self, records, class_codes, classes, student_codes, students, created,
+                 ai_generated, ai_requested, comment_length, generation_ms):
+        self.records = records
+        self.class_codes = class_codes
+        self.classes = classes
+        self.student_codes = student_codes
+        self.students = students
+        self.created = created
+        self.ai_generated = ai_generated
+        self.ai_requested = ai_requested
+        self.comment_length = comment_length
+        self.generation_ms = generation_ms
+
+    @classmethod
+    def build(cls, records):
+        """从记录列表构建列式视图
+
+        Args:
+            records: Record（或 dict）列表
+
+        Returns:
+            ColumnarView
+        """
+        _load_numpy()
+        n = len(records)
+        class_codes, classes = _encode([r.get("class", "") for r in records])
+        student_codes, students = _encode([r.get("student", "") for r in records])
+
+        created = _parse_created([r.get("created_at") for r in records])
+
+        ai_generated = np.fromiter((bool(r.get("ai_generated")) for r in records), dtype=bool, count=n)
+        # 旧记录没有 ai_requested 字段：以 ai_generated 近似
+        ai_requested = np.fromiter(
+            (bool(r.get("ai_requested", r.get("ai_generated"))) for r in records), dtype=bool, count=n
+        )
+        comment_length = np.fromiter(
+            (r.get("comment_length", 0) for r in records), dtype=np.int32, count=n
+        )
+        generation_ms = np.fromiter(
+            (
+                (r.get("generation_time_ms") or np.nan) if r.get("ai_generated") else np.nan
+                for r in records
+            ),
+            dtype=np.float32,
+            count=n,
+        )
+
+        return cls(records, class_codes, classes, student_codes, students, created,
+                   ai_generated, ai_requested, comment_length, generation_ms)
+
+    def __len__(self):
+        return len(self.records)
+
+    # ====== 筛选 ======
+
+    def mask(self, class_name=None, date_str=None):
+        """按班级和日期筛选
+
+        Args:
+            class_name: 班级名称，为 None 表示不筛选
+            date_str: YYYY、YYYY-MM 或 YYYY-MM-DD，为 None 表示不筛选
+
+        Returns:
+            bool 数组；date_str 不是上述格式时抛出 ValueError
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if class_name:
+            if class_name not in self.classes:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.class_codes == self.classes.index(class_name)
+        if date_str:
+            # datetime64 按字符串精度确定单位（年/月/日），[start, start + 1 个单位)
+            start = np.datetime64(date_str)
+            end = start + np.timedelta64(1, np.datetime_data(start.dtype)[0])
+            mask &= (self.created >= start) & (self.created < end)
+        return mask
+
+    def select(self, mask):
+        """取回被选中的原记录（保持原顺序）"""
+        return [self.records[i] for i in np.flatnonzero(mask)]
+
+    # ====== 聚合 ======
+
+    def count_by_class(self, mask=None):
+        """各班记录数
+
+        Returns:
+            {班级: 条数}（不含 0 条的班级）
+        """
+        codes = self.class_codes if mask is None else self.class_codes[mask]
+        counts = np.bincount(codes, minlength=len(self.classes))
+        return {self.classes[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def most_active_class(self, mask=None):
+        """记录最多的班级
+
+        Returns:
+            (班级, 条数)，没有记录时为 ("", 0)
+        """
+        counts = self.count_by_class(mask)
+        if not counts:
+            return ("", 0)
+        return max(counts.items(), key=lambda x: x[1])
+
+    def ai_usage_rate(self, mask=None):
+        """AI 评语占比（百分比，保留 1 位小数）"""
+        ai_generated = self.ai_generated if mask is None else self.ai_generated[mask]
+        if ai_generated.size == 0:
+            return 0
+        return round(float(ai_generated.mean()) * 100, 1)
+
+    def avg_ai_comment_length(self, mask=None):
+        """AI 评语平均长度（保留 1 位小数）"""
+        ai_mask = self.ai_generated if mask is None else self.ai_generated & mask
+        if not ai_mask.any():
+            return 0
+        return round(float(self.comment_length[ai_mask].mean()), 1)
+
+    def latency_percentiles(self, mask=None, percentiles=(50, 90, 99)):
+        """AI 生成耗时分位数（毫秒）
+
+        Returns:
+            {分位: 毫秒}，没有耗时数据时各分位为 None
+        """
+        values = self.generation_ms if mask is None else self.generation_ms[mask]
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return {q: None for q in percentiles}
+        result = np.percentile(values, percentiles)
+        return {q: int(round(float(v))) for q, v in zip(percentiles, result)}
@@ -2,24 +2,39 @@
 Flask 应用主入口 - 所有路由和 API 端点
 
 功能职责：
-- 初始化 Flask 应用
-- 定义所有路由（/upload, /api/submit, /stats, /export, /archive 等）
+- create_app() - 创建 Flask 应用（日志、上传目录、剖析信号等初始化只在这里执行，导入本模块没有副作用）
+- 定义所有路由（/upload, /api/submit, /stats, /api/stats/timeseries, /api/search, /export, /archive, /metrics, /readyz, /admin/profile 等）
 - 处理表单提交和文件上传
-- 生成 HTML 页面和 API 响应
+- 渲染 HTML 页面（templates/ 预编译模板 + static/ 样式）和 API 响应
+
+启动方式：
+    gunicorn -w 4 run:app                          # run.py 中创建应用；读取当前目录的 gunicorn.conf.py（preload + 预热）
+    gunicorn -w 4 "classroom_mvp.app:create_app()"
+`from classroom_mvp.app import app` 仍然可用（第一次访问时创建全局应用）。
 """
 
 import os
+import re
+import hmac
+import time
 import uuid
+import hashlib
 import logging
+from functools import lru_cache
 from datetime import datetime
-from urllib.parse import quote, unquote
+from urllib.parse import unquote
 
 from flask import (
     Flask,
+    current_app,
+    g,
     request,
-    render_template_string,
+    render_template,
     send_from_directory,
+    url_for,
     jsonify,
+    redirect,
+    make_response,
 )
 
 # 导入各个模块
@@ -28,441 +43,581 @@ from .config import (
     SCHOOL_NAME,
     DOMAIN,
     UPLOAD_FOLDER,
+    WECHAT_OUTBOX_ENABLED,
+    WECHAT_PUSH_MODE,
+    FILE_SERVE_MODE,
+    X_ACCEL_PREFIX,
+    UPLOAD_CACHE_MAX_AGE,
+    ORIGINAL_CACHE_MAX_AGE,
+    ARCHIVE_PAGE_SIZE,
+    ARCHIVE_MAX_PAGE_SIZE,
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+    STATS_MAX_RANGE_DAYS,
+    STATIC_CACHE_MAX_AGE,
+    ADMIN_TOKEN,
+    PROFILE_DEFAULT_SECONDS,
 )
 from .ai_engine import generate_ai_comment
-from .data_manager import load_records, filter_records, records_to_csv, save_record, get_all_classes
-from .wechat_notifier import send_to_wechat
-from .image_processor import create_collage
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+from .data_manager import (
+    load_all_records,
+    filter_records,
+    records_to_csv,
+    save_record,
+    get_all_classes,
+    query_student_records,
+    student_etag,
+    records_version,
+    get_columnar_view,
+)
+from .wechat_notifier import build_article
+from .wechat_outbox import get_outbox
+from .wechat_router import get_router
+from .digest import ensure_class_montage
+from .response_cache import page_cache
+from .stats_engine import get_stats_engine
+from .search_index import get_search_index
+from .image_processor import create_collage, image_info
+from .logging_setup import setup_logging
+from .timing import (
+    stage,
+    start_request_timer,
+    record_input,
+    annotate,
+    server_timing_header,
+    connect_template_timing,
+    log_if_slow,
 )
+from .metrics import REQUEST_SECONDS, REQUESTS, IN_FLIGHT, register_gauge, render_metrics
+from .profiler import (
+    install_signal_handler,
+    request_profile,
+    profile_status,
+    profile_path,
+    list_profiles,
+)
+from .warmup import readiness
+
 logger = logging.getLogger(__name__)
 
-# 初始化 Flask 应用
-app = Flask(__name__)
+# 路由和请求钩子先登记在这里，create_app() 时注册到应用上（端点名为函数名）
+_routes = []
+_hooks = []
+_app = None
+
+
+def route(rule, **options):
+    """登记路由（参数同 Flask.route）"""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+
+def hook(kind):
+    """登记请求钩子（before_request / after_request / teardown_request / context_processor）"""
+    def decorator(func):
+        _hooks.append((kind, func))
+        return func
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def _static_hash(filename):
+    with open(os.path.join(current_app.static_folder, filename), "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()[:10]
+
+
+@hook("context_processor")
+def _template_globals():
+    """模板公共变量"""
+    def static_url(filename):
+        return url_for("static", filename=filename, v=_static_hash(filename))
+
+    return {"school_name": SCHOOL_NAME, "static_url": static_url}
+
+
+def _short_time(value):
+    """ISO 时间 -> YYYY-MM-DD HH:MM（模板过滤器 short_time）"""
+    return (value or "")[:16].replace("T", " ")
+
+
+@hook("before_request")
+def _ensure_outbox_dispatcher():
+    """确保本 worker 的推送调度线程在运行（fork 后首个请求启动）"""
+    if WECHAT_OUTBOX_ENABLED:
+        get_outbox().start()
+
+
+@hook("before_request")
+def _start_request():
+    """分配请求 ID 并开始计时（阶段耗时、/metrics、慢请求日志）"""
+    start_request_timer()
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@hook("after_request")
+def _add_timing_headers(response):
+    """带上请求 ID 和各阶段耗时（Server-Timing 头，压测脚本据此统计分阶段延迟）"""
+    response.headers["X-Request-ID"] = g.stage_timer.request_id if "stage_timer" in g else ""
+    header = server_timing_header()
+    if header:
+        response.headers["Server-Timing"] = header
+    return response
+
+
+@hook("after_request")
+def _log_slow_request(response):
+    log_if_slow(response)
+    return response
+
+
+@hook("after_request")
+def _record_request_metrics(response):
+    """按路由记录请求耗时和状态码（/metrics）"""
+    started = g.get("request_started")
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+@hook("teardown_request")
+def _finish_request_metrics(exc):
+    if g.pop("request_started", None) is not None:
+        IN_FLIGHT.dec()
+
 
 # ====== 前端路由 ======
 
-@app.route("/")
+@route("/")
 def home():
     """首页（重定向到上传页）"""
     return '<script>window.location.href="/upload"</script>'
 
 
-@app.route("/upload")
+@route("/upload")
+@page_cache.cached(lambda: "static")
 def upload_page():
     """教师手机端上传页面"""
-    html = '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-        <title>雅趣智能课堂反馈｜上传</title>
-        <style>
-            * { margin:0; padding:0; box-sizing:border-box; font-family:"PingFang SC","Microsoft YaHei",sans-serif; }
-            body { padding:20px; background:#f8f9fa; color:#333; }
-            .container { max-width:600px; margin:0 auto; background:white; border-radius:16px; padding:25px; box-shadow:0 4px 12px rgba(0,0,0,0.05); }
-            h2 { text-align:center; color:#e74c3c; margin-bottom:25px; font-size:24px; }
-            .form-group { margin-bottom:20px; }
-            label { display:block; margin-bottom:8px; font-weight:500; color:#2c3e50; }
-            input, select, textarea { width:100%; padding:14px; border:1px solid #ddd; border-radius:12px; font-size:16px; }
-            input[type="file"] { padding:8px; }
-            .btn { background:#e74c3c; color:white; border:none; border-radius:12px; padding:16px; font-size:18px; font-weight:600; width:100%; margin-top:10px; }
-            .btn:active { background:#c0392b; transform:scale(0.98); }
-            .tips { background:#fff8e1; padding:15px; border-radius:12px; margin-top:20px; font-size:14px; line-height:1.5; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h2>✍️ 书法课堂记录</h2>
-            <form id="uploadForm" enctype="multipart/form-data">
-                <div class="form-group">
-                    <label for="class">班级</label>
-                    <select id="class" name="class_name" required>
-                        <option value="">请选择班级</option>
-                        <option value="一年级楷书基础班">一年级楷书基础班</option>
-                        <option value="二年级行书启蒙班">二年级行书启蒙班</option>
-                        <option value="三年级创作提升班">三年级创作提升班</option>
-                    </select>
-                </div>
-                
-                <div class="form-group">
-                    <label for="student">学生姓名</label>
-                    <input type="text" id="student" name="student_name" placeholder="例：张明轩" required>
-                </div>
-                
-                <div class="form-group">
-                    <label for="posture">书写姿势照片（侧拍）</label>
-                    <input type="file" id="posture" name="posture" accept="image/*" capture="environment" required>
-                </div>
-                
-                <div class="form-group">
-                    <label for="work">当堂作品照片</label>
-                    <input type="file" id="work" name="work" accept="image/*" capture="environment" required>
-                </div>
-                
-                <div class="form-group">
-                    <label for="comment">教师评语（可留空，系统将自动生成AI评语）</label>
-                    <textarea id="comment" name="comment" rows="3" placeholder="💡 留空时系统自动为您生成个性化点评。或手动输入自己的评语..."></textarea>
-                </div>
-                
-                <div class="tips" style="background:#e8f5e9; margin-bottom:15px;">
-                    <strong>💡 AI评语提示</strong><br>
-                    • 评语可留空，系统将自动分析作品生成AI点评<br>
-                    • 也可手动输入，系统将直接使用您的评语<br>
-                    • AI评语温暖、具体，适合家长阅读
-                </div>
-                
-                <button type="submit" class="btn">提交给家长群</button>
-            </form>
-            
-            <div class="tips">
-                <strong>📌 温馨提示</strong><br>
-                • 姿势照请侧拍，能看清头/肩/背<br>
-                • 作品照光线要充足，四角完整<br>
-                • 评语越具体，家长越安心
-            </div>
-        </div>
-        
-        <script>
-        document.getElementById('uploadForm').addEventListener('submit', async (e) => {
-            e.preventDefault();
-            const btn = document.querySelector('.btn');
-            const originalText = btn.innerHTML;
-            btn.innerHTML = '🤖 正在生成AI评语...';
-            btn.disabled = true;
-            
-            const formData = new FormData(e.target);
-            
-            try {
-                const response = await fetch('/api/submit', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const result = await response.json();
-                
-                if (result.success) {
-                    alert('✅ 上传成功！作品已发送至家长群，学生档案已更新');
-                    e.target.reset();
-                } else {
-                    alert('❌ 失败: ' + result.msg);
-                }
-            } catch (error) {
-                alert('⚠️ 网络错误: ' + error.message);
-            } finally {
-                btn.innerHTML = originalText;
-                btn.disabled = false;
-            }
-        });
-        </script>
-    </body>
-    </html>
-    '''
-    return html
+    return render_template("upload.html")
 
 
 # ====== 核心 API ======
 
-@app.route("/api/submit", methods=["POST"])
+DEFAULT_COMMENT = "今天的书法作品进步很棒！继续加油！"
+
+
+def new_submission_paths():
+    """分配记录 ID 和原图、拼图的保存路径
+
+    Returns:
+        (uid, posture_path, work_path, collage_path)
+    """
+    uid = str(uuid.uuid4())[:8]
+    return uid, f"{UPLOAD_FOLDER}/p_{uid}.jpg", f"{UPLOAD_FOLDER}/w_{uid}.jpg", f"{UPLOAD_FOLDER}/c_{uid}.jpg"
+
+
+def push_submission(class_name, article):
+    """按推送模式发送到企业微信（按班级路由到一个或多个家长群；
+    开启队列时先入队，由后台按频率限制推送）
+
+    Returns:
+        (success, 提示信息)；全部群都推送失败时 success 为 False
+    """
+    if WECHAT_PUSH_MODE == "digest":
+        # 汇总模式：只保存记录，由定时任务每班推送一次当天汇总
+        return True, "已保存，今晚将汇总推送到家长群！"
+    if WECHAT_OUTBOX_ENABLED:
+        with stage("push"):
+            get_outbox().enqueue(article, class_name)
+        return True, "已加入家长群推送队列！"
+
+    with stage("push"):
+        results = get_router().fan_out(class_name, [article])
+    failed = {name: msg for name, (ok, msg) in results.items() if not ok}
+    if len(failed) == len(results):
+        return False, f"群推送失败: {'；'.join(failed.values())}"
+    push_msg = "已发送到家长群！"
+    if failed:
+        push_msg += f"（{len(failed)} 个群推送失败: {'、'.join(failed)}）"
+    return True, push_msg
+
+
+def build_submission(uid, class_name, student_name, comment, ai_comment, ai_requested,
+                     generation_time_ms, posture_path, work_path, collage_path):
+    """组装要保存的记录"""
+    record = {
+        "id": uid,
+        "class": class_name,
+        "student": student_name,
+        "comment": comment,
+        "ai_generated": ai_comment is not None,
+        "ai_requested": ai_requested,
+        "comment_length": len(comment),
+        "posture_url": f"/{os.path.basename(posture_path)}",
+        "work_url": f"/{os.path.basename(work_path)}",
+        "collage_url": f"/{os.path.basename(collage_path)}",
+        "created_at": datetime.now().isoformat(),
+    }
+    if ai_comment is not None:
+        record["ai_model"] = "qwen-vl-max"
+        record["generation_time_ms"] = generation_time_ms
+    return record
+
+
+def submission_response(uid, class_name, student_name, comment, ai_comment, push_msg):
+    """提交成功的返回内容"""
+    return {
+        "success": True,
+        "msg": push_msg + ("（AI生成评语）" if ai_comment else ""),
+        "record_id": uid,
+        "comment": comment,
+        "archive_url": f"{DOMAIN}/archive?student={student_name}&class={class_name}",
+    }
+
+
+@route("/api/submit", methods=["POST"])
 def submit_record():
     """核心API - 处理上传、生成拼图、推送企业微信、保存数据"""
     try:
-        # 1. 获取表单数据
-        class_name = request.form["class_name"]
-        student_name = request.form["student_name"]
-        comment = request.form.get("comment", "").strip()  # 允许空值
-        posture = request.files["posture"]
-        work = request.files["work"]
+        # 1. 获取表单数据（首次访问 request.form 时接收并解析整个表单）
+        with stage("parse"):
+            class_name = request.form["class_name"]
+            student_name = request.form["student_name"]
+            comment = request.form.get("comment", "").strip()  # 允许空值
+            posture = request.files["posture"]
+            work = request.files["work"]
 
         # 2. 生成唯一ID和文件名
-        uid = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        posture_path = f"{UPLOAD_FOLDER}/p_{uid}.jpg"
-        work_path = f"{UPLOAD_FOLDER}/w_{uid}.jpg"
-        collage_path = f"{UPLOAD_FOLDER}/c_{uid}.jpg"
+        uid, posture_path, work_path, collage_path = new_submission_paths()
 
         # 3. 保存原始照片
-        posture.save(posture_path)
-        work.save(work_path)
+        with stage("upload"):
+            posture.save(posture_path)
+            work.save(work_path)
+        record_input("posture", **image_info(posture_path))
+        record_input("work", **image_info(work_path))
 
         # 4. 如果教师没有输入评语，调用AI生成
         ai_comment = None
-        ai_model = None
         generation_time_ms = 0
-        if not comment or comment.strip() == "":
-            ai_comment, ai_error, generation_time_ms = generate_ai_comment(
-                work_path, student_name, style="warm"
-            )
+        ai_requested = not comment
+        annotate(
+            class_name=class_name,
+            ai_requested=ai_requested,
+            push_mode=WECHAT_PUSH_MODE,
+            outbox=WECHAT_OUTBOX_ENABLED,
+        )
+        if ai_requested:
+            with stage("ai"):
+                ai_comment, ai_error, generation_time_ms = generate_ai_comment(
+                    work_path, student_name, style="warm"
+                )
+            annotate(ai_ok=ai_comment is not None, ai_error=ai_error)
             if ai_comment:
                 comment = ai_comment
-                ai_model = "qwen-vl-max"
             else:
                 # AI生成失败，使用默认评语
-                comment = "今天的书法作品进步很棒！继续加油！"
+                comment = DEFAULT_COMMENT
                 generation_time_ms = 0
 
         # 5. 生成拼图
-        collage_success = create_collage(
-            posture_path, work_path, collage_path, class_name, student_name, comment
-        )
+        with stage("collage"):
+            collage_success = create_collage(
+                posture_path, work_path, collage_path, class_name, student_name, comment
+            )
         if not collage_success:
             return jsonify({"success": False, "msg": "拼图生成失败"})
 
         # 6. 发送到企业微信
         image_url = f"{DOMAIN}/{os.path.basename(collage_path)}"
-        success, msg = send_to_wechat(
-            collage_path, class_name, student_name, comment, image_url
-        )
-        if not success:
-            return jsonify({"success": False, "msg": f"群推送失败: {msg}"})
+        article = build_article(class_name, student_name, comment, image_url)
+        pushed, push_msg = push_submission(class_name, article)
+        if not pushed:
+            return jsonify({"success": False, "msg": push_msg})
 
         # 7. 保存到本地数据库
-        record = {
-            "id": uid,
-            "class": class_name,
-            "student": student_name,
-            "comment": comment,
-            "ai_generated": ai_comment is not None,
-            "comment_length": len(comment),
-            "posture_url": f"/{os.path.basename(posture_path)}",
-            "work_url": f"/{os.path.basename(work_path)}",
-            "collage_url": f"/{os.path.basename(collage_path)}",
-            "created_at": datetime.now().isoformat(),
-            "timestamp": datetime.now().isoformat(),
-            "group": class_name,
-        }
-
-        if ai_comment is not None:
-            record["ai_model"] = ai_model
-            record["generation_time_ms"] = generation_time_ms
-
-        save_record(record)
-
-        return jsonify(
-            {
-                "success": True,
-                "msg": "已发送到家长群！" + ("（AI生成评语）" if ai_comment else ""),
-                "record_id": uid,
-                "comment": comment,
-                "archive_url": f"{DOMAIN}/archive?student={student_name}&class={class_name}",
-            }
+        record = build_submission(
+            uid, class_name, student_name, comment, ai_comment, ai_requested,
+            generation_time_ms, posture_path, work_path, collage_path,
         )
+        with stage("save"):
+            saved = save_record(record)
+        if not saved:
+            return jsonify({"success": False, "msg": "记录保存失败，请联系管理员检查记录文件"})
+
+        return jsonify(submission_response(uid, class_name, student_name, comment, ai_comment, push_msg))
 
     except Exception as e:
-        logger.error(f"❌ 提交记录失败: {str(e)}")
+        logger.error("❌ 提交记录失败: %s", e)
         return jsonify({"success": False, "msg": str(e)})
 
 
 # ====== 学生档案页面 ======
 
-@app.route("/archive")
+def _archive_version():
+    """档案页缓存版本：该学生有新记录时变化"""
+    return student_etag(request.args.get("class", ""), request.args.get("student", ""))
+
+
+@route("/archive")
+@page_cache.cached(_archive_version)
 def student_archive():
-    """家长查看学生档案页"""
+    """家长查看学生档案页（首屏 + 无限滚动，页面按学生档案版本缓存）"""
+    student_name = request.args.get("student", "")
+    class_name = request.args.get("class", "")
+
+    # 按 (班级, 学生) 索引取第一页，按时间倒序
+    records, next_cursor, total = query_student_records(class_name, student_name)
+    return render_template(
+        "archive.html",
+        student_name=student_name,
+        class_name=class_name,
+        records=records,
+        next_cursor=next_cursor,
+        total=total,
+    )
+
+
+@route("/api/archive")
+def archive_api():
+    """学生档案分页接口（供档案页无限滚动）
+
+    参数: student, class, cursor（上一页返回的 next_cursor）, limit
+    """
     student_name = request.args.get("student", "")
     class_name = request.args.get("class", "")
+    cursor = request.args.get("cursor") or None
+    try:
+        limit = int(request.args.get("limit", ARCHIVE_PAGE_SIZE))
+    except ValueError:
+        limit = ARCHIVE_PAGE_SIZE
+    limit = max(1, min(limit, ARCHIVE_MAX_PAGE_SIZE))
+
+    records, next_cursor, total = query_student_records(
+        class_name, student_name, cursor=cursor, limit=limit
+    )
+    response = jsonify(
+        {
+            "student": student_name,
+            "class": class_name,
+            "total": total,
+            "next_cursor": next_cursor,
+            "items": [
+                {
+                    "id": r.get("id"),
+                    "created_at": r.get("created_at", ""),
+                    "comment": r.get("comment", ""),
+                    "collage_url": r.get("collage_url", ""),
+                }
+                for r in records
+            ],
+        }
+    )
+    response.set_etag(f"{student_etag(class_name, student_name)}-{cursor or ''}-{limit}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+# ====== 评语检索 ======
+
+@route("/api/search")
+def search_api():
+    """按关键词检索评语和学生姓名
+
+    参数: q（空格分隔多个关键词，需全部命中）, class, limit, offset
+    """
+    query = request.args.get("q", "").strip()
+    class_name = request.args.get("class") or None
+    if not query:
+        return jsonify({"error": "请提供检索关键词 q"}), 400
+    try:
+        limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "limit/offset 必须是整数"}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(offset, 0)
+
+    started = time.time()
+    records, total = get_search_index().search(query, class_name, limit, offset)
+    return jsonify(
+        {
+            "query": query,
+            "class": class_name,
+            "total": total,
+            "took_ms": round((time.time() - started) * 1000, 1),
+            "items": [
+                {
+                    "id": r.get("id"),
+                    "class": r.get("class", ""),
+                    "student": r.get("student", ""),
+                    "created_at": r.get("created_at", ""),
+                    "comment": r.get("comment", ""),
+                    "collage_url": r.get("collage_url", ""),
+                }
+                for r in records
+            ],
+        }
+    )
+
+
+# ====== 每日汇总页面 ======
+
+def _records_version_today():
+    """依赖当天日期和全部记录的页面的缓存版本"""
+    return (records_version(), datetime.now().strftime("%Y-%m-%d"))
+
+
+@route("/digest")
+@page_cache.cached(_records_version_today)
+def class_digest():
+    """家长查看某班某天的全班作品（汇总推送的落地页）"""
+    class_name = request.args.get("class", "")
+    date_str = request.args.get("date", "") or datetime.now().strftime("%Y-%m-%d")
+
+    records = filter_records(class_name=class_name, date_str=date_str) if class_name else []
+    records.sort(key=lambda x: x.get("created_at", ""))
+    montage_url = ensure_class_montage(class_name, date_str, records) if records else None
+
+    return render_template(
+        "digest.html",
+        class_name=class_name,
+        date_str=date_str,
+        records=records,
+        montage_url=montage_url,
+    )
+
+
+@route("/montage")
+def class_montage():
+    """全班作品墙（按班级和日期生成，重定向到图片地址）"""
+    class_name = request.args.get("class", "")
+    date_str = request.args.get("date", "") or datetime.now().strftime("%Y-%m-%d")
 
-    # 加载并过滤记录
-    all_records = load_records()
-    records = [
-        r
-        for r in all_records
-        if r.get("student") == student_name and r.get("class") == class_name
-    ]
-
-    # 按时间倒序排列
-    records.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-
-    html = f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{student_name}的成长档案 - {SCHOOL_NAME}</title>
-        <style>
-            * {{ margin:0; padding:0; box-sizing:border-box; font-family:"PingFang SC","Microsoft YaHei",sans-serif; }}
-            body {{ background:#f8f9fa; padding:15px; }}
-            .header {{ text-align:center; padding:20px 0; background:white; border-radius:16px; margin-bottom:20px; box-shadow:0 2px 10px rgba(0,0,0,0.05); }}
-            h1 {{ color:#e74c3c; font-size:24px; }}
-            .record {{ background:white; border-radius:16px; padding:20px; margin-bottom:15px; box-shadow:0 2px 8px rgba(0,0,0,0.08); }}
-            .record-date {{ color:#7f8c8d; font-size:14px; margin-bottom:10px; }}
-            .record-img {{ width:100%; border-radius:12px; margin:10px 0; }}
-            .record-comment {{ color:#27ae60; font-size:16px; padding:8px 0; }}
-            .tips {{ background:#e8f4fd; padding:15px; border-radius:12px; margin-top:20px; font-size:14px; }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>🎨 {student_name}的墨香成长</h1>
-            <p>{class_name} · 共 {len(records)} 次课堂记录</p>
-        </div>
-        
-        {''.join(f'''
-        <div class="record">
-            <div class="record-date">{r.get("created_at", "")[:16].replace("T", " ")}</div>
-            <img class="record-img" src="{r.get("collage_url", "")}" alt="课堂记录">
-            <div class="record-comment">📝 {r.get("comment", "")}</div>
-        </div>
-        ''' for r in records)}
-        
-        <div class="tips">
-            <strong>💡 小提示</strong><br>
-            • 长按图片可保存到手机<br>
-            • 点右上角「···」可分享给家人
-        </div>
-    </body>
-    </html>
-    '''
-
-    return html
+    montage_url = ensure_class_montage(class_name, date_str) if class_name else None
+    if not montage_url:
+        return jsonify({"error": "没有找到符合条件的记录"}), 404
+    return redirect(montage_url)
 
 
 # ====== 统计和导出页面 ======
 
-@app.route("/stats")
+@route("/stats")
+@page_cache.cached(_records_version_today)
 def stats_page():
     """统计信息页面"""
     try:
-        records = load_records()
-
-        if not records:
-            return '''
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>统计信息</title>
-                <style>
-                    * { margin:0; padding:0; box-sizing:border-box; font-family:"PingFang SC","Microsoft YaHei",sans-serif; }
-                    body { padding:20px; background:#f8f9fa; }
-                    .container { max-width:600px; margin:0 auto; background:white; border-radius:16px; padding:25px; box-shadow:0 4px 12px rgba(0,0,0,0.05); }
-                    h1 { color:#e74c3c; text-align:center; margin-bottom:20px; }
-                    .empty { text-align:center; color:#999; padding:20px; }
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <h1>📊 统计信息</h1>
-                    <div class="empty">暂无数据，请先在上传页提交记录。</div>
-                </div>
-            </body>
-            </html>
-            '''
-
-        # 计算统计数据
-        today = datetime.now().strftime("%Y-%m-%d")
-        today_records = [
-            r for r in records if r.get("created_at", "").startswith(today)
-        ]
-        ai_count = sum(1 for r in records if r.get("ai_generated"))
-
-        # 计算最活跃班级
-        class_counts = {}
-        for r in records:
-            class_name = r.get("class", "")
-            class_counts[class_name] = class_counts.get(class_name, 0) + 1
-        most_active_class = (
-            max(class_counts.items(), key=lambda x: x[1])
-            if class_counts
-            else ("", 0)
-        )
+        view = get_columnar_view()
+        if view is None:
+            # 未安装 numpy：逐条统计
+            return _stats_page_fallback()
 
-        # 计算 AI 使用率
-        ai_usage_rate = round(ai_count / len(records) * 100, 1) if records else 0
+        if not len(view):
+            return render_template("stats.html", empty=True)
 
-        # 计算平均 AI 评语长度
-        ai_records = [r for r in records if r.get("ai_generated")]
-        avg_ai_length = (
-            round(
-                sum(r.get("comment_length", 0) for r in ai_records) / len(ai_records),
-                1,
-            )
-            if ai_records
-            else 0
-        )
+        # 计数、分组和平均值都在列上向量化计算
+        today = datetime.now().strftime("%Y-%m-%d")
+        today_count = int(view.mask(date_str=today).sum())
+        ai_usage_rate = view.ai_usage_rate()
+        most_active_class = view.most_active_class()
+        avg_ai_length = view.avg_ai_comment_length()
 
         # 获取所有班级
         all_classes = get_all_classes()
-        class_buttons_html = "".join(
-            f'<a href="/export?class={quote(cls)}" class="btn btn-secondary" title="导出 {cls}">📤 {cls}</a>'
-            for cls in all_classes
+
+        # 按日期范围的时间序列（来自统计分桶，不扫描记录）
+        start, end, class_name = _stats_range_args()
+        series = get_stats_engine().query(start, end, class_name)
+
+        return render_template(
+            "stats.html",
+            empty=False,
+            today_count=today_count,
+            ai_usage_rate=ai_usage_rate,
+            most_active_class=most_active_class,
+            avg_ai_length=avg_ai_length,
+            all_classes=all_classes,
+            series=series,
+            selected_class=class_name or "",
         )
 
-        html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>统计信息</title>
-            <style>
-                * {{ margin:0; padding:0; box-sizing:border-box; font-family:"PingFang SC","Microsoft YaHei",sans-serif; }}
-                body {{ padding:20px; background:#f8f9fa; }}
-                .container {{ max-width:700px; margin:0 auto; }}
-                h1 {{ color:#e74c3c; text-align:center; margin-bottom:30px; font-size:28px; }}
-                h3 {{ color:#2c3e50; margin-top:25px; margin-bottom:12px; font-size:16px; }}
-                .stat-box {{ background:white; border-radius:12px; padding:20px; margin-bottom:15px; box-shadow:0 2px 8px rgba(0,0,0,0.05); }}
-                .stat-label {{ color:#666; font-size:14px; margin-bottom:8px; }}
-                .stat-value {{ color:#2c3e50; font-size:32px; font-weight:600; }}
-                .stat-unit {{ color:#999; font-size:14px; margin-left:8px; }}
-                .buttons {{ display:flex; flex-wrap:wrap; gap:10px; margin-top:20px; }}
-                .btn {{ flex:1; min-width:150px; background:#e74c3c; color:white; border:none; border-radius:8px; padding:12px; font-size:14px; cursor:pointer; text-decoration:none; text-align:center; }}
-                .btn:hover {{ background:#c0392b; }}
-                .btn-secondary {{ background:#3498db; min-width:auto; flex:0 1 auto; }}
-                .btn-secondary:hover {{ background:#2980b9; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>📊 统计信息</h1>
-                
-                <div class="stat-box">
-                    <div class="stat-label">今日提交总数</div>
-                    <div class="stat-value">{len(today_records)} <span class="stat-unit">条</span></div>
-                </div>
-                
-                <div class="stat-box">
-                    <div class="stat-label">AI 使用率</div>
-                    <div class="stat-value">{ai_usage_rate} <span class="stat-unit">%</span></div>
-                </div>
-                
-                <div class="stat-box">
-                    <div class="stat-label">最活跃班级</div>
-                    <div class="stat-value">{most_active_class[0]} <span class="stat-unit">({most_active_class[1]}条)</span></div>
-                </div>
-                
-                <div class="stat-box">
-                    <div class="stat-label">平均 AI 评语长度</div>
-                    <div class="stat-value">{avg_ai_length} <span class="stat-unit">字</span></div>
-                </div>
-                
-                <h3>按班级导出</h3>
-                <div class="buttons">
-                    {class_buttons_html}
-                </div>
-                
-                <h3>全量导出</h3>
-                <div class="buttons">
-                    <a href="/export" class="btn">📋 导出所有记录</a>
-                    <a href="/upload" class="btn">📱 返回上传</a>
-                </div>
-            </div>
-        </body>
-        </html>
-        '''
-        return html
+    except ValueError as e:
+        # 错误信息含用户输入，交给模板转义
+        return render_template("stats.html", error=str(e)), 400
 
     except Exception as e:
-        logger.error(f"❌ 统计页面错误: {str(e)}")
-        return f"<p>错误: {str(e)}</p>"
+        logger.error("❌ 统计页面错误: %s", e)
+        return render_template("stats.html", error="统计页面加载失败，请稍后重试"), 500
+
+
+def _stats_page_fallback():
+    """统计信息页面（未安装 numpy 时逐条遍历记录）"""
+    records = load_all_records()
+    if not records:
+        return render_template("stats.html", empty=True)
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    today_records = [r for r in records if r.get("created_at", "").startswith(today)]
+
+    class_counts = {}
+    for r in records:
+        class_name = r.get("class", "")
+        class_counts[class_name] = class_counts.get(class_name, 0) + 1
+
+    ai_records = [r for r in records if r.get("ai_generated")]
+    start, end, class_name = _stats_range_args()
+    return render_template(
+        "stats.html",
+        empty=False,
+        today_count=len(today_records),
+        ai_usage_rate=round(len(ai_records) / len(records) * 100, 1),
+        most_active_class=max(class_counts.items(), key=lambda x: x[1]),
+        avg_ai_length=(
+            round(sum(r.get("comment_length", 0) for r in ai_records) / len(ai_records), 1)
+            if ai_records
+            else 0
+        ),
+        all_classes=get_all_classes(),
+        series=get_stats_engine().query(start, end, class_name),
+        selected_class=class_name or "",
+    )
+
+
+def _stats_range_args():
+    """读取统计日期范围参数 start/end/class（日期格式错误或范围超过 STATS_MAX_RANGE_DAYS 天时抛出 ValueError）"""
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    dates = {}
+    for name, value in (("start", start), ("end", end)):
+        if value:
+            try:
+                dates[name] = datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"日期格式错误（应为 YYYY-MM-DD）: {value}") from None
+    if start:
+        end_date = dates.get("end") or datetime.now()
+        if dates["start"] > end_date:
+            raise ValueError("开始日期晚于结束日期")
+        if (end_date - dates["start"]).days >= STATS_MAX_RANGE_DAYS:
+            raise ValueError(f"日期范围不能超过 {STATS_MAX_RANGE_DAYS} 天")
+    return start, end, request.args.get("class") or None
+
+
+@route("/api/stats/timeseries")
+def stats_timeseries():
+    """按天的提交量、AI 成功率和耗时分位数（参数：start、end、class）"""
+    try:
+        start, end, class_name = _stats_range_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(get_stats_engine().query(start, end, class_name))
 
 
-@app.route("/export")
+@route("/export")
 def export_csv():
     """CSV 导出接口"""
     try:
@@ -499,29 +654,216 @@ def export_csv():
         }
 
     except Exception as e:
-        logger.error(f"❌ CSV 导出失败: {str(e)}")
+        logger.error("❌ CSV 导出失败: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@route("/api/outbox")
+def outbox_status():
+    """推送队列状态（待发送/失败数量）和本进程视角的各群健康状态"""
+    targets = get_router().health()
+    if not WECHAT_OUTBOX_ENABLED:
+        return jsonify({"enabled": False, "targets": targets})
+    return jsonify({"enabled": True, **get_outbox().stats(), "targets": targets})
+
+
+# ====== 管理接口 ======
+
+def _admin_denied():
+    """校验管理令牌（请求头 X-Admin-Token），通过时返回 None"""
+    if not ADMIN_TOKEN:
+        return jsonify({"success": False, "msg": "管理接口未启用"}), 404
+    token = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        return jsonify({"success": False, "msg": "管理令牌无效"}), 403
+    return None
+
+
+@route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """GET 列出最近的剖析结果；POST 在后台开始剖析
+
+    参数：seconds（时长）、memory=1（统计 tracemalloc）、idle=1（计入等待中的线程）、
+    pid（指定同一服务下的 worker，默认为处理本请求的 worker）
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == "GET":
+        return jsonify({"pid": os.getpid(), "profiles": list_profiles()})
+
+    try:
+        seconds = float(request.args.get("seconds", PROFILE_DEFAULT_SECONDS))
+        pid = int(request.args.get("pid", os.getpid()))
+    except ValueError:
+        return jsonify({"success": False, "msg": "seconds 或 pid 格式错误"}), 400
+
+    ok, result = request_profile(
+        pid, seconds, request.args.get("memory") == "1", request.args.get("idle") == "1"
+    )
+    if not ok:
+        return jsonify({"success": False, "msg": result}), 409
+    return jsonify({
+        "success": True,
+        "id": result,
+        "pid": pid,
+        "result_url": url_for("admin_profile_result", profile_id=result),
+    }), 202
+
+
+@route("/admin/profile/<profile_id>")
+def admin_profile_result(profile_id):
+    """剖析结果：默认返回折叠栈，?format=memory 返回内存报告，?format=json 返回状态"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    status = profile_status(profile_id)
+    if status is None:
+        return jsonify({"success": False, "msg": "剖析结果不存在"}), 404
+
+    fmt = request.args.get("format", "collapsed")
+    if fmt == "json" or status["status"] != "done":
+        return jsonify(status), 200 if status["status"] != "running" else 202
+
+    path = profile_path(profile_id, "memory.txt" if fmt == "memory" else "collapsed")
+    if not os.path.exists(path):
+        return jsonify({"success": False, "msg": "本次剖析没有该结果"}), 404
+    with open(path, "r", encoding="utf-8") as f:
+        response = make_response(f.read())
+    response.headers["Content-Type"] = "text/plain; charset=utf-8"
+    if fmt != "memory":
+        response.headers["Content-Disposition"] = f"attachment; filename={profile_id}.collapsed"
+    return response
+
+
+# ====== 监控指标 ======
+
+def _outbox_items():
+    stats = get_outbox().stats()
+    return {("pending",): stats["pending"], ("failed",): stats["failed"]}
+
+
+if WECHAT_OUTBOX_ENABLED:
+    register_gauge("classroom_outbox_items", "推送队列中的消息数（按状态）", _outbox_items, ("status",))
+    register_gauge(
+        "classroom_outbox_oldest_pending_seconds",
+        "推送队列中最早一条待发送消息的等待时间",
+        lambda: get_outbox().stats()["oldest_pending_age"],
+    )
+
+
+@route("/metrics")
+def metrics():
+    """Prometheus 指标（汇总所有 worker 进程）"""
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@route("/readyz")
+def readyz():
+    """就绪检查：本 worker 的预热（字体、模板、记录索引、模型）完成后返回 200，否则 503"""
+    status = readiness()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
 # ====== 静态文件服务 ======
 
-@app.route("/<path:filename>")
+# 上传目录中的图片文件名：p_/w_/c_/m_ 前缀 + 随机或内容派生的 ID
+UPLOAD_FILENAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+\.jpg$")
+
+
+@route("/<path:filename>")
 def serve_file(filename):
-    """提供上传的图片文件"""
-    if filename.endswith(".jpg"):
-        return send_from_directory(UPLOAD_FOLDER, filename)
-    return "文件不存在", 404
+    """提供上传的图片文件
+
+    拼图/作品墙（c_/m_）写入后内容不变，按不可变资源长期缓存；
+    姿势/作品原图（p_/w_）之后会被维护任务原地压缩，只短期缓存，过期后条件请求重新验证。
+    FILE_SERVE_MODE=nginx 时只做校验，由 nginx 通过 X-Accel-Redirect 发送文件，
+    不占用 Python worker；否则由 Flask 发送并支持 ETag / If-Modified-Since 条件请求。
+    """
+    if not UPLOAD_FILENAME_PATTERN.match(filename):
+        return "文件不存在", 404
+    if not os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+        return "文件不存在", 404
+
+    immutable = not filename.startswith(("p_", "w_"))
+    max_age = UPLOAD_CACHE_MAX_AGE if immutable else ORIGINAL_CACHE_MAX_AGE
+
+    if FILE_SERVE_MODE == "nginx":
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = f"{X_ACCEL_PREFIX}{filename}"
+        response.headers["Content-Type"] = "image/jpeg"
+    else:
+        # 相对路径会被 Flask 按包目录解析，这里按工作目录取绝对路径
+        response = send_from_directory(
+            os.path.abspath(UPLOAD_FOLDER), filename, max_age=max_age, conditional=True, etag=True
+        )
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    return response
+
+
+# ====== 应用创建 ======
+
+def create_app():
+    """创建 Flask 应用
+
+    有副作用的初始化都在这里：配置日志、创建上传目录、注册剖析信号。
+    gunicorn --preload 时在 master 中执行一次，worker fork 后直接共享已导入的模块；
+    各 worker 的后台线程（日志写出、指标刷新、推送调度）在 fork 后按需重新启动。
+
+    Returns:
+        Flask 应用
+    """
+    # 配置日志（队列异步写出，LOG_LEVEL / LOG_LEVELS / LOG_FORMAT 控制级别和格式）
+    setup_logging()
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+    app = Flask(__name__)
+    # 静态文件 URL 带内容哈希（见 static_url），可长期缓存
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_CACHE_MAX_AGE
+    # 模板渲染耗时计入 render 阶段（Server-Timing、慢请求日志）
+    connect_template_timing(app)
+    app.add_template_filter(_short_time, "short_time")
+    for kind, func in _hooks:
+        getattr(app, kind)(func)
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+    # kill -USR2 <worker pid> 触发剖析（gunicorn 未开启 preload 时在 worker 主线程创建应用）
+    install_signal_handler()
+    return app
+
+
+def get_app():
+    """全局应用实例（第一次调用时创建）"""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+
+def __getattr__(name):
+    # 兼容 `from classroom_mvp.app import app`
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ====== 应用启动 ======
 
 if __name__ == "__main__":
+    from .warmup import warm_up
+
+    app = create_app()
+    warm_up(app)
     logger.info("\n🚀 雅趣智能课堂反馈MVP已启动！")
-    logger.info(f"📱 教师上传地址: {DOMAIN}/upload")
+    logger.info("📱 教师上传地址: %s/upload", DOMAIN)
     logger.info("📁 💡 请通过公网IP访问,非 localhost")
     logger.info("⚠️ 重要部署提示 (首次运行后):")
     logger.info("1. 申请企业微信机器人: 群主在企业微信→群→右上角···→群机器人→添加")
-    logger.info("2. 替换代码中的 WECHAT_WEBHOOK 为您的机器人地址")
+    logger.info("2. 设置环境变量 WECHAT_WEBHOOK 为您的机器人地址（多个班级群见 wechat_routes.json）")
     logger.info("3. 将 DOMAIN 改为您的服务器公网IP或域名")
     logger.info("4. 云服务器需开放 5000 端口 (安全组规则)")
 
@@ -0,0 +1,208 @@
+"""
+ASGI 入口 - 异步处理提交接口，其余路由仍由 Flask 应用处理
+
+功能职责：
+- POST /api/submit - 异步版本：等待 DashScope 时不占用线程（httpx），拼图交给渲染进程池，
+  文件读写、推送、保存记录放到线程池；单个进程可同时处理数百个进行中的提交
+- 其余路由原样挂载 Flask 应用（a2wsgi，在 ASGI_WSGI_THREADS 个线程中执行）
+- 共享的 httpx.AsyncClient 连接池，在 lifespan 中创建和关闭
+- lifespan 中补做启动预热（gunicorn preload 时已在 master 中完成）
+
+提交流程、返回内容、Server-Timing 阶段和慢请求日志与 Flask 版本一致。
+
+用法:
+    uvicorn classroom_mvp.asgi:app --host 0.0.0.0 --port 8000
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 -b 0.0.0.0:8000 classroom_mvp.asgi:app
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from .config import (
+    DOMAIN,
+    WECHAT_OUTBOX_ENABLED,
+    WECHAT_PUSH_MODE,
+    AI_HTTP_TIMEOUT,
+    ASGI_WSGI_THREADS,
+    ASGI_IO_THREADS,
+    ASGI_HTTP_MAX_CONNECTIONS,
+)
+from .app import (
+    get_app,
+    DEFAULT_COMMENT,
+    new_submission_paths,
+    push_submission,
+    build_submission,
+    submission_response,
+)
+from .ai_engine import generate_ai_comment_async
+from .data_manager import save_record
+from .image_processor import create_collage, image_info, render_in_pool_async
+from .wechat_notifier import build_article
+from .wechat_outbox import get_outbox
+from .warmup import warm_up
+from .timing import stage, new_timer, use_timer, record_input, annotate, log_timer_if_slow
+from .metrics import REQUEST_SECONDS, REQUESTS, IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+def _save_upload(upload, path):
+    """把上传的文件（临时文件）写入 path，返回图片信息"""
+    upload.file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    return image_info(path)
+
+
+async def _submit(request):
+    """提交流程（与 app.submit_record 相同的步骤），返回 JSON 内容"""
+    # 1. 接收并解析表单（图片超过 1MB 时落到临时文件）
+    with stage("parse"):
+        form = await request.form()
+    try:
+        missing = [name for name in ("class_name", "student_name", "posture", "work") if name not in form]
+        if missing:
+            return {"success": False, "msg": f"缺少字段: {'、'.join(missing)}"}
+        class_name = form["class_name"]
+        student_name = form["student_name"]
+        comment = (form.get("comment") or "").strip()  # 允许空值
+        posture = form["posture"]
+        work = form["work"]
+
+        # 2. 生成唯一ID和文件名
+        uid, posture_path, work_path, collage_path = new_submission_paths()
+
+        # 3. 保存原始照片
+        with stage("upload"):
+            posture_info, work_info = await asyncio.gather(
+                asyncio.to_thread(_save_upload, posture, posture_path),
+                asyncio.to_thread(_save_upload, work, work_path),
+            )
+        record_input("posture", **posture_info)
+        record_input("work", **work_info)
+    finally:
+        await form.close()
+
+    # 4. 如果教师没有输入评语，调用AI生成
+    ai_comment = None
+    generation_time_ms = 0
+    ai_requested = not comment
+    annotate(
+        class_name=class_name,
+        ai_requested=ai_requested,
+        push_mode=WECHAT_PUSH_MODE,
+        outbox=WECHAT_OUTBOX_ENABLED,
+        asgi=True,
+    )
+    if ai_requested:
+        with stage("ai"):
+            ai_comment, ai_error, generation_time_ms = await generate_ai_comment_async(
+                work_path, student_name, style="warm", client=request.app.state.http
+            )
+        annotate(ai_ok=ai_comment is not None, ai_error=ai_error)
+        if ai_comment:
+            comment = ai_comment
+        else:
+            # AI生成失败，使用默认评语
+            comment = DEFAULT_COMMENT
+            generation_time_ms = 0
+
+    # 5. 生成拼图（渲染进程池，不阻塞事件循环）
+    with stage("collage"):
+        collage_success = await render_in_pool_async(
+            create_collage, posture_path, work_path, collage_path, class_name, student_name, comment
+        )
+    if not collage_success:
+        return {"success": False, "msg": "拼图生成失败"}
+
+    # 6. 发送到企业微信（入队或并发推送都在线程中执行，push 阶段在线程内计时）
+    image_url = f"{DOMAIN}/{os.path.basename(collage_path)}"
+    article = build_article(class_name, student_name, comment, image_url)
+    pushed, push_msg = await asyncio.to_thread(push_submission, class_name, article)
+    if not pushed:
+        return {"success": False, "msg": push_msg}
+
+    # 7. 保存到本地数据库
+    record = build_submission(
+        uid, class_name, student_name, comment, ai_comment, ai_requested,
+        generation_time_ms, posture_path, work_path, collage_path,
+    )
+    with stage("save"):
+        saved = await asyncio.to_thread(save_record, record)
+    if not saved:
+        return {"success": False, "msg": "记录保存失败，请联系管理员检查记录文件"}
+
+    return submission_response(uid, class_name, student_name, comment, ai_comment, push_msg)
+
+
+async def submit_record(request):
+    """核心API（异步）- 处理上传、生成拼图、推送企业微信、保存数据"""
+    timer = new_timer(request.headers.get("X-Request-ID"))
+    token = use_timer(timer)
+    started = time.perf_counter()
+    IN_FLIGHT.inc()
+    try:
+        try:
+            result = await _submit(request)
+        except Exception as e:
+            logger.error("❌ 提交记录失败: %s", e)
+            result = {"success": False, "msg": str(e)}
+
+        response = JSONResponse(result)
+        response.headers["X-Request-ID"] = timer.request_id
+        if timer.stages:
+            response.headers["Server-Timing"] = timer.header()
+
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="submit_record")
+        REQUESTS.inc(endpoint="submit_record", status=response.status_code)
+        content_length = request.headers.get("content-length")
+        log_timer_if_slow(
+            timer,
+            request.method,
+            request.url.path,
+            "submit_record",
+            response.status_code,
+            request_bytes=int(content_length) if content_length else None,
+            response_bytes=len(response.body),
+        )
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        token.var.reset(token)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """启动时设置线程池、推送调度线程和共享连接池，完成预热后才开始接收请求"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASGI_IO_THREADS, thread_name_prefix="asgi-io")
+    )
+    await asyncio.to_thread(warm_up)
+    if WECHAT_OUTBOX_ENABLED:
+        get_outbox().start()
+    limits = httpx.Limits(max_connections=ASGI_HTTP_MAX_CONNECTIONS)
+    async with httpx.AsyncClient(timeout=AI_HTTP_TIMEOUT, limits=limits) as client:
+        app.state.http = client
+        logger.info("⚡ ASGI 入口已启动 (pid=%s)", os.getpid())
+        yield
+
+
+app = Starlette(
+    routes=[
+        Route("/api/submit", submit_record, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(get_app(), workers=ASGI_WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
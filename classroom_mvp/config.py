@@ -15,26 +15,170 @@ load_dotenv()
 
 # ====== API 和认证配置 ======
 DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
+# DashScope 接口地址（默认使用 SDK 内置地址；压测时指向 loadtest/mock_dashscope.py，
+# 如 http://127.0.0.1:9100/api/v1）
+DASHSCOPE_BASE_URL = os.getenv("DASHSCOPE_BASE_URL")
 
 # ====== 企业微信配置 ======
-WECHAT_WEBHOOK = "https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key=51a874dd-0727-4ce9-895e-8b090a4c3536"
+# 默认群机器人（未在路由表中配置的班级推送到这里）
+WECHAT_WEBHOOK = os.getenv(
+    "WECHAT_WEBHOOK",
+    "https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key=51a874dd-0727-4ce9-895e-8b090a4c3536",
+)
+
+# ====== 班级 → 家长群路由 ======
+# JSON 文件：{"targets": {名称: {"url": ..., "rate_limit_per_minute": ...}},
+#            "routes": {班级: [目标名称或 webhook 地址, ...]}, "default": [...]}
+WECHAT_ROUTES_FILE = os.getenv("WECHAT_ROUTES_FILE", "wechat_routes.json")
+WECHAT_FANOUT_WORKERS = 8
+# 单个群连续失败达到阈值后暂停推送（秒），避免拖慢其他群
+WECHAT_TARGET_FAILURE_THRESHOLD = 3
+WECHAT_TARGET_COOLDOWN = 60
+
+# ====== 推送模式 ======
+# instant: 每次提交推送一张卡片；digest: 当天记录汇总，由定时任务每班推送一条
+WECHAT_PUSH_MODE = os.getenv("WECHAT_PUSH_MODE", "instant")
+DIGEST_STATE_FILE = "digest_state.json"
+# 汇总消息中单独展示的学生卡片数（加上汇总卡片共不超过 8 篇）
+DIGEST_MAX_STUDENT_ARTICLES = 7
+
+# ====== 企业微信推送队列（outbox）======
+# 开启后提交立即返回，推送由后台线程按频率限制发送
+WECHAT_OUTBOX_ENABLED = os.getenv("WECHAT_OUTBOX_ENABLED", "1") == "1"
+WECHAT_OUTBOX_FILE = "outbox.json"
+# 群机器人限制约 20 条/分钟：令牌桶 18 条/分钟 + 突发 2 条，任意 60 秒内不超过 20 条
+WECHAT_RATE_LIMIT_PER_MINUTE = 18
+WECHAT_RATE_BURST = 2
+# 合并推送：一条 news 消息最多 8 篇图文，等待窗口内的卡片会被合并
+WECHAT_BATCH_MAX_ARTICLES = 8
+WECHAT_BATCH_WINDOW = 3
+# 失败重试：指数退避（秒），超过最大次数标记为失败
+WECHAT_MAX_ATTEMPTS = 8
+WECHAT_RETRY_BASE_DELAY = 5
+WECHAT_RETRY_MAX_DELAY = 300
 
 # ====== 应用配置 ======
 SCHOOL_NAME = "雅趣堂书画"
 DOMAIN = "https://class.cangfengge.com"
-UPLOAD_FOLDER = 'uploads'
+UPLOAD_FOLDER = 'uploads'  # create_app() 时创建
+
+# ====== 上传图片服务 ======
+# flask: Flask 直接发送文件；nginx: Flask 只校验文件名，返回 X-Accel-Redirect 由 nginx 发送
+FILE_SERVE_MODE = os.getenv("FILE_SERVE_MODE", "flask")
+# nginx 中 internal location 的前缀（见 deploy-nginx.sh）
+X_ACCEL_PREFIX = "/_protected_uploads/"
+# 拼图/作品墙（c_/m_）文件名含随机或内容派生的 ID，写入后内容不变，可长期缓存
+UPLOAD_CACHE_MAX_AGE = 365 * 24 * 3600
+# 姿势/作品原图（p_/w_）会被维护任务原地压缩（见 ORIGINAL_SHRINK_AFTER_DAYS），
+# 只缓存较短时间，过期后凭 ETag / Last-Modified 重新验证
+ORIGINAL_CACHE_MAX_AGE = 24 * 3600
 
 # ====== 数据库配置 ======
 RECORDS_FILE = "records.json"
 
+# ====== 数据保留与清理（python -m classroom_mvp.maintenance）======
+# 超过 N 天的记录移入按月压缩的冷数据段 cold/records-YYYY-MM.json.gz，档案和导出仍可读取
+RETENTION_HOT_DAYS = int(os.getenv("RETENTION_HOT_DAYS", "180"))
+COLD_FOLDER = "cold"
+# 每个进程缓存最近读取的冷数据段数
+COLD_SEGMENT_CACHE = 12
+MAINTENANCE_STATE_FILE = "maintenance_state.json"
+# 姿势/作品原图超过 N 天后缩小并重新压缩（拼图不变）
+ORIGINAL_SHRINK_AFTER_DAYS = 7
+ORIGINAL_MAX_SIDE = 1600
+ORIGINAL_JPEG_QUALITY = 80
+# 没有记录引用的上传文件超过 N 小时后删除（留出提交进行中的时间）
+UPLOAD_GC_GRACE_HOURS = 24
+# 每次运行每个步骤最多检查的文件数 / 最多归档的记录数（限制单次 I/O）
+MAINTENANCE_MAX_FILES = 500
+MAINTENANCE_MAX_RECORDS = 5000
+
+# ====== 统计时间序列 ======
+# 按 (日期, 班级) 分桶的统计数据，增量更新，查询时不扫描原始记录
+STATS_FILE = "stats.json"
+# 统计页默认展示最近 N 天
+STATS_DEFAULT_DAYS = 14
+# 单次查询最多 N 天（按天合并分桶，范围过大时拒绝）
+STATS_MAX_RANGE_DAYS = 366
+
+# ====== 学生档案分页 ======
+ARCHIVE_PAGE_SIZE = 10
+ARCHIVE_MAX_PAGE_SIZE = 50
+
+# ====== 评语全文检索 ======
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# ====== 页面缓存 ======
+# 页面响应缓存条数（按 路由+参数+数据版本）
+PAGE_CACHE_SIZE = 512
+# 静态样式 URL 带内容哈希，可长期缓存
+STATIC_CACHE_MAX_AGE = 365 * 24 * 3600
+
 # ====== AI 调用参数 ======
 AI_MAX_RETRIES = 2
 AI_RETRY_DELAY = 1
 AI_MODEL = "qwen-vl-max"
+# 异步入口（classroom_mvp.asgi）直接请求 DashScope 接口的超时（秒）
+AI_HTTP_TIMEOUT = 60
 
 # ====== 图片处理配置 ======
 COLLAGE_TARGET_WIDTH = 750
 COLLAGE_BOTTOM_HEIGHT = 250
 
-# 创建上传目录
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# ====== 全班作品墙（montage）配置 ======
+# 每格按 tile 尺寸缩放已生成的拼图，JPEG 解码时直接降采样，内存只占画布 + 单张缩略图
+MONTAGE_COLUMNS = 5
+MONTAGE_TILE_WIDTH = 240
+MONTAGE_TILE_HEIGHT = 400
+MONTAGE_HEADER_HEIGHT = 90
+# 渲染进程池大小（拼图/作品墙等 CPU 密集任务）
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", "2"))
+RENDER_TIMEOUT = 60
+
+# ====== ASGI 入口（classroom_mvp.asgi）======
+# 挂载的 Flask 路由在该大小的线程池中执行
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+# 异步提交中的文件读写、记录保存、推送入队在该大小的线程池中执行
+ASGI_IO_THREADS = int(os.getenv("ASGI_IO_THREADS", "32"))
+# 共享 HTTP 连接池上限（DashScope）
+ASGI_HTTP_MAX_CONNECTIONS = 200
+
+# ====== 启动预热（classroom_mvp.warmup，gunicorn.conf.py）======
+# 为 0 时不预热，/readyz 直接返回就绪
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+# 启用 InkSight 笔迹识别时预热加载模型权重（gunicorn preload 时在 master 中加载一次，worker 共享）
+INKSIGHT_ENABLED = os.getenv("INKSIGHT_ENABLED", "0") == "1"
+# cpu 时权重在 master 中加载、worker 共享；cuda/mps 不能在 fork 前初始化，由每个 worker 各自加载
+INKSIGHT_DEVICE = os.getenv("INKSIGHT_DEVICE", "cpu")
+
+# ====== 监控指标 ======
+# 每个 worker 进程定期把指标写入该目录，/metrics 汇总所有进程（部署时每次启动前可清空）
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+METRICS_FLUSH_INTERVAL = 2
+
+# ====== 日志 ======
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# 按模块覆盖级别，如 "classroom_mvp.data_manager=WARNING,dashscope=ERROR"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# text（默认）或 json（每行一个 JSON，便于日志系统检索）
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# 日志队列容量，写出跟不上时丢弃新日志而不阻塞请求
+LOG_QUEUE_SIZE = 10000
+
+# ====== 慢请求日志 ======
+# 总耗时超过该值（毫秒）的请求连同各阶段耗时、输入大小写入 JSONL 日志
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "5000"))
+SLOW_LOG_FILE = os.getenv("SLOW_LOG_FILE", "slow_requests.jsonl")
+# 超过该大小时轮转为 .1
+SLOW_LOG_MAX_BYTES = 20 * 1024 * 1024
+
+# ====== 管理接口与性能剖析 ======
+# 管理接口令牌（请求头 X-Admin-Token）；未设置时 /admin/* 不可用
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_DIR = "profiles"
+PROFILE_INTERVAL_MS = 10
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 120
+# tracemalloc 报告的代码行数
+PROFILE_MEMORY_TOP = 30
@@ -2,21 +2,44 @@
 数据管理模块 - 记录加载、筛选、导出
 
 功能职责：
-- load_records() - 从 JSON 加载记录
+- load_records() - 从 JSON 加载记录（转换为 Record 对象）
 - filter_records() - 按班级/日期筛选
 - records_to_csv() - 转换为 CSV 格式
-- save_record() - 保存单条记录到文件
+- save_record() - 保存单条记录到文件（跨进程加锁，原子替换，文件损坏时拒绝写入）
+- records_lock() / read_records_strict() / write_records() - 记录文件读-改-写的锁和读写原语
+- query_student_records() - 按 (班级, 学生) 索引分页查询档案
+- student_etag() - 学生档案版本号（有新记录时变化）
+- records_version() - 记录版本（热记录文件 + 冷数据目录，用于缓存失效）
+- records_since() - 读取某条记录之后追加的新记录（增量统计）
+- register_save_hook() - 注册保存回调（如检索索引增量更新）
+- load_cold_records() / load_all_records() - 读取冷数据段（已归档的旧记录）/ 冷 + 热全部记录
+- merge_cold_records() - 已读取的热记录补上冷数据段（归档中断时两处重复的记录以热记录为准）
+- get_columnar_view() - 全部记录的 NumPy 列式视图（统计和导出筛选向量化，记录变化时重建）
 """
 
 import os
 import json
 import csv
+import glob
+import gzip
+import base64
+import hashlib
 import logging
+import threading
+from bisect import bisect_left
+from functools import lru_cache
 from io import StringIO
-from .config import RECORDS_FILE
+from .config import RECORDS_FILE, ARCHIVE_PAGE_SIZE, COLD_FOLDER, COLD_SEGMENT_CACHE
+from .record import Record
+from .analytics import ColumnarView, HAS_NUMPY
+from .storage import atomic_write_json, file_lock
+from .metrics import CACHE_REQUESTS
 
 logger = logging.getLogger(__name__)
 
+# 保存记录后的回调：hook(records, stamp)，records 为保存后的全部记录
+_save_hooks = []
+
 
 def load_records(db_path=RECORDS_FILE):
     """统一读取 records.json 文件
@@ -25,24 +48,122 @@ def load_records(db_path=RECORDS_FILE):
         db_path: 记录文件路径
 
     Returns:
-        记录列表
+        Record 列表（任意存储版本的记录都转换为当前版本）
     """
     if not os.path.exists(db_path):
-        logger.info(f"ℹ️ 记录文件不存在: {db_path}")
+        logger.info("ℹ️ 记录文件不存在: %s", db_path)
+        return []
+
+    try:
+        records = read_records_strict(db_path)
+        logger.debug("✅ 成功加载 %s 条记录", len(records))
+        return records
+    except Exception as e:
+        logger.error("❌ 读取记录失败: %s", e)
+        return []
+
+
+def read_records_strict(db_path):
+    """读取记录文件；文件不存在返回空列表，文件损坏时抛出异常（写入前必须用它读取）"""
+    if not os.path.exists(db_path):
         return []
+    with open(db_path, "r", encoding="utf-8") as f:
+        return [Record.from_dict(d) for d in json.load(f)]
+
+
+def records_lock(db_path=RECORDS_FILE):
+    """记录文件的跨进程写锁（所有读-改-写记录文件的操作都要持有）
+
+    只有写者之间互斥；读者直接读取，原子替换保证读到完整文件。
+    """
+    return file_lock(f"{db_path}.lock")
+
 
+def write_records(records, db_path=RECORDS_FILE):
+    """原子地写入全部记录（调用方需持有 records_lock）"""
+    atomic_write_json(db_path, dump_records(records), indent=2)
+
+
+# ====== 冷数据段 ======
+# 维护任务把旧记录按月移入 cold/records-YYYY-MM.json.gz（见 maintenance.py）
+
+def cold_segment_path(month, cold_folder=COLD_FOLDER):
+    """某月冷数据段路径（month 格式 YYYY-MM）"""
+    return os.path.join(cold_folder, f"records-{month}.json.gz")
+
+
+@lru_cache(maxsize=COLD_SEGMENT_CACHE)
+def _read_cold_segment(path, mtime_ns):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return tuple(Record.from_dict(d) for d in json.load(f))
+
+
+def read_cold_segment(path):
+    """读取单个冷数据段（按文件修改时间缓存），不存在时返回空列表"""
     try:
-        with open(db_path, "r", encoding="utf-8") as f:
-            records = json.load(f)
-            logger.info(f"✅ 成功加载 {len(records)} 条记录")
-            return records
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return []
+    try:
+        return list(_read_cold_segment(path, mtime_ns))
     except Exception as e:
-        logger.error(f"❌ 读取记录失败: {str(e)}")
+        logger.error("❌ 读取冷数据段失败 %s: %s", path, e)
         return []
 
 
+def load_cold_records(month=None, cold_folder=COLD_FOLDER):
+    """读取已归档的冷数据
+
+    Args:
+        month: 只读取该月（YYYY-MM），为 None 表示全部
+        cold_folder: 冷数据目录
+
+    Returns:
+        记录列表（按月份升序）
+    """
+    if month:
+        return read_cold_segment(cold_segment_path(month, cold_folder))
+
+    records = []
+    for path in sorted(glob.glob(os.path.join(cold_folder, "records-*.json.gz"))):
+        records.extend(read_cold_segment(path))
+    return records
+
+
+def load_all_records(db_path=RECORDS_FILE, month=None):
+    """读取冷数据段 + 热记录文件
+
+    归档过程中途中断时同一条记录可能同时存在于两处，以热记录为准。
+
+    Args:
+        db_path: 热记录文件路径
+        month: 只读取该月的冷数据段（YYYY-MM），为 None 表示全部
+
+    Returns:
+        记录列表（冷数据在前）
+    """
+    return merge_cold_records(load_records(db_path), month)
+
+
+def merge_cold_records(hot, month=None):
+    """冷数据段 + 已读取的热记录（同一条记录两处都有时以热记录为准）
+
+    Args:
+        hot: 热记录列表
+        month: 只读取该月的冷数据段（YYYY-MM），为 None 表示全部
+
+    Returns:
+        记录列表（冷数据在前）
+    """
+    cold = load_cold_records(month)
+    if not cold:
+        return hot
+    hot_ids = {r.get("id") for r in hot}
+    return [r for r in cold if r.get("id") not in hot_ids] + hot
+
+
 def filter_records(class_name=None, date_str=None):
-    """按条件筛选记录
+    """按条件筛选记录（包含已归档的冷数据）
 
     Args:
         class_name: 班级名称，为None表示不筛选
@@ -51,16 +172,27 @@ def filter_records(class_name=None, date_str=None):
     Returns:
         筛选后的记录数组
     """
-    records = load_records()
+    view = get_columnar_view()
+    if view is not None:
+        try:
+            result = view.select(view.mask(class_name, date_str))
+            logger.debug("按班级/日期筛选: %s %s -> %s 条记录", class_name or '-', date_str or '-', len(result))
+            return result
+        except ValueError:
+            # 日期不是 YYYY / YYYY-MM / YYYY-MM-DD 时按前缀逐条匹配
+            pass
+
+    # 指定日期时只需要读取该月的冷数据段
+    records = load_all_records(month=date_str[:7] if date_str else None)
     result = records
 
     if class_name:
         result = [r for r in result if r.get("class") == class_name]
-        logger.info(f"按班级筛选: {class_name} -> {len(result)} 条记录")
+        logger.debug("按班级筛选: %s -> %s 条记录", class_name, len(result))
 
     if date_str:
         result = [r for r in result if r.get("created_at", "").startswith(date_str)]
-        logger.info(f"按日期筛选: {date_str} -> {len(result)} 条记录")
+        logger.debug("按日期筛选: %s -> %s 条记录", date_str, len(result))
 
     return result
 
@@ -103,42 +235,224 @@ def records_to_csv(records):
         }
         writer.writerow(row)
 
-    logger.info(f"✅ 成功转换 {len(records)} 条记录为 CSV")
+    logger.debug("✅ 成功转换 %s 条记录为 CSV", len(records))
     return csv_output.getvalue()
 
 
+def dump_records(records):
+    """Record 列表转换为当前存储格式的 dict 列表（写文件前调用）"""
+    return [r.to_dict() for r in records]
+
+
 def save_record(record, db_path=RECORDS_FILE):
     """保存单条记录到文件
 
     Args:
-        record: 记录字典
+        record: 记录字典或 Record
         db_path: 记录文件路径
 
     Returns:
         bool: 保存是否成功
     """
     try:
-        records = load_records(db_path)
-        records.append(record)
+        record = Record.from_dict(record)
+        with records_lock(db_path):
+            # 读取失败（文件损坏）时直接失败，不能用空列表覆盖历史记录
+            records = read_records_strict(db_path)
+            records.append(record)
+            write_records(records, db_path)
+            stamp = records_version(db_path)
 
-        with open(db_path, "w", encoding="utf-8") as f:
-            json.dump(records, f, ensure_ascii=False, indent=2)
-
-        logger.info(f"✅ 记录保存成功: {record.get('id')}")
-        return True
+        logger.info("✅ 记录保存成功: %s", record.get('id'), extra={"sample": 10})
     except Exception as e:
-        logger.error(f"❌ 保存记录失败: {str(e)}")
+        logger.error("❌ 保存记录失败: %s", e)
         return False
 
+    for hook in _save_hooks:
+        try:
+            hook(records, stamp, db_path)
+        except Exception as e:
+            logger.error("❌ 保存回调失败: %s", e)
+    return True
+
+
+def register_save_hook(hook):
+    """注册保存回调 hook(records, stamp, db_path)，每条记录保存成功后调用
+
+    回调拿到的是刚写入的完整记录列表，可据此增量更新内存索引，无需再读文件。
+    """
+    if hook not in _save_hooks:
+        _save_hooks.append(hook)
+
+
+def records_since(last_id=None, db_path=RECORDS_FILE):
+    """读取 last_id 之后追加的记录
+
+    记录按保存顺序追加。
+
+    Args:
+        last_id: 上次处理到的记录 ID，为 None 表示从头开始
+        db_path: 记录文件路径
+
+    Returns:
+        (new_records, new_last_id)；last_id 不在文件中（如记录已归档）时返回 (None, None)，
+        调用方应从头重建
+    """
+    records = load_records(db_path)
+    if last_id:
+        for pos in range(len(records) - 1, -1, -1):
+            if records[pos].get("id") == last_id:
+                records = records[pos + 1:]
+                break
+        else:
+            return None, None
+
+    new_last_id = records[-1].get("id") if records else last_id
+    return records, new_last_id
+
 
 def get_all_classes():
-    """获取所有班级列表
+    """获取所有班级列表（包含已归档的冷数据）
 
     Returns:
         班级名称列表（已排序）
     """
-    records = load_records()
+    view = get_columnar_view()
+    if view is not None:
+        return sorted(c for c in view.classes if c)
+
+    records = load_all_records()
     classes = sorted(
         list(set(r.get("class", "") for r in records if r.get("class")))
     )
     return classes
+
+
+# ====== 学生档案索引 ======
+# 按记录文件的 (inode, mtime, size) 判断是否变化；其他 worker 保存记录后也能感知并重建索引
+_index_lock = threading.Lock()
+_student_index = {"stamp": None, "path": None, "index": {}}
+
+
+def _file_stamp(db_path):
+    """记录文件版本戳，文件不存在时为 None"""
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def records_version(db_path=RECORDS_FILE):
+    """记录版本：任何 worker 保存记录、或维护任务归档冷数据后都会变化
+
+    Returns:
+        可哈希的版本元组 (热记录文件版本, 冷数据目录版本)
+    """
+    return (_file_stamp(db_path), _file_stamp(COLD_FOLDER))
+
+
+_view_lock = threading.Lock()
+_columnar_view = {"stamp": None, "path": None, "view": None}
+
+
+def get_columnar_view(db_path=RECORDS_FILE):
+    """获取全部记录（含冷数据）的列式视图，记录变化时重建
+
+    Returns:
+        ColumnarView；未安装 numpy 时返回 None（调用方逐条遍历记录）
+    """
+    if not HAS_NUMPY:
+        return None
+
+    stamp = records_version(db_path)
+    with _view_lock:
+        if _columnar_view["stamp"] == stamp and _columnar_view["path"] == db_path:
+            CACHE_REQUESTS.inc(cache="columnar_view", result="hit")
+            return _columnar_view["view"]
+        CACHE_REQUESTS.inc(cache="columnar_view", result="miss")
+
+        view = ColumnarView.build(load_all_records(db_path))
+        _columnar_view.update(stamp=stamp, path=db_path, view=view)
+        logger.info("📊 列式视图已重建: %s 条记录", len(view))
+        return view
+
+
+def _sort_key(record):
+    return (record.get("created_at", ""), record.get("id", ""))
+
+
+def _get_student_index(db_path=RECORDS_FILE):
+    """获取 (班级, 学生) -> (排序键列表, 按时间升序的记录列表) 索引（记录变化时重建，含冷数据）"""
+    stamp = records_version(db_path)
+    with _index_lock:
+        if _student_index["stamp"] == stamp and _student_index["path"] == db_path:
+            CACHE_REQUESTS.inc(cache="student_index", result="hit")
+            return _student_index["index"]
+        CACHE_REQUESTS.inc(cache="student_index", result="miss")
+
+        grouped = {}
+        for r in load_all_records(db_path):
+            grouped.setdefault((r.get("class", ""), r.get("student", "")), []).append(r)
+
+        index = {}
+        for key, entries in grouped.items():
+            entries.sort(key=_sort_key)
+            index[key] = ([_sort_key(r) for r in entries], entries)
+
+        _student_index.update(stamp=stamp, path=db_path, index=index)
+        logger.info("🗂️ 学生档案索引已重建: %s 位学生", len(index))
+        return index
+
+
+def _encode_cursor(record):
+    raw = "\x1f".join(_sort_key(record)).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("\x1f")
+        return (created_at, record_id)
+    except Exception:
+        return None
+
+
+def query_student_records(class_name, student_name, cursor=None, limit=ARCHIVE_PAGE_SIZE,
+                          db_path=RECORDS_FILE):
+    """分页查询某个学生的档案（按时间倒序）
+
+    Args:
+        class_name: 班级名称
+        student_name: 学生姓名
+        cursor: 上一页返回的游标，为 None 表示第一页
+        limit: 每页条数
+        db_path: 记录文件路径
+
+    Returns:
+        (records, next_cursor, total)：本页记录、下一页游标（没有更多时为 None）、总条数
+    """
+    keys, entries = _get_student_index(db_path).get((class_name, student_name), ([], []))
+
+    end = len(entries)
+    if cursor:
+        key = _decode_cursor(cursor)
+        if key is not None:
+            end = bisect_left(keys, key)
+
+    start = max(end - limit, 0)
+    page = entries[start:end][::-1]
+    next_cursor = _encode_cursor(page[-1]) if start > 0 and page else None
+    return page, next_cursor, len(entries)
+
+
+def student_etag(class_name, student_name, db_path=RECORDS_FILE):
+    """学生档案版本号：该学生有新记录时变化，其他学生的记录不影响
+
+    Returns:
+        ETag 字符串
+    """
+    keys, _ = _get_student_index(db_path).get((class_name, student_name), ([], []))
+    latest = keys[-1] if keys else ("", "")
+    raw = "|".join([class_name, student_name, str(len(keys)), *latest])
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,231 @@
+"""
+每日汇总推送模块 - digest 模式
+
+功能职责：
+- ensure_class_montage() - 生成（或复用）某班某天的全班作品墙
+- build_class_digest() - 汇总某班某天的所有记录为一条多图文消息
+- send_daily_digest() - 每班推送一次当天汇总（按推送目标记录送达，重跑时只补发失败的目标）
+- 命令行入口，供 cron 定时调用
+
+启用方式：
+    export WECHAT_PUSH_MODE=digest
+    # crontab：每天 20:00 推送当天汇总
+    0 20 * * * cd /root/classroom_test && venv/bin/python -m classroom_mvp.digest
+"""
+
+import os
+import json
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+from urllib.parse import quote
+
+from .config import DOMAIN, UPLOAD_FOLDER, DIGEST_STATE_FILE, DIGEST_MAX_STUDENT_ARTICLES
+from .data_manager import filter_records
+from .image_processor import create_montage, render_in_pool
+from .storage import atomic_write_json, file_lock
+from .wechat_notifier import build_article
+from .wechat_router import get_router
+
+logger = logging.getLogger(__name__)
+
+
+def _load_state(state_path=DIGEST_STATE_FILE):
+    """读取推送状态 {日期: {班级: {目标名称: 送达时间}}}（旧格式 {班级: 推送时间} 表示所有目标已送达）"""
+    if not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("❌ 读取汇总推送状态失败: %s", e)
+        return {}
+
+
+def _save_state(state, state_path=DIGEST_STATE_FILE):
+    atomic_write_json(state_path, state, indent=2)
+
+
+def digest_url(class_name, date_str):
+    """汇总页面地址"""
+    return f"{DOMAIN}/digest?class={quote(class_name)}&date={date_str}"
+
+
+def _latest_per_student(records):
+    """同一学生当天多条记录只取最新一条（按首次出现顺序）"""
+    latest = {}
+    for r in sorted(records, key=lambda x: x.get("created_at", "")):
+        latest[r.get("student", "")] = r
+    return list(latest.values())
+
+
+def ensure_class_montage(class_name, date_str, records=None):
+    """生成某班某天的全班作品墙（已存在则直接复用）
+
+    文件名由班级、日期和记录 ID 计算，记录不变时 URL 不变，新记录产生新文件。
+    渲染在进程池中执行，不占用 Web worker 的 GIL。
+    同一文件名持有跨进程锁，多个请求/worker 同时访问时只渲染一次。
+
+    Args:
+        class_name: 班级名称
+        date_str: 日期（YYYY-MM-DD）
+        records: 已筛选的记录，为 None 时从记录文件读取
+
+    Returns:
+        作品墙 URL 路径（如 /m_xxx.jpg），无记录或生成失败返回 None
+    """
+    if records is None:
+        records = filter_records(class_name=class_name, date_str=date_str)
+    students = _latest_per_student(records)
+    if not students:
+        return None
+
+    key = "|".join([class_name, date_str] + [r.get("id", "") for r in students])
+    filename = f"m_{date_str.replace('-', '')}_{hashlib.md5(key.encode('utf-8')).hexdigest()[:12]}.jpg"
+    output_path = os.path.join(UPLOAD_FOLDER, filename)
+
+    if not os.path.exists(output_path):
+        lock_path = f"{output_path}.lock"
+        try:
+            with file_lock(lock_path):
+                # 等锁期间可能已由其他请求生成
+                if not os.path.exists(output_path):
+                    paths = [
+                        os.path.join(UPLOAD_FOLDER, os.path.basename(r.get("collage_url", "")))
+                        for r in students
+                    ]
+                    title = f"{class_name} · {date_str} · {len(students)} 位同学"
+                    if not render_in_pool(create_montage, paths, output_path, title):
+                        return None
+        finally:
+            # 锁文件用完即删；删除后新到的请求拿到新锁，会先看到已生成的文件
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    return f"/{filename}"
+
+
+def build_class_digest(class_name, date_str, records=None):
+    """汇总某班某天的记录为一条 news 消息
+
+    Args:
+        class_name: 班级名称
+        date_str: 日期（YYYY-MM-DD）
+        records: 已筛选的记录，为 None 时从记录文件读取
+
+    Returns:
+        图文卡片列表（第一篇为班级汇总），当天无记录时返回 None
+    """
+    if records is None:
+        records = filter_records(class_name=class_name, date_str=date_str)
+    if not records:
+        return None
+
+    students = _latest_per_student(records)
+
+    names = "、".join(r.get("student", "") for r in students)
+    # 封面优先使用全班作品墙，生成失败时退回第一位同学的拼图
+    montage_url = ensure_class_montage(class_name, date_str, records)
+    cover = f"{DOMAIN}{montage_url or students[0].get('collage_url', '')}"
+    articles = [
+        {
+            "title": f"【今日课堂】{class_name} {date_str} · {len(students)} 位同学",
+            "description": f"今日上课同学：{names}。点击查看全班作品。",
+            "url": digest_url(class_name, date_str),
+            "picurl": cover,
+        }
+    ]
+
+    for r in students[:DIGEST_MAX_STUDENT_ARTICLES]:
+        image_url = f"{DOMAIN}{r.get('collage_url', '')}"
+        articles.append(
+            build_article(class_name, r.get("student", ""), r.get("comment", ""), image_url)
+        )
+
+    return articles
+
+
+def send_daily_digest(date_str=None, class_names=None, force=False, state_path=DIGEST_STATE_FILE):
+    """推送当天所有班级的汇总消息
+
+    Args:
+        date_str: 日期（YYYY-MM-DD），默认今天
+        class_names: 只推送这些班级，默认当天有记录的所有班级
+        force: 已送达的目标是否重新推送（否则只推送尚未送达的目标）
+        state_path: 推送状态文件
+
+    Returns:
+        {班级: (success: bool, message: str)}
+    """
+    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+    records = filter_records(date_str=date_str)
+
+    by_class = {}
+    for r in records:
+        by_class.setdefault(r.get("class", ""), []).append(r)
+    if class_names:
+        by_class = {c: rs for c, rs in by_class.items() if c in class_names}
+
+    state = _load_state(state_path)
+    sent_today = state.setdefault(date_str, {})
+    router = get_router()
+    results = {}
+
+    for class_name, class_records in by_class.items():
+        delivered = sent_today.get(class_name)
+        if isinstance(delivered, str) and not force:
+            # 旧格式：整班已推送
+            logger.info("ℹ️ %s %s 的汇总已推送，跳过", class_name, date_str)
+            continue
+        delivered = {} if force or not isinstance(delivered, dict) else delivered
+
+        pending = [t.name for t in router.targets_for(class_name) if t.name not in delivered]
+        if not pending:
+            logger.info("ℹ️ %s %s 的汇总已推送到所有目标，跳过", class_name, date_str)
+            continue
+
+        articles = build_class_digest(class_name, date_str, class_records)
+        target_results = router.fan_out(class_name, articles, skip=delivered)
+        now = datetime.now().isoformat()
+        for name, (ok, _) in target_results.items():
+            if ok:
+                delivered[name] = now
+        failed = [f"{name}: {msg}" for name, (ok, msg) in target_results.items() if not ok]
+
+        # 部分成功也记录，重跑时只补发失败的目标
+        sent_today[class_name] = delivered
+        _save_state(state, state_path)
+
+        if failed:
+            results[class_name] = (False, "；".join(failed))
+            logger.error("❌ %s 汇总推送失败: %s", class_name, results[class_name][1])
+        else:
+            results[class_name] = (True, f"已推送 {len(class_records)} 条记录")
+            logger.info("✅ %s 汇总推送成功（%d 条记录）", class_name, len(class_records))
+
+    return results
+
+
+def main():
+    """命令行入口：python -m classroom_mvp.digest [--date YYYY-MM-DD] [--class 班级]"""
+    parser = argparse.ArgumentParser(description="推送每日课堂汇总到家长群")
+    parser.add_argument("--date", help="日期 YYYY-MM-DD，默认今天")
+    parser.add_argument("--class", dest="class_names", action="append", help="只推送指定班级（可多次）")
+    parser.add_argument("--force", action="store_true", help="已推送过也重新推送")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    results = send_daily_digest(args.date, args.class_names, args.force)
+    if not results:
+        logger.info("ℹ️ 没有需要推送的汇总")
+    return 0 if all(ok for ok, _ in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
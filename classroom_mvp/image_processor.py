@@ -3,16 +3,45 @@
 
 功能职责：
 - create_collage() - 生成书法专用拼图（姿势+作品+评语+水印）
+- create_montage() - 把全班拼图缩略后平铺成一张作品墙
+- shrink_original() - 缩小并重新压缩旧的姿势/作品原图（维护任务使用）
+- image_info() - 图片文件大小和尺寸（慢请求日志使用）
+- render_in_pool() - 在渲染进程池中执行 CPU 密集的图片任务
+- render_in_pool_async() - 异步版本，等待结果时不阻塞事件循环
+- preload_fonts() - 提前加载 Pillow 格式插件和拼图用到的字体（启动预热、渲染进程初始化）
 - 处理多种图片格式和大小
+
+Pillow 在第一次处理图片时才导入（各函数内导入），不拖慢 worker 启动。
+字体按字号缓存，每个进程只读取一次字体文件。
 """
 
+import os
+import asyncio
 import logging
-from PIL import Image, ImageDraw, ImageFont
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from .config import SCHOOL_NAME, COLLAGE_TARGET_WIDTH, COLLAGE_BOTTOM_HEIGHT
+from .config import (
+    SCHOOL_NAME,
+    COLLAGE_TARGET_WIDTH,
+    COLLAGE_BOTTOM_HEIGHT,
+    MONTAGE_COLUMNS,
+    MONTAGE_TILE_WIDTH,
+    MONTAGE_TILE_HEIGHT,
+    MONTAGE_HEADER_HEIGHT,
+    RENDER_POOL_WORKERS,
+    RENDER_TIMEOUT,
+    ORIGINAL_MAX_SIDE,
+    ORIGINAL_JPEG_QUALITY,
+)
+from .metrics import RENDER_IN_FLIGHT
 
 logger = logging.getLogger(__name__)
 
+# 拼图和作品墙用到的字号（预热时提前加载）
+FONT_SIZES = (36, 28, 32, 20)
+
 
 def create_collage(posture_path, work_path, output_path, class_name, student_name, comment):
     """生成书法专用拼图
@@ -33,8 +62,10 @@ def create_collage(posture_path, work_path, output_path, class_name, student_nam
     Returns:
         bool: 生成是否成功
     """
+    from PIL import Image, ImageDraw
+
     try:
-        logger.info(f"🎨 开始生成拼图: {student_name} ({class_name})")
+        logger.debug("🎨 开始生成拼图: %s (%s)", student_name, class_name)
 
         # 加载并调整图片尺寸
         posture_img = Image.open(posture_path).convert("RGB")
@@ -96,16 +127,218 @@ def create_collage(posture_path, work_path, output_path, class_name, student_nam
 
         # 保存
         collage.save(output_path, quality=95, optimize=True)
-        logger.info(f"✅ 拼图生成成功: {output_path}")
+        logger.info("✅ 拼图生成成功: %s", output_path)
+        return True
+
+    except Exception as e:
+        logger.error("❌ 拼图生成失败: %s", e)
+        return False
+
+
+def create_montage(image_paths, output_path, title, columns=MONTAGE_COLUMNS,
+                   tile_width=MONTAGE_TILE_WIDTH, tile_height=MONTAGE_TILE_HEIGHT):
+    """把多张已生成的拼图平铺成一张全班作品墙
+
+    逐张从磁盘读取：JPEG 先用 draft 模式按目标尺寸降采样解码，
+    缩略后贴到画布并立即释放，内存只占画布 + 单张缩略图，40+ 人的班级也不会暴涨。
+    先写入同目录的临时文件再 rename，请求方不会读到写了一半的作品墙。
+
+    Args:
+        image_paths: 拼图文件路径列表（按展示顺序）
+        output_path: 输出作品墙路径
+        title: 顶部标题（班级、日期）
+        columns: 每行格数
+        tile_width: 每格宽度
+        tile_height: 每格高度
+
+    Returns:
+        bool: 生成是否成功
+    """
+    from PIL import Image, ImageDraw
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        if not image_paths:
+            logger.warning("⚠️ 作品墙没有可用的拼图")
+            return False
+
+        logger.info("🧱 开始生成作品墙: %s（%s 张）", title, len(image_paths))
+
+        columns = max(1, min(columns, len(image_paths)))
+        rows = (len(image_paths) + columns - 1) // columns
+        gap = 10
+        width = columns * tile_width + (columns + 1) * gap
+        height = MONTAGE_HEADER_HEIGHT + rows * (tile_height + gap) + gap
+        montage = Image.new("RGB", (width, height), "#ffffff")
+
+        draw = ImageDraw.Draw(montage)
+        draw.text((20, 20), title, fill="#2c3e50", font=_load_font(32))
+        draw.text((20, 58), f"雅趣堂｜{SCHOOL_NAME}", fill="#95a5a6", font=_load_font(20))
+
+        placed = 0
+        for idx, path in enumerate(image_paths):
+            try:
+                with Image.open(path) as img:
+                    # JPEG 按接近目标尺寸的比例解码（1/2、1/4、1/8），不解码整张原图
+                    img.draft("RGB", (tile_width, tile_height))
+                    img = img.convert("RGB")
+                    img.thumbnail((tile_width, tile_height), Image.LANCZOS)
+            except Exception as e:
+                logger.warning("⚠️ 跳过无法读取的拼图 %s: %s", path, e)
+                continue
+
+            row, col = divmod(idx, columns)
+            x = gap + col * (tile_width + gap) + (tile_width - img.width) // 2
+            y = MONTAGE_HEADER_HEIGHT + row * (tile_height + gap) + (tile_height - img.height) // 2
+            montage.paste(img, (x, y))
+            img.close()
+            placed += 1
+
+        if placed == 0:
+            logger.error("❌ 作品墙生成失败: 没有可读取的拼图")
+            return False
+
+        montage.save(tmp_path, "JPEG", quality=85, optimize=True, progressive=True)
+        os.replace(tmp_path, output_path)
+        logger.info("✅ 作品墙生成成功: %s（%s 张）", output_path, placed)
         return True
 
     except Exception as e:
-        logger.error(f"❌ 拼图生成失败: {str(e)}")
+        logger.error("❌ 作品墙生成失败: %s", e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
 
+def shrink_original(path, max_side=ORIGINAL_MAX_SIDE, quality=ORIGINAL_JPEG_QUALITY):
+    """把原图缩小到最长边 max_side 并重新压缩（原地替换）
+
+    只读文件头判断尺寸，已经不超过 max_side 的图片不解码；
+    压缩后不比原文件小时保留原文件。
+
+    Args:
+        path: 图片路径
+        max_side: 最长边像素
+        quality: JPEG 质量
+
+    Returns:
+        节省的字节数（未处理时为 0）
+    """
+    from PIL import Image
+
+    tmp_path = f"{path}.shrink.tmp"
+    try:
+        original_size = os.path.getsize(path)
+        with Image.open(path) as img:
+            if max(img.size) <= max_side:
+                return 0
+            img.draft("RGB", (max_side, max_side))
+            img = img.convert("RGB")
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+            img.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+
+        new_size = os.path.getsize(tmp_path)
+        if new_size >= original_size:
+            os.remove(tmp_path)
+            return 0
+        os.replace(tmp_path, path)
+        return original_size - new_size
+
+    except Exception as e:
+        logger.warning("⚠️ 原图压缩失败 %s: %s", path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return 0
+
+
+def image_info(path):
+    """图片文件大小和尺寸（只读取文件头，不解码像素）
+
+    Returns:
+        {"bytes", "width", "height", "format"}；无法识别的图片只有 bytes
+    """
+    from PIL import Image
+
+    info = {"bytes": os.path.getsize(path)}
+    try:
+        with Image.open(path) as img:
+            info.update(width=img.width, height=img.height, format=img.format)
+    except Exception:
+        pass
+    return info
+
+
+# 渲染进程池（延迟初始化；spawn 启动，避免在带后台线程的 worker 中 fork）
+_render_pool = None
+
+
+def get_render_pool():
+    """获取全局渲染进程池"""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(
+            max_workers=RENDER_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=preload_fonts,
+        )
+    return _render_pool
+
+
+def render_in_pool(func, *args, timeout=RENDER_TIMEOUT):
+    """在渲染进程池中执行图片任务并等待结果
+
+    Args:
+        func: 模块级函数（如 create_collage / create_montage）
+        *args: 函数参数
+        timeout: 超时秒数
+
+    Returns:
+        函数返回值；进程池异常或超时返回 False
+    """
+    RENDER_IN_FLIGHT.inc()
+    try:
+        return get_render_pool().submit(func, *args).result(timeout=timeout)
+    except Exception as e:
+        logger.error("❌ 渲染进程池任务失败: %s: %s", type(e).__name__, e)
+        return False
+    finally:
+        RENDER_IN_FLIGHT.dec()
+
+
+async def render_in_pool_async(func, *args, timeout=RENDER_TIMEOUT):
+    """render_in_pool 的异步版本（classroom_mvp.asgi 使用）
+
+    Returns:
+        函数返回值；进程池异常或超时返回 False
+    """
+    RENDER_IN_FLIGHT.inc()
+    try:
+        future = get_render_pool().submit(func, *args)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except Exception as e:
+        logger.error("❌ 渲染进程池任务失败: %s: %s", type(e).__name__, e)
+        return False
+    finally:
+        RENDER_IN_FLIGHT.dec()
+
+
+def preload_fonts():
+    """导入 Pillow 全部格式插件并加载 FONT_SIZES 中的字体
+
+    Returns:
+        加载的字体数
+    """
+    from PIL import Image
+
+    Image.init()
+    for size in FONT_SIZES:
+        _load_font(size)
+    return len(FONT_SIZES)
+
+
+@lru_cache(maxsize=None)
 def _load_font(size):
-    """加载系统字体（支持中文）
+    """加载系统字体（支持中文），按字号缓存
 
     Args:
         size: 字体大小
@@ -113,6 +346,8 @@ def _load_font(size):
     Returns:
         PIL Font 对象
     """
+    from PIL import ImageFont
+
     try:
         # Windows 中文字体
         return ImageFont.truetype("simhei.ttf", size)
@@ -122,5 +357,5 @@ def _load_font(size):
             return ImageFont.truetype("/System/Library/Fonts/PingFang.ttc", size)
         except:
             # 默认字体
-            logger.warning("⚠️ 未找到中文字体，使用默认字体（可能显示乱码）")
+            logger.warning("⚠️ 未找到中文字体，使用默认字体（可能显示乱码）", extra={"sample": 100})
             return ImageFont.load_default()
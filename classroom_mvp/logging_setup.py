@@ -0,0 +1,176 @@
+"""
+日志配置模块 - 结构化、低开销的应用日志
+
+功能职责：
+- setup_logging() - 配置根日志：全局级别 + 按模块覆盖（LOG_LEVELS）、text/json 输出
+- 非阻塞：业务线程只把日志放进有界队列（QueueHandler），由后台线程格式化和写出；
+  队列满时丢弃并计数（classroom_log_dropped_total），不会拖慢请求
+- RequestContextFilter - 每条日志带上请求 ID 和进程号
+- SampleFilter - 高频事件按 extra={"sample": N} 每 N 条只输出 1 条
+
+写日志时使用 % 占位符（logger.info("加载 %d 条记录", n)），级别未开启时不会格式化字符串。
+"""
+
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_QUEUE_SIZE
+from .metrics import Counter
+from .timing import current_request_id
+
+LOG_DROPPED = Counter("classroom_log_dropped_total", "日志队列已满被丢弃的日志条数")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# LogRecord 自带的属性；其余属性来自 extra=，JSON 输出时原样带上
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample"}
+
+_state = {"handler": None, "listener": None, "pid": None}
+_state_lock = threading.Lock()
+
+
+class RequestContextFilter(logging.Filter):
+    """给日志加上当前请求 ID（在业务线程中执行，入队之前）"""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = current_request_id() or "-"
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """extra={"sample": N} 的日志按 (logger, 消息模板) 每 N 条输出 1 条"""
+
+    def __init__(self):
+        super().__init__()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        every = getattr(record, "sample", None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = count()
+            seen = next(counter)
+        if seen % every:
+            return False
+        record.msg = f"{record.msg} [每 {every} 条采样 1 条]"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON（time/level/logger/msg/request_id/pid + extra 字段）"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志而不是阻塞业务线程"""
+
+    def prepare(self, record):
+        """只复制记录，不调用 format()
+
+        QueueHandler.prepare() 会在业务线程中格式化消息和异常栈，并清掉 args/exc_info；
+        这里保留 msg/args/exc_info，由后台线程的输出 handler 格式化（JSON 输出才有 exc 字段）。
+        """
+        return copy.copy(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+def parse_levels(spec):
+    """解析 "模块=级别,模块=级别" → {模块: 级别}"""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_listener(output_handler):
+    """新建队列和后台写出线程（fork 出的子进程重新调用，父进程的线程不会被继承）"""
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, output_handler, respect_handler_level=True)
+    listener.start()
+    _state["handler"].queue = log_queue
+    _state.update(listener=listener, pid=os.getpid())
+
+
+def _after_fork():
+    if _state["handler"] is not None:
+        output_handler = _state["listener"].handlers[0]
+        _start_listener(output_handler)
+
+
+def _stop_listener():
+    listener = _state["listener"]
+    if listener is not None and _state["pid"] == os.getpid():
+        listener.stop()
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, fmt=LOG_FORMAT, stream=None):
+    """配置根日志（重复调用时只更新级别）
+
+    Args:
+        level: 全局级别
+        levels: 按模块覆盖的级别，"classroom_mvp.data_manager=WARNING,dashscope=ERROR"
+        fmt: "text" 或 "json"
+        stream: 输出流，默认 stderr
+    """
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    with _state_lock:
+        if _state["handler"] is not None:
+            return
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        if fmt == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        handler = DroppingQueueHandler(queue.Queue())
+        handler.addFilter(RequestContextFilter())
+        handler.addFilter(SampleFilter())
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+
+        _state["handler"] = handler
+        _start_listener(output)
+        os.register_at_fork(after_in_child=_after_fork)
+        atexit.register(_stop_listener)
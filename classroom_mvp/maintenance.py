@@ -0,0 +1,342 @@
+"""
+数据维护模块 - 记录归档、原图压缩、上传文件清理
+
+功能职责：
+- archive_cold_records() - 超过保留天数的记录按月移入压缩冷数据段，热记录文件只保留近期记录
+- shrink_originals() - 缩小并重新压缩旧的姿势/作品原图（拼图保持原样）
+- gc_uploads() - 删除没有任何记录引用的上传文件（如提交失败遗留的照片）
+- migrate_records() - 把热记录文件和冷数据段中的旧版本记录改写为当前存储格式
+- 每次运行每个步骤处理的记录/文件数有上限，按游标分批推进，不会一次扫完整个目录
+- 命令行入口，供 cron 定时调用
+
+启用方式：
+    # crontab：每天 03:30 运行一次
+    30 3 * * * cd /root/classroom_test && venv/bin/python -m classroom_mvp.maintenance
+    # 只看会做什么，不修改任何文件
+    venv/bin/python -m classroom_mvp.maintenance --dry-run
+"""
+
+import os
+import glob
+import json
+import gzip
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+from .config import (
+    RECORDS_FILE,
+    UPLOAD_FOLDER,
+    COLD_FOLDER,
+    RETENTION_HOT_DAYS,
+    MAINTENANCE_STATE_FILE,
+    ORIGINAL_SHRINK_AFTER_DAYS,
+    UPLOAD_GC_GRACE_HOURS,
+    MAINTENANCE_MAX_FILES,
+    MAINTENANCE_MAX_RECORDS,
+)
+from .data_manager import (
+    load_all_records,
+    dump_records,
+    cold_segment_path,
+    read_cold_segment,
+    read_records_strict,
+    records_lock,
+    write_records,
+)
+from .storage import atomic_write_json, try_file_lock
+from .record import needs_migration
+from .image_processor import shrink_original
+
+logger = logging.getLogger(__name__)
+
+STEPS = ("migrate", "archive", "shrink", "gc")
+
+# 记录引用的上传文件字段
+_UPLOAD_FIELDS = ("posture_url", "work_url", "collage_url")
+
+
+def _load_state(state_path=MAINTENANCE_STATE_FILE):
+    """读取维护状态（各步骤的文件游标、上次运行时间）"""
+    if not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("❌ 读取维护状态失败: %s", e)
+        return {}
+
+
+def _save_state(state, state_path=MAINTENANCE_STATE_FILE):
+    atomic_write_json(state_path, state, indent=2)
+
+
+# ====== 存储格式迁移 ======
+
+def _file_needs_migration(path, compress=False):
+    opener = gzip.open if compress else open
+    try:
+        with opener(path, "rt", encoding="utf-8") as f:
+            return any(needs_migration(d) for d in json.load(f))
+    except Exception as e:
+        logger.error("❌ 读取记录文件失败 %s: %s", path, e)
+        return False
+
+
+def migrate_records(dry_run=False, db_path=RECORDS_FILE, cold_folder=COLD_FOLDER):
+    """把旧版本记录（含重复的 timestamp/group 字段）改写为当前存储格式
+
+    已是当前版本的文件不会重写，可以重复运行。
+
+    Args:
+        dry_run: 只统计，不修改文件
+        db_path: 热记录文件路径
+        cold_folder: 冷数据目录
+
+    Returns:
+        {"migrated_files": [文件路径...]}
+    """
+    migrated = []
+    if os.path.exists(db_path) and _file_needs_migration(db_path):
+        if not dry_run:
+            with records_lock(db_path):
+                write_records(read_records_strict(db_path), db_path)
+        migrated.append(db_path)
+
+    for path in sorted(glob.glob(os.path.join(cold_folder, "records-*.json.gz"))):
+        if _file_needs_migration(path, compress=True):
+            if not dry_run:
+                atomic_write_json(path, dump_records(read_cold_segment(path)), compress=True)
+            migrated.append(path)
+
+    if migrated and not dry_run:
+        logger.info("✅ 记录存储格式已迁移: %d 个文件", len(migrated))
+    return {"migrated_files": migrated}
+
+
+# ====== 冷数据归档 ======
+
+def archive_cold_records(hot_days=RETENTION_HOT_DAYS, max_records=MAINTENANCE_MAX_RECORDS,
+                         dry_run=False, db_path=RECORDS_FILE, cold_folder=COLD_FOLDER):
+    """把超过 hot_days 天的记录移入按月的冷数据段
+
+    先写冷数据段再重写热记录文件；中途中断时记录会同时存在于两处，
+    读取时以热记录为准，下次运行会继续完成归档。
+    重写热记录文件时持有记录写锁，不会覆盖同时提交的新记录。
+
+    Args:
+        hot_days: 热记录保留天数
+        max_records: 本次最多归档的记录数
+        dry_run: 只统计，不修改文件
+        db_path: 热记录文件路径
+        cold_folder: 冷数据目录
+
+    Returns:
+        {"archived": int, "segments": [月份...]}
+    """
+    cutoff = (datetime.now() - timedelta(days=hot_days)).isoformat()
+    records = read_records_strict(db_path)
+    old = [r for r in records if r.get("created_at") and r["created_at"] < cutoff][:max_records]
+    if not old:
+        return {"archived": 0, "segments": []}
+
+    by_month = {}
+    for r in old:
+        by_month.setdefault(r["created_at"][:7], []).append(r)
+
+    if dry_run:
+        return {"archived": len(old), "segments": sorted(by_month)}
+
+    os.makedirs(cold_folder, exist_ok=True)
+    for month, month_records in sorted(by_month.items()):
+        path = cold_segment_path(month, cold_folder)
+        segment = read_cold_segment(path)
+        known = {r.get("id") for r in segment}
+        segment.extend(r for r in month_records if r.get("id") not in known)
+        segment.sort(key=lambda x: x.get("created_at", ""))
+        atomic_write_json(path, dump_records(segment), compress=True)
+        logger.info("🧊 冷数据段 %s: 共 %d 条记录", month, len(segment))
+
+    archived_ids = {r.get("id") for r in old}
+    with records_lock(db_path):
+        remaining = [r for r in read_records_strict(db_path) if r.get("id") not in archived_ids]
+        write_records(remaining, db_path)
+
+    logger.info("✅ 已归档 %d 条记录，热记录剩余 %d 条", len(old), len(remaining))
+    return {"archived": len(old), "segments": sorted(by_month)}
+
+
+# ====== 上传文件 ======
+
+def _scan_uploads(prefixes, cursor, max_files, upload_folder):
+    """按文件名顺序从游标之后取最多 max_files 个上传文件
+
+    Returns:
+        (文件名列表, 新游标)；扫到目录末尾时新游标为 None（下次从头开始）
+    """
+    if not os.path.isdir(upload_folder):
+        return [], None
+    names = sorted(
+        name for name in os.listdir(upload_folder)
+        if name.startswith(prefixes) and name.endswith(".jpg") and (cursor is None or name > cursor)
+    )
+    batch = names[:max_files]
+    next_cursor = batch[-1] if len(names) > max_files else None
+    return batch, next_cursor
+
+
+def shrink_originals(state, older_than_days=ORIGINAL_SHRINK_AFTER_DAYS,
+                     max_files=MAINTENANCE_MAX_FILES, dry_run=False, upload_folder=UPLOAD_FOLDER):
+    """缩小并重新压缩超过 older_than_days 天的姿势/作品原图
+
+    Args:
+        state: 维护状态（读写其中的 shrink_cursor）
+        older_than_days: 原图最少保留原样的天数
+        max_files: 本次最多检查的文件数
+        dry_run: 只统计，不修改文件
+        upload_folder: 上传目录
+
+    Returns:
+        {"checked": int, "shrunk": int, "saved_bytes": int}
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).timestamp()
+    batch, state["shrink_cursor"] = _scan_uploads(
+        ("p_", "w_"), state.get("shrink_cursor"), max_files, upload_folder
+    )
+
+    shrunk = saved = 0
+    for name in batch:
+        path = os.path.join(upload_folder, name)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+        except OSError:
+            continue
+        if dry_run:
+            continue
+        saved_bytes = shrink_original(path)
+        if saved_bytes:
+            shrunk += 1
+            saved += saved_bytes
+
+    if shrunk:
+        logger.info("🗜️ 已压缩 %d 张原图，节省 %d KB", shrunk, saved // 1024)
+    return {"checked": len(batch), "shrunk": shrunk, "saved_bytes": saved}
+
+
+def _referenced_uploads(db_path=RECORDS_FILE):
+    """所有记录（含冷数据）引用的上传文件名"""
+    referenced = set()
+    for r in load_all_records(db_path):
+        for field in _UPLOAD_FIELDS:
+            url = r.get(field)
+            if url:
+                referenced.add(os.path.basename(url))
+    return referenced
+
+
+def gc_uploads(state, grace_hours=UPLOAD_GC_GRACE_HOURS, max_files=MAINTENANCE_MAX_FILES,
+               dry_run=False, upload_folder=UPLOAD_FOLDER, db_path=RECORDS_FILE):
+    """删除没有记录引用、且超过 grace_hours 小时的姿势/作品/拼图文件
+
+    作品墙（m_）是按需生成的缓存，不在此处清理。
+
+    Args:
+        state: 维护状态（读写其中的 gc_cursor）
+        grace_hours: 宽限时间（提交过程中照片先于记录写入）
+        max_files: 本次最多检查的文件数
+        dry_run: 只统计，不删除文件
+        upload_folder: 上传目录
+        db_path: 热记录文件路径
+
+    Returns:
+        {"checked": int, "removed": int, "freed_bytes": int}
+    """
+    cutoff = (datetime.now() - timedelta(hours=grace_hours)).timestamp()
+    batch, state["gc_cursor"] = _scan_uploads(
+        ("p_", "w_", "c_"), state.get("gc_cursor"), max_files, upload_folder
+    )
+    referenced = _referenced_uploads(db_path) if batch else set()
+
+    removed = freed = 0
+    for name in batch:
+        if name in referenced:
+            continue
+        path = os.path.join(upload_folder, name)
+        try:
+            st = os.stat(path)
+            if st.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += st.st_size
+        logger.info("🗑️ %s清理未引用的上传文件: %s", "[dry-run] " if dry_run else "", name)
+
+    return {"checked": len(batch), "removed": removed, "freed_bytes": freed}
+
+
+# ====== 入口 ======
+
+def run_maintenance(steps=STEPS, dry_run=False, state_path=MAINTENANCE_STATE_FILE):
+    """依次运行维护步骤（同一时间只允许一个维护进程）
+
+    Args:
+        steps: 要运行的步骤（migrate / archive / shrink / gc）
+        dry_run: 只统计，不修改文件
+        state_path: 维护状态文件
+
+    Returns:
+        {步骤: 结果}；已有维护进程在运行时返回 None
+    """
+    lock_file = try_file_lock(f"{state_path}.lock")
+    if lock_file is None:
+        logger.warning("⚠️ 已有维护任务在运行，跳过")
+        return None
+
+    try:
+        state = _load_state(state_path)
+        results = {}
+        if "migrate" in steps:
+            results["migrate"] = migrate_records(dry_run=dry_run)
+        if "archive" in steps:
+            results["archive"] = archive_cold_records(dry_run=dry_run)
+        if "shrink" in steps:
+            results["shrink"] = shrink_originals(state, dry_run=dry_run)
+        if "gc" in steps:
+            results["gc"] = gc_uploads(state, dry_run=dry_run)
+
+        if not dry_run:
+            state["last_run"] = datetime.now().isoformat()
+            _save_state(state, state_path)
+        return results
+    finally:
+        if lock_file is not True:
+            lock_file.close()
+
+
+def main():
+    """命令行入口：python -m classroom_mvp.maintenance [--dry-run] [--step migrate|archive|shrink|gc]"""
+    parser = argparse.ArgumentParser(description="归档旧记录、压缩原图、清理未引用的上传文件")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改任何文件")
+    parser.add_argument("--step", dest="steps", action="append", choices=STEPS,
+                        help="只运行指定步骤（可多次），默认全部")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    results = run_maintenance(args.steps or STEPS, args.dry_run)
+    if results is None:
+        return 1
+    for step, result in results.items():
+        logger.info("ℹ️ %s: %s", step, result)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,329 @@
+"""
+监控指标模块 - Prometheus 文本格式的计数器、直方图和仪表
+
+功能职责：
+- Counter / Histogram / Gauge - 带标签的指标（本模块末尾集中声明全部指标）
+- register_gauge() - 注册抓取时才计算的指标（推送队列长度等跨进程共享的数据）
+- render_metrics() - 汇总所有 gunicorn worker 的指标，生成 /metrics 响应
+
+多进程汇总：
+- 每个进程每 METRICS_FLUSH_INTERVAL 秒把自己的累计值写入 METRICS_DIR/metrics-<pid>-<token>.json
+  （原子替换；其他 worker 的数据最多滞后一个刷新间隔）
+- 抓取时加锁读取全部文件：计数器和直方图累加；Gauge 只累加仍在运行的进程
+- 已退出进程的文件合并进 metrics-archive.json 后删除，worker 重启后计数器不会倒退
+"""
+
+import os
+import json
+import math
+import uuid
+import atexit
+import bisect
+import logging
+import threading
+
+from .config import METRICS_DIR, METRICS_FLUSH_INTERVAL
+from .storage import atomic_write_json, file_lock
+
+logger = logging.getLogger(__name__)
+
+# 秒级延迟的默认分桶（毫秒级的文件写入到几十秒的 AI 调用）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ARCHIVE_FILE = "metrics-archive.json"
+# 进程文件中多个标签值拼接成一个 JSON 键
+LABEL_SEPARATOR = "\x1f"
+
+_metrics = {}
+_gauge_callbacks = []
+_lock = threading.Lock()
+_state = {"pid": None, "token": None, "dirty": False, "thread": None}
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        _metrics[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} 需要标签 {self.labels}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _update(self, labels, func):
+        """在锁内更新一个标签组合的值：func(旧值) -> 新值"""
+        _ensure_flusher()
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = func(self.values.get(key))
+            _state["dirty"] = True
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        self._update(labels, lambda old: (old or 0) + amount)
+
+
+class Gauge(_Metric):
+    """进程内的瞬时值（如进行中的任务数），汇总时累加仍在运行的进程"""
+
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        self._update(labels, lambda old: (old or 0) + amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self._update(labels, lambda old: value)
+
+
+class Histogram(_Metric):
+    """分桶直方图；每个标签组合保存 [各桶计数..., +Inf 桶计数, 总和]"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+
+        def add(data):
+            data = data or [0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-1] += value
+            return data
+        self._update(labels, add)
+
+
+def register_gauge(name, help_text, func, labels=()):
+    """注册抓取时计算的仪表
+
+    Args:
+        name: 指标名
+        help_text: 说明
+        func: 无参函数；无标签时返回数值，有标签时返回 {标签值元组: 数值}
+        labels: 标签名
+    """
+    _gauge_callbacks.append((name, help_text, tuple(labels), func))
+
+
+# ====== 进程文件 ======
+
+def _process_file():
+    return os.path.join(METRICS_DIR, f"metrics-{os.getpid()}-{_state['token']}.json")
+
+
+def _snapshot():
+    with _lock:
+        return {
+            name: {LABEL_SEPARATOR.join(k): (list(v) if isinstance(v, list) else v) for k, v in m.values.items()}
+            for name, m in _metrics.items() if m.values
+        }
+
+
+def flush():
+    """把本进程的累计值写入进程文件"""
+    if not _state["dirty"] or _state["pid"] != os.getpid():
+        return
+    _state["dirty"] = False
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        atomic_write_json(_process_file(), {"pid": os.getpid(), "metrics": _snapshot()}, durable=False)
+    except Exception as e:
+        _state["dirty"] = True
+        logger.warning("⚠️ 写入指标文件失败: %s", e)
+
+
+def _flush_loop():
+    wakeup = threading.Event()
+    while not wakeup.wait(METRICS_FLUSH_INTERVAL):
+        flush()
+
+
+def _ensure_flusher():
+    """每个进程第一次记录指标时启动刷新线程（fork 出的 worker 会重新启动）"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _lock:
+        if _state["pid"] == pid:
+            return
+        if _state["token"] is not None:
+            # fork 继承了父进程的累计值：已计入父进程文件，子进程从零开始
+            for metric in _metrics.values():
+                metric.values.clear()
+        _state["token"] = uuid.uuid4().hex[:8]
+        _state["thread"] = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+        _state["thread"].start()
+        _state["pid"] = pid
+
+
+atexit.register(flush)
+
+
+# ====== 汇总 ======
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(total, metrics, include_gauges=True):
+    """把一个进程的指标累加进 total"""
+    for name, values in metrics.items():
+        metric = _metrics.get(name)
+        if metric is None or (metric.kind == "gauge" and not include_gauges):
+            continue
+        target = total.setdefault(name, {})
+        for key, value in values.items():
+            if isinstance(value, list):
+                current = target.get(key)
+                if current is None or len(current) != len(value):
+                    target[key] = list(value)
+                else:
+                    target[key] = [a + b for a, b in zip(current, value)]
+            else:
+                target[key] = target.get(key, 0) + value
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def collect():
+    """汇总所有进程的指标
+
+    Returns:
+        {指标名: {以 LABEL_SEPARATOR 连接的标签值: 数值或直方图列表}}
+    """
+    flush()
+    if not os.path.isdir(METRICS_DIR):
+        return {}
+
+    archive_path = os.path.join(METRICS_DIR, ARCHIVE_FILE)
+    with file_lock(os.path.join(METRICS_DIR, "metrics.lock")):
+        archive = (_read_json(archive_path) or {}).get("metrics", {})
+        live, archived = {}, False
+        for filename in sorted(os.listdir(METRICS_DIR)):
+            if not filename.startswith("metrics-") or not filename.endswith(".json") or filename == ARCHIVE_FILE:
+                continue
+            path = os.path.join(METRICS_DIR, filename)
+            data = _read_json(path)
+            if data is None:
+                continue
+            if _pid_alive(data.get("pid", 0)):
+                _merge(live, data.get("metrics", {}))
+            else:
+                # 已退出的 worker：计数器和直方图并入归档，Gauge 丢弃
+                _merge(archive, data.get("metrics", {}), include_gauges=False)
+                os.remove(path)
+                archived = True
+        if archived:
+            atomic_write_json(archive_path, {"metrics": archive}, durable=False)
+
+    total = {}
+    _merge(total, archive)
+    _merge(total, live)
+    return total
+
+
+# ====== 文本格式 ======
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def render_metrics():
+    """生成 Prometheus 文本格式（text/plain; version=0.0.4）"""
+    totals = collect()
+    lines = []
+    for name, metric in _metrics.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(totals.get(name, {}).items()):
+            label_values = key.split(LABEL_SEPARATOR) if metric.labels else []
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labels, label_values)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{name}_bucket{_labels(metric.labels, label_values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, label_values)} {_number(float(value[-1]))}")
+            lines.append(f"{name}_count{_labels(metric.labels, label_values)} {cumulative}")
+
+    for name, help_text, labels, func in _gauge_callbacks:
+        try:
+            value = func()
+        except Exception as e:
+            logger.warning("⚠️ 计算指标 %s 失败: %s", name, e)
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        samples = value.items() if labels else [((), value)]
+        for label_values, sample in samples:
+            lines.append(f"{name}{_labels(labels, label_values)} {_number(sample)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ====== 指标声明 ======
+
+STAGE_SECONDS = Histogram(
+    "classroom_stage_seconds", "提交流程各阶段耗时（upload/ai/collage/push/save）", ("stage",)
+)
+REQUEST_SECONDS = Histogram(
+    "classroom_request_seconds", "HTTP 请求处理耗时（按路由）", ("endpoint",)
+)
+REQUESTS = Counter(
+    "classroom_requests_total", "HTTP 请求数（按路由和状态码）", ("endpoint", "status")
+)
+IN_FLIGHT = Gauge("classroom_requests_in_flight", "正在处理的 HTTP 请求数")
+CACHE_REQUESTS = Counter(
+    "classroom_cache_requests_total", "缓存查询次数（hit/miss）", ("cache", "result")
+)
+AI_CALLS = Counter(
+    "classroom_ai_calls_total", "AI 接口调用次数（每次重试单独计数）", ("result",)
+)
+WECHAT_SENDS = Counter(
+    "classroom_wechat_sends_total", "企业微信推送次数（按结果）", ("result",)
+)
+WECHAT_SEND_SECONDS = Histogram("classroom_wechat_send_seconds", "企业微信推送请求耗时")
+RENDER_IN_FLIGHT = Gauge("classroom_render_pool_in_flight", "已提交到渲染进程池、尚未完成的任务数")
@@ -0,0 +1,297 @@
+"""
+采样剖析模块 - 在线上 worker 中按需采样调用栈
+
+功能职责：
+- SamplingProfiler - 后台线程定时采样所有线程的调用栈（sys._current_frames），开销低
+- start_profile() - 在当前进程后台剖析 N 秒，结果写入 PROFILE_DIR（任何 worker 都能读取）
+- request_profile() - 让指定的兄弟 worker 剖析（写请求文件后发送 SIGUSR2）
+- install_signal_handler() - 注册 SIGUSR2：kill -USR2 <worker pid> 即开始剖析
+
+输出：
+- <id>.collapsed - 折叠栈（flamegraph.pl / speedscope 可直接打开）
+- <id>.memory.txt - 可选，剖析期间新增内存最多的代码行（tracemalloc）
+- <id>.json - 状态（running/done）、采样数、耗时
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from .config import (
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_DEFAULT_SECONDS,
+    PROFILE_MAX_SECONDS,
+    PROFILE_MEMORY_TOP,
+)
+from .storage import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SIGNAL = signal.SIGUSR2 if hasattr(signal, "SIGUSR2") else None
+PROFILE_ID_PATTERN = re.compile(r"^[\w-]+$")
+
+# 叶子帧在这些位置的线程处于等待状态（默认不计入）
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_busy = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """定时采样调用栈；结果为 {折叠栈: 采样次数}"""
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000, include_idle=False, exclude=()):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.exclude = set(exclude)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or ident in self.exclude:
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            if not self.include_idle and leaf in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            self._sample()
+            next_tick += self.interval
+            self._stop.wait(max(0, next_tick - time.perf_counter()))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self):
+        """折叠栈文本：每行 "帧;帧;帧 次数"，按次数降序"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _memory_report(start_snapshot, end_snapshot, top):
+    """剖析期间新增内存最多的代码行"""
+    excluded = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+    stats = end_snapshot.filter_traces(excluded).compare_to(
+        start_snapshot.filter_traces(excluded), "lineno"
+    )
+    lines = [f"剖析期间新增内存 Top {top}（size_diff / count_diff / 代码行）"]
+    for stat in stats[:top]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d}  {frame.filename}:{frame.lineno}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def profile_path(profile_id, suffix):
+    """剖析结果文件路径（suffix: collapsed / memory.txt / json）"""
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{suffix}")
+
+
+def profile_status(profile_id):
+    """读取剖析状态，不存在时返回 None"""
+    if not PROFILE_ID_PATTERN.match(profile_id or ""):
+        return None
+    try:
+        with open(profile_path(profile_id, "json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles(limit=20):
+    """最近的剖析结果（新的在前）"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    ids = [name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json") and "request-" not in name]
+    ids.sort(key=lambda i: os.path.getmtime(profile_path(i, "json")), reverse=True)
+    return [s for s in (profile_status(i) for i in ids[:limit]) if s]
+
+
+def _new_profile_id():
+    return f"{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:4]}"
+
+
+def _run_profile(profile_id, seconds, memory, include_idle):
+    """剖析 seconds 秒并写出结果（在后台线程中运行，调用方已持有 _busy）"""
+    meta = {
+        "id": profile_id,
+        "pid": os.getpid(),
+        "status": "running",
+        "seconds": seconds,
+        "memory": memory,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        atomic_write_json(profile_path(profile_id, "json"), meta, durable=False)
+        logger.info("🔬 开始剖析 %ss（进程 %s，内存: %s）", seconds, os.getpid(), '是' if memory else '否')
+
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        start_snapshot = tracemalloc.take_snapshot() if memory else None
+
+        profiler = SamplingProfiler(include_idle=include_idle, exclude=(threading.get_ident(),))
+        started = time.perf_counter()
+        profiler.start()
+        time.sleep(seconds)
+        profiler.stop()
+
+        if memory:
+            report = _memory_report(start_snapshot, tracemalloc.take_snapshot(), PROFILE_MEMORY_TOP)
+            if started_tracing:
+                tracemalloc.stop()
+            with open(profile_path(profile_id, "memory.txt"), "w", encoding="utf-8") as f:
+                f.write(report)
+
+        with open(profile_path(profile_id, "collapsed"), "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+
+        meta.update(
+            status="done",
+            duration=round(time.perf_counter() - started, 2),
+            samples=profiler.samples,
+            stacks=len(profiler.stacks),
+        )
+        logger.info("✅ 剖析完成: %s（%s 次采样）", profile_id, profiler.samples)
+    except Exception as e:
+        meta.update(status="failed", error=str(e))
+        logger.error("❌ 剖析失败: %s", e)
+    finally:
+        _busy.release()
+    atomic_write_json(profile_path(profile_id, "json"), meta, durable=False)
+
+
+def start_profile(seconds=PROFILE_DEFAULT_SECONDS, memory=False, include_idle=False, profile_id=None):
+    """在当前进程后台剖析
+
+    Args:
+        seconds: 剖析时长（不超过 PROFILE_MAX_SECONDS）
+        memory: 是否同时统计 tracemalloc 新增内存
+        include_idle: 是否计入处于等待状态的线程
+        profile_id: 结果 ID，默认自动生成
+
+    Returns:
+        (success, 结果 ID 或错误信息)
+    """
+    if not _busy.acquire(blocking=False):
+        return False, f"进程 {os.getpid()} 正在剖析中"
+    seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+    profile_id = profile_id or _new_profile_id()
+    threading.Thread(
+        target=_run_profile, args=(profile_id, seconds, memory, include_idle),
+        name="profile-runner", daemon=True,
+    ).start()
+    return True, profile_id
+
+
+# ====== 指定 worker ======
+
+def _parent_pid(pid):
+    """读取进程的父进程号（Linux /proc），无法读取时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # comm 字段可能包含空格，从最后一个 ')' 之后解析
+    return int(stat.rsplit(")", 1)[1].split()[1])
+
+
+def request_profile(pid, seconds=PROFILE_DEFAULT_SECONDS, memory=False, include_idle=False):
+    """让同一 gunicorn master 下的另一个 worker 剖析
+
+    Returns:
+        (success, 结果 ID 或错误信息)
+    """
+    if pid == os.getpid():
+        return start_profile(seconds, memory, include_idle)
+    if PROFILE_SIGNAL is None:
+        return False, "当前平台不支持信号触发剖析"
+    if _parent_pid(pid) != os.getppid():
+        return False, f"进程 {pid} 不是本服务的 worker"
+
+    profile_id = _new_profile_id().replace(str(os.getpid()), str(pid), 1)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    atomic_write_json(
+        os.path.join(PROFILE_DIR, f"request-{pid}.json"),
+        {"id": profile_id, "seconds": seconds, "memory": memory, "include_idle": include_idle},
+        durable=False,
+    )
+    os.kill(pid, PROFILE_SIGNAL)
+    return True, profile_id
+
+
+def _handle_signal(signum, frame):
+    """信号处理：读取（可选的）请求文件，在后台线程开始剖析"""
+    params = {}
+    request_path = os.path.join(PROFILE_DIR, f"request-{os.getpid()}.json")
+    try:
+        with open(request_path, "r", encoding="utf-8") as f:
+            params = json.load(f)
+        os.remove(request_path)
+    except (OSError, ValueError):
+        pass
+
+    ok, result = start_profile(
+        params.get("seconds", PROFILE_DEFAULT_SECONDS),
+        params.get("memory", False),
+        params.get("include_idle", False),
+        params.get("id"),
+    )
+    if not ok:
+        logger.warning("⚠️ %s", result)
+
+
+def install_signal_handler():
+    """注册剖析信号（只能在主线程调用；gunicorn 需在 worker 中调用，而不是 master）"""
+    if PROFILE_SIGNAL is None:
+        return False
+    if threading.current_thread() is not threading.main_thread():
+        logger.warning("⚠️ 非主线程，无法注册剖析信号")
+        return False
+    signal.signal(PROFILE_SIGNAL, _handle_signal)
+    return True
@@ -0,0 +1,159 @@
+"""
+课堂记录模块 - 紧凑的记录对象与存储格式版本
+
+功能职责：
+- Record - 带 __slots__ 的记录对象，兼容 dict 风格读取（record.get("class")、record["id"]）
+- Record.from_dict() / to_dict() - 存储边界上的转换，读取时丢弃冗余字段
+- SCHEMA_VERSION - 记录存储格式版本（写入文件的每条记录带 "schema" 字段）
+
+存储格式版本：
+- 1（无 schema 字段）：created_at 与 timestamp 重复、group 与 class 重复
+- 2：去掉 timestamp 和 group
+"""
+
+import sys
+
+SCHEMA_VERSION = 2
+
+# v1 中与其他字段重复的字段，读取时丢弃
+_LEGACY_FIELDS = ("timestamp", "group", "schema")
+
+# 上传文件 URL 字段 -> 文件名前缀；等于按记录 ID 推导的默认值时不单独保存字符串
+_URL_PREFIXES = {"posture_url": "p_", "work_url": "w_", "collage_url": "c_"}
+
+# 存储字段名 -> 属性名（按写入文件时的字段顺序）
+_FIELDS = {
+    "id": "id",
+    "class": "class_name",
+    "student": "student",
+    "comment": "comment",
+    "ai_generated": "ai_generated",
+    "ai_requested": "ai_requested",
+    "comment_length": "comment_length",
+    "posture_url": "_posture_url",
+    "work_url": "_work_url",
+    "collage_url": "_collage_url",
+    "created_at": "created_at",
+    "ai_model": "ai_model",
+    "generation_time_ms": "generation_time_ms",
+}
+
+
+class Record:
+    """一条课堂记录
+
+    比 dict 省内存：没有每条记录一份的哈希表，班级/学生/模型名等重复字符串会被驻留共享，
+    按记录 ID 推导得到的上传文件 URL 不单独保存。
+    值为 None 的字段视为不存在（get() 返回默认值，to_dict() 不输出）。
+    """
+
+    __slots__ = tuple(_FIELDS.values()) + ("extra",)
+
+    def __init__(self, id, class_name, student, comment="", ai_generated=False, ai_requested=None,
+                 comment_length=None, posture_url=None, work_url=None, collage_url=None,
+                 created_at="", ai_model=None, generation_time_ms=None, extra=None):
+        self.id = id
+        self.class_name = sys.intern(class_name or "")
+        self.student = sys.intern(student or "")
+        self.comment = comment
+        self.ai_generated = bool(ai_generated)
+        self.ai_requested = ai_requested
+        self.comment_length = comment_length
+        self.created_at = created_at
+        self.ai_model = sys.intern(ai_model) if ai_model else None
+        self.generation_time_ms = generation_time_ms
+        self.extra = extra or None
+        self._posture_url = self._compact_url("posture_url", posture_url)
+        self._work_url = self._compact_url("work_url", work_url)
+        self._collage_url = self._compact_url("collage_url", collage_url)
+
+    # ====== 上传文件 URL ======
+
+    def _default_url(self, field):
+        return f"/{_URL_PREFIXES[field]}{self.id}.jpg"
+
+    def _compact_url(self, field, url):
+        return None if url == self._default_url(field) else url
+
+    def _url(self, field):
+        url = getattr(self, _FIELDS[field])
+        return self._default_url(field) if url is None else url
+
+    @property
+    def posture_url(self):
+        return self._url("posture_url")
+
+    @property
+    def work_url(self):
+        return self._url("work_url")
+
+    @property
+    def collage_url(self):
+        return self._url("collage_url")
+
+    # ====== dict 风格读取（兼容旧代码和模板）======
+
+    def get(self, key, default=None):
+        if key in _URL_PREFIXES:
+            return self._url(key)
+        attr = _FIELDS.get(key)
+        if attr is not None:
+            value = getattr(self, attr)
+        else:
+            value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __repr__(self):
+        return f"Record(id={self.id!r}, class={self.class_name!r}, student={self.student!r}, created_at={self.created_at!r})"
+
+    # ====== 存储边界转换 ======
+
+    @classmethod
+    def from_dict(cls, data):
+        """从存储的 dict（任意版本）创建记录"""
+        if isinstance(data, Record):
+            return data
+        extra = {
+            k: v for k, v in data.items() if k not in _FIELDS and k not in _LEGACY_FIELDS
+        }
+        return cls(
+            id=data.get("id"),
+            class_name=data.get("class", data.get("group", "")),
+            student=data.get("student", ""),
+            comment=data.get("comment", ""),
+            ai_generated=data.get("ai_generated", False),
+            ai_requested=data.get("ai_requested"),
+            comment_length=data.get("comment_length"),
+            posture_url=data.get("posture_url"),
+            work_url=data.get("work_url"),
+            collage_url=data.get("collage_url"),
+            created_at=data.get("created_at") or data.get("timestamp", ""),
+            ai_model=data.get("ai_model"),
+            generation_time_ms=data.get("generation_time_ms"),
+            extra=extra,
+        )
+
+    def to_dict(self):
+        """转换为当前版本的存储格式"""
+        data = {"schema": SCHEMA_VERSION}
+        for key in _FIELDS:
+            value = self.get(key)
+            if value is not None:
+                data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def needs_migration(data):
+    """存储的 dict 是否为旧版本格式"""
+    return data.get("schema") != SCHEMA_VERSION
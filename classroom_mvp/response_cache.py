@@ -0,0 +1,131 @@
+"""
+响应缓存模块 - 按 路由 + 参数 + 数据版本 缓存页面
+
+功能职责：
+- ResponseCache.cached() - 路由装饰器，命中时直接返回内存中的响应
+- 响应体只 gzip 一次，支持 gzip 的客户端直接返回压缩后的字节
+- ETag 由缓存键计算，命中 If-None-Match 时不渲染直接 304
+- 数据版本变化（如记录文件更新）后旧条目自然失效，LRU 淘汰
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+from .config import PAGE_CACHE_SIZE
+from .metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# 小于该字节数的响应不压缩
+GZIP_MIN_SIZE = 1024
+
+
+class ResponseCache:
+    """进程内 LRU 响应缓存
+
+    每个条目：(body, gzip_body, content_type)
+    """
+
+    def __init__(self, max_entries=PAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        CACHE_REQUESTS.inc(cache="page", result="hit" if entry is not None else "miss")
+        return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0,
+        }
+
+    def cached(self, version_func):
+        """路由装饰器：按 路由 + 查询参数 + 数据版本 缓存响应
+
+        Args:
+            version_func: 无参函数，返回当前请求对应的数据版本（可哈希）；
+                          返回 None 时不缓存
+
+        只缓存 200 响应；视图返回 str 或 Response 均可。
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                version = version_func()
+                if version is None:
+                    return view(*args, **kwargs)
+
+                key = (request.path, tuple(sorted(request.args.items(multi=True))), version)
+                etag = hashlib.md5(repr(key).encode("utf-8")).hexdigest()[:20]
+
+                # 客户端已有最新版本：不查缓存也不渲染
+                if etag in request.if_none_match:
+                    with self._lock:
+                        self.hits += 1
+                    CACHE_REQUESTS.inc(cache="page", result="not_modified")
+                    response = make_response("", 304)
+                    response.set_etag(etag)
+                    return response
+
+                entry = self._get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    body = response.get_data()
+                    gzip_body = (
+                        gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+                    )
+                    entry = (body, gzip_body, response.content_type)
+                    self._put(key, entry)
+
+                body, gzip_body, content_type = entry
+                if gzip_body is not None and "gzip" in request.accept_encodings:
+                    response = make_response(gzip_body)
+                    response.headers["Content-Encoding"] = "gzip"
+                else:
+                    response = make_response(body)
+                response.content_type = content_type
+                response.vary.add("Accept-Encoding")
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+                return response
+
+            return wrapper
+        return decorator
+
+
+# 全局页面缓存
+page_cache = ResponseCache()
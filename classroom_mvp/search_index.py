@@ -0,0 +1,213 @@
+"""
+评语全文检索模块 - 评语和学生姓名的倒排索引
+
+功能职责：
+- tokenize() - 中文按单字 + 二元组（bigram）切分，英文/数字按整词切分
+- SearchIndex.search() - 多个词取倒排表交集，按班级过滤，再做子串校验，最新记录在前
+- 本进程保存记录时通过 save hook 增量追加；其他 worker 保存的记录在下次查询时按尾部补齐
+"""
+
+import re
+import time
+import logging
+import threading
+import unicodedata
+from array import array
+
+from .config import RECORDS_FILE, SEARCH_DEFAULT_LIMIT
+from .data_manager import merge_cold_records, records_since, records_version, register_save_hook
+
+logger = logging.getLogger(__name__)
+
+# 中日韩统一表意文字（含扩展 A）连续片段 / 英文数字单词
+_TOKEN_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+|[0-9a-z]+")
+# 班级过滤用的特殊词（不会与正文切分结果冲突）
+_CLASS_PREFIX = "\x00class:"
+
+
+def _normalize(text):
+    """全角转半角、统一小写"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text, for_query=False):
+    """切分文本
+
+    建索引时中文片段输出单字和相邻二元组；查询时长度 ≥ 2 的中文片段只输出二元组，
+    单字片段输出单字，这样「笔顺」只查一张倒排表，「笔」也能查到。
+
+    Args:
+        text: 原始文本
+        for_query: 是否为查询切分
+
+    Returns:
+        词列表（已去重，保持顺序）
+    """
+    tokens = []
+    for piece in _TOKEN_PATTERN.findall(_normalize(text)):
+        if piece.isascii():
+            tokens.append(piece)
+            continue
+        bigrams = [piece[i:i + 2] for i in range(len(piece) - 1)]
+        if for_query:
+            tokens.extend(bigrams or [piece])
+        else:
+            tokens.extend(piece)
+            tokens.extend(bigrams)
+    return list(dict.fromkeys(tokens))
+
+
+class SearchIndex:
+    """内存倒排索引：词 -> 文档序号数组（按保存顺序递增）
+
+    文档即记录本身（含已归档的冷数据），序号按索引顺序递增；水位（最后一条已索引记录的 ID）
+    用于增量补齐，水位记录不在记录文件中时整体重建。
+    """
+
+    def __init__(self, db_path=RECORDS_FILE):
+        self.db_path = db_path
+        self.docs = []
+        self.texts = []
+        self.postings = {}
+        self.watermark = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    # ====== 建索引 ======
+
+    def _add(self, record):
+        ordinal = len(self.docs)
+        # 归一化后的原文，用于子串校验
+        text = _normalize(record.get("comment", "")) + "\n" + _normalize(record.get("student", ""))
+        self.docs.append(record)
+        self.texts.append(text)
+
+        tokens = tokenize(text)
+        tokens.append(_CLASS_PREFIX + record.get("class", ""))
+        for token in dict.fromkeys(tokens):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array("I")
+            posting.append(ordinal)
+
+    def _reset(self):
+        self.docs = []
+        self.texts = []
+        self.postings = {}
+        self.watermark = None
+
+    def _ingest(self, new_records, last_id):
+        if new_records is None or self.watermark is None:
+            # 首次建索引或水位记录已不在文件中：冷数据段 + 全部热记录
+            if new_records is None:
+                logger.info("ℹ️ 检索索引水位已失效，重建索引")
+            self._reset()
+            new_records, last_id = records_since(None, self.db_path)
+            new_records = merge_cold_records(new_records)
+
+        started = time.time()
+        for record in new_records:
+            self._add(record)
+        self.watermark = last_id
+
+        if len(new_records) > 100:
+            logger.info(
+                "🔎 检索索引已更新: +%d 条记录，共 %d 条、%d 个词，耗时 %dms",
+                len(new_records), len(self.docs), len(self.postings), (time.time() - started) * 1000,
+            )
+
+    def refresh(self):
+        """记录文件有变化时补齐新记录"""
+        stamp = records_version(self.db_path)
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            self._ingest(*records_since(self.watermark, self.db_path))
+            self._stamp = stamp
+
+    def on_saved(self, records, stamp, db_path):
+        """save_record 回调：用刚写入的记录列表补齐尾部，不再读文件"""
+        if db_path != self.db_path:
+            return
+        with self._lock:
+            if self._stamp is None:
+                # 还没有查询过，等第一次查询时再建索引
+                return
+            tail = records
+            if self.watermark:
+                for pos in range(len(records) - 1, -1, -1):
+                    if records[pos].get("id") == self.watermark:
+                        tail = records[pos + 1:]
+                        break
+                else:
+                    tail = None
+            self._ingest(tail, records[-1].get("id") if records else None)
+            self._stamp = stamp
+
+    # ====== 查询 ======
+
+    def search(self, query, class_name=None, limit=SEARCH_DEFAULT_LIMIT, offset=0):
+        """检索评语或学生姓名包含所有关键词的记录
+
+        Args:
+            query: 查询字符串，空格分隔多个关键词（需全部命中）
+            class_name: 只返回该班级的记录，为 None 表示全部
+            limit: 返回条数
+            offset: 跳过条数（分页）
+
+        Returns:
+            (records, total)：按保存时间倒序的本页记录、命中总数
+        """
+        self.refresh()
+
+        terms = [_normalize(t) for t in query.split()]
+        tokens = []
+        # 每个关键词都恰好是一个词（如「笔顺」「笔」）时，倒排命中即原文命中，无需校验
+        needs_check = False
+        for term in terms:
+            term_tokens = tokenize(term, for_query=True)
+            needs_check = needs_check or term_tokens != [term]
+            tokens.extend(term_tokens)
+        if class_name:
+            tokens.append(_CLASS_PREFIX + class_name)
+        if not terms or not tokens:
+            return [], 0
+
+        with self._lock:
+            docs, texts = self.docs, self.texts
+            postings = []
+            for token in dict.fromkeys(tokens):
+                posting = self.postings.get(token)
+                if not posting:
+                    return [], 0
+                postings.append(posting)
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return [], 0
+
+        ordinals = sorted(candidates, reverse=True)
+        if not needs_check:
+            total = len(ordinals)
+            return [docs[o] for o in ordinals[offset:offset + limit]], total
+
+        # 多个二元组都命中不代表连续出现，按原文做子串校验
+        matched = [o for o in ordinals if all(term in texts[o] for term in terms)]
+        return [docs[o] for o in matched[offset:offset + limit]], len(matched)
+
+
+# 全局检索索引实例（延迟初始化）
+_index = None
+
+
+def get_search_index():
+    """获取全局检索索引实例（单例模式，首次查询时建索引）"""
+    global _index
+    if _index is None:
+        _index = SearchIndex()
+        register_save_hook(_index.on_saved)
+    return _index
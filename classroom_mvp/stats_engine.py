@@ -0,0 +1,305 @@
+"""
+统计引擎模块 - 按天、按班级分桶的时间序列
+
+功能职责：
+- LatencyHistogram - 可合并的对数分桶直方图，估算 p50/p90/p99
+- StatsEngine.refresh() - 只处理新增记录，增量更新分桶并持久化到 stats.json
+- StatsEngine.query() - 按日期范围（可选班级）合并分桶，不扫描原始记录
+- 每个分桶：提交量、AI 请求/成功数、AI 耗时直方图、24 小时提交分布
+"""
+
+import os
+import json
+import math
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from .config import STATS_FILE, STATS_DEFAULT_DAYS, STATS_MAX_RANGE_DAYS, RECORDS_FILE
+from .data_manager import merge_cold_records, records_since, records_version
+from .storage import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+STATS_SCHEMA_VERSION = 1
+
+# 直方图桶边界（毫秒）：10ms 起按 1.25 倍递增到约 5 分钟
+_BUCKET_GROWTH = 1.25
+_BUCKET_BOUNDS = [10 * _BUCKET_GROWTH ** i for i in range(47)]
+
+
+class LatencyHistogram:
+    """对数分桶延迟直方图（可合并，误差约 ±12%）"""
+
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts else [0] * (len(_BUCKET_BOUNDS) + 1)
+
+    def add(self, value_ms):
+        """记录一个耗时（毫秒）"""
+        if value_ms <= _BUCKET_BOUNDS[0]:
+            idx = 0
+        else:
+            idx = min(
+                int(math.ceil(math.log(value_ms / _BUCKET_BOUNDS[0], _BUCKET_GROWTH))),
+                len(_BUCKET_BOUNDS),
+            )
+        self.counts[idx] += 1
+
+    def merge(self, other):
+        """合并另一个直方图（原地）"""
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def percentile(self, q):
+        """估算分位数（桶内线性插值）
+
+        Args:
+            q: 0~100
+
+        Returns:
+            毫秒，无数据时为 None
+        """
+        total = self.total
+        if total == 0:
+            return None
+
+        rank = q / 100.0 * total
+        cumulative = 0
+        for idx, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = _BUCKET_BOUNDS[idx - 1] if idx > 0 else 0
+                upper = _BUCKET_BOUNDS[idx] if idx < len(_BUCKET_BOUNDS) else _BUCKET_BOUNDS[-1]
+                fraction = (rank - cumulative) / count
+                return round(lower + (upper - lower) * fraction)
+            cumulative += count
+        return round(_BUCKET_BOUNDS[-1])
+
+
+def _new_bucket():
+    return {
+        "submissions": 0,
+        "ai_requested": 0,
+        "ai_success": 0,
+        "latency": [0] * (len(_BUCKET_BOUNDS) + 1),
+        "hours": [0] * 24,
+    }
+
+
+class StatsEngine:
+    """按 (日期, 班级) 分桶的增量统计
+
+    stats.json 结构：
+        {"version": 1, "watermark": 最后处理的记录 ID, "buckets": {日期: {班级: 分桶}}}
+    多个 worker 共享同一个文件：谁先发现新记录谁更新并写回，其他 worker 直接加载。
+    """
+
+    def __init__(self, path=STATS_FILE, db_path=RECORDS_FILE):
+        self.path = path
+        self.db_path = db_path
+        self.watermark = None
+        self.buckets = {}
+        self._records_version = None
+        self._file_mtime = None
+        self._lock = threading.Lock()
+
+    # ====== 持久化 ======
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.error("❌ 读取统计文件失败: %s", e)
+            return
+
+        if state.get("version") != STATS_SCHEMA_VERSION:
+            logger.info("ℹ️ 统计文件版本变化，将从记录重建")
+            return
+
+        self.watermark = state.get("watermark")
+        self.buckets = state.get("buckets", {})
+        self._file_mtime = mtime
+
+    def _save(self):
+        state = {
+            "version": STATS_SCHEMA_VERSION,
+            "watermark": self.watermark,
+            "buckets": self.buckets,
+        }
+        # 统计可以从记录重建，不需要 fsync
+        atomic_write_json(self.path, state, durable=False)
+        self._file_mtime = os.path.getmtime(self.path)
+
+    # ====== 增量更新 ======
+
+    def ingest(self, record):
+        """把一条记录计入对应分桶"""
+        created_at = record.get("created_at", "")
+        day = created_at[:10]
+        if not day:
+            return
+
+        bucket = self.buckets.setdefault(day, {}).setdefault(
+            record.get("class", ""), _new_bucket()
+        )
+        bucket["submissions"] += 1
+
+        try:
+            bucket["hours"][int(created_at[11:13])] += 1
+        except (ValueError, IndexError):
+            pass
+
+        # 旧记录没有 ai_requested 字段：以 ai_generated 近似
+        ai_generated = bool(record.get("ai_generated"))
+        if record.get("ai_requested", ai_generated):
+            bucket["ai_requested"] += 1
+        if ai_generated:
+            bucket["ai_success"] += 1
+            elapsed = record.get("generation_time_ms")
+            if elapsed:
+                histogram = LatencyHistogram(bucket["latency"])
+                histogram.add(elapsed)
+                bucket["latency"] = histogram.counts
+
+    def refresh(self):
+        """处理记录文件中的新记录（记录文件未变化时直接返回）"""
+        version = records_version(self.db_path)
+        with self._lock:
+            if version == self._records_version:
+                return
+
+            self._load()
+            new_records, last_id = records_since(self.watermark, self.db_path)
+            if new_records is None or self.watermark is None:
+                # 首次统计或水位记录已不在文件中：从冷数据段 + 全部热记录重建
+                if new_records is None:
+                    logger.info("ℹ️ 统计水位已失效，从全部记录重建")
+                self.buckets = {}
+                new_records, last_id = records_since(None, self.db_path)
+                new_records = merge_cold_records(new_records)
+            if new_records:
+                for record in new_records:
+                    self.ingest(record)
+                self.watermark = last_id
+                self._save()
+                logger.info("📈 统计已更新: 新增 %s 条记录", len(new_records))
+
+            self._records_version = version
+
+    def rebuild(self):
+        """丢弃分桶，从全部记录重建"""
+        with self._lock:
+            self.watermark = None
+            self.buckets = {}
+            self._records_version = None
+            self._file_mtime = None
+        self.refresh()
+
+    # ====== 查询 ======
+
+    def query(self, start=None, end=None, class_name=None):
+        """按日期范围合并分桶
+
+        Args:
+            start: 开始日期 YYYY-MM-DD（含），默认 end 前 STATS_DEFAULT_DAYS 天；
+                最多查询 STATS_MAX_RANGE_DAYS 天，更早的部分截掉
+            end: 结束日期 YYYY-MM-DD（含），默认今天
+            class_name: 只统计该班级，为 None 表示全部
+
+        Returns:
+            {"start", "end", "days": [...], "classes": [...], "totals": {...}, "hours": [24]}
+        """
+        self.refresh()
+
+        end_date = datetime.strptime(end, "%Y-%m-%d") if end else datetime.now()
+        start_date = (
+            datetime.strptime(start, "%Y-%m-%d")
+            if start
+            else end_date - timedelta(days=STATS_DEFAULT_DAYS - 1)
+        )
+        start_date = max(start_date, end_date - timedelta(days=STATS_MAX_RANGE_DAYS - 1))
+
+        days = []
+        per_class = {}
+        total = _new_bucket()
+        total_hist = LatencyHistogram()
+
+        day = start_date
+        while day <= end_date:
+            day_str = day.strftime("%Y-%m-%d")
+            day_total = _new_bucket()
+            day_hist = LatencyHistogram()
+
+            for cls, bucket in self.buckets.get(day_str, {}).items():
+                if class_name and cls != class_name:
+                    continue
+                _merge_into(day_total, bucket)
+                day_hist.merge(LatencyHistogram(bucket["latency"]))
+                class_total = per_class.setdefault(cls, (_new_bucket(), LatencyHistogram()))
+                _merge_into(class_total[0], bucket)
+                class_total[1].merge(LatencyHistogram(bucket["latency"]))
+
+            _merge_into(total, day_total)
+            total_hist.merge(day_hist)
+            days.append({"date": day_str, **_summarize(day_total, day_hist)})
+            day += timedelta(days=1)
+
+        classes = [
+            {"class": cls, **_summarize(bucket, hist)}
+            for cls, (bucket, hist) in sorted(
+                per_class.items(), key=lambda x: x[1][0]["submissions"], reverse=True
+            )
+        ]
+
+        return {
+            "start": start_date.strftime("%Y-%m-%d"),
+            "end": end_date.strftime("%Y-%m-%d"),
+            "days": days,
+            "classes": classes,
+            "totals": _summarize(total, total_hist),
+            "hours": total["hours"],
+        }
+
+
+def _merge_into(target, bucket):
+    for key in ("submissions", "ai_requested", "ai_success"):
+        target[key] += bucket[key]
+    for i, c in enumerate(bucket["hours"]):
+        target["hours"][i] += c
+
+
+def _summarize(bucket, histogram):
+    requested = bucket["ai_requested"]
+    return {
+        "submissions": bucket["submissions"],
+        "ai_requested": requested,
+        "ai_success": bucket["ai_success"],
+        "ai_success_rate": round(bucket["ai_success"] / requested * 100, 1) if requested else None,
+        "latency_p50": histogram.percentile(50),
+        "latency_p90": histogram.percentile(90),
+        "latency_p99": histogram.percentile(99),
+    }
+
+
+# 全局统计引擎实例（延迟初始化）
+_engine = None
+
+
+def get_stats_engine():
+    """获取全局统计引擎实例（单例模式）"""
+    global _engine
+    if _engine is None:
+        _engine = StatsEngine()
+    return _engine
@@ -0,0 +1,100 @@
+"""
+文件存储模块 - 原子写入与跨进程文件锁
+
+功能职责：
+- atomic_write_json() - 写临时文件 → fsync → rename，读者只会看到旧文件或完整的新文件
+- file_lock() - 基于 flock 的跨进程互斥锁，保护多个 gunicorn worker 的读-改-写
+- try_file_lock() - 非阻塞获取锁（后台任务只允许一个进程运行）
+
+读者不加锁：rename 是原子的，读取中的旧文件不会被截断，写者也不会等待读者。
+"""
+
+import os
+import json
+import gzip
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 本地调试时无文件锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _fsync_dir(path):
+    """把 rename 落盘（目录项），断电后不会回到旧文件或丢失新文件"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data, indent=None, compress=False, durable=True):
+    """原子地写入 JSON 文件
+
+    临时文件名包含进程号和线程号，多个进程/线程同时写同一文件时互不覆盖临时文件；
+    最后一次 rename 生效。
+
+    Args:
+        path: 目标文件路径
+        data: 可 JSON 序列化的数据
+        indent: JSON 缩进
+        compress: 是否 gzip 压缩
+        durable: 是否 fsync（缓存类文件可以关闭，换取更少的磁盘同步）
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    opener = gzip.open if compress else open
+    try:
+        with opener(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        if durable:
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if durable:
+        _fsync_dir(path)
+
+
+@contextmanager
+def file_lock(lock_path):
+    """阻塞获取跨进程排他锁（锁文件与数据文件分开，数据文件会被 rename 替换）"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def try_file_lock(lock_path):
+    """非阻塞获取跨进程排他锁
+
+    Returns:
+        已加锁的文件对象（关闭即释放）；锁被其他进程持有时返回 None；
+        不支持 flock 的平台返回 True
+    """
+    if fcntl is None:
+        return True
+
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
@@ -0,0 +1,228 @@
+"""
+阶段计时模块 - 单个请求内各处理阶段的耗时与慢请求日志
+
+功能职责：
+- start_request_timer() - 请求开始时创建计时器并分配请求 ID（沿用上游的 X-Request-ID）
+- use_timer() - 异步入口（classroom_mvp.asgi）把计时器绑定到当前协程上下文
+- stage(name) - 上下文管理器，记录当前请求某个阶段的耗时
+- record_input() / annotate() - 记录输入大小（图片字节数、尺寸）和请求上下文
+- server_timing_header() - 生成 Server-Timing 响应头（浏览器开发者工具和压测脚本可直接读取）
+- log_if_slow() / log_timer_if_slow() - 超过 SLOW_REQUEST_MS 的请求连同阶段明细写入 JSONL 慢请求日志
+- connect_template_timing() - 模板渲染耗时计入 render 阶段
+- 各阶段耗时同时计入 classroom_stage_seconds 直方图（/metrics）
+
+用法：
+    with stage("ai"):
+        generate_ai_comment(...)
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+
+from .config import SLOW_REQUEST_MS, SLOW_LOG_FILE, SLOW_LOG_MAX_BYTES
+from .metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 上游（nginx $request_id 等）传入的请求 ID 只接受这些字符
+REQUEST_ID_PATTERN = re.compile(r"^[\w.-]{1,64}$")
+
+# 异步入口没有 Flask 请求上下文，计时器绑定在协程上下文中（asyncio.to_thread 会一并带入线程）
+_context_timer = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """按顺序记录 (阶段名, 毫秒)；同名阶段多次出现时累加"""
+
+    def __init__(self, request_id=None):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.inputs = {}
+        self.context = {}
+
+    def add(self, name, elapsed_ms):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self):
+        """Server-Timing 头：ai;dur=2480.1, collage;dur=310.2, total;dur=2901.7"""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+
+def new_timer(incoming_id=""):
+    """创建计时器；上游传入的请求 ID 合法时沿用"""
+    incoming_id = incoming_id or ""
+    return StageTimer(incoming_id if REQUEST_ID_PATTERN.match(incoming_id) else None)
+
+
+def start_request_timer():
+    """请求开始时调用：创建计时器，返回请求 ID"""
+    g.stage_timer = new_timer(request.headers.get("X-Request-ID"))
+    return g.stage_timer.request_id
+
+
+def use_timer(timer):
+    """把计时器绑定到当前协程上下文（异步入口使用），返回用于 reset 的 token"""
+    return _context_timer.set(timer)
+
+
+def current_timer():
+    """当前请求的计时器（没有请求上下文时返回 None）"""
+    timer = _context_timer.get()
+    if timer is not None:
+        return timer
+    if not has_request_context():
+        return None
+    if "stage_timer" not in g:
+        g.stage_timer = StageTimer()
+    return g.stage_timer
+
+
+def current_request_id():
+    """当前请求 ID（没有请求上下文时返回 None）"""
+    timer = _context_timer.get() or (g.get("stage_timer") if has_request_context() else None)
+    return timer.request_id if timer is not None else None
+
+
+@contextmanager
+def stage(name):
+    """记录一个处理阶段的耗时（异常退出时同样记录）"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timer = current_timer()
+        if timer is not None:
+            timer.add(name, elapsed * 1000)
+
+
+def record_input(name, **info):
+    """记录一项输入的大小（如 posture: bytes/width/height），写入慢请求日志"""
+    timer = current_timer()
+    if timer is not None:
+        timer.inputs[name] = info
+
+
+def annotate(**fields):
+    """记录请求上下文（如是否请求 AI、推送模式），写入慢请求日志"""
+    timer = current_timer()
+    if timer is not None:
+        timer.context.update(fields)
+
+
+def server_timing_header():
+    """本请求的 Server-Timing 头，没有记录任何阶段时返回 None"""
+    timer = g.get("stage_timer") if has_request_context() else None
+    if timer is None or not timer.stages:
+        return None
+    return timer.header()
+
+
+# ====== 模板渲染 ======
+
+def _before_render(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop("render_started", None)
+    timer = current_timer()
+    if started is not None and timer is not None:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage="render")
+        timer.add("render", elapsed * 1000)
+
+
+def connect_template_timing(app):
+    """把 app 的模板渲染耗时计入 render 阶段"""
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+# ====== 慢请求日志 ======
+
+def _append_line(path, line):
+    """追加一行（O_APPEND 单次写入，多个 worker 同时追加不会交错）；超过上限时轮转为 .1"""
+    try:
+        if os.path.getsize(path) >= SLOW_LOG_MAX_BYTES:
+            os.replace(path, f"{path}.1")
+    except OSError:
+        pass
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def log_timer_if_slow(timer, method, path, endpoint, status, request_bytes=None, response_bytes=None,
+                      threshold_ms=SLOW_REQUEST_MS, log_path=SLOW_LOG_FILE):
+    """请求总耗时超过阈值时写入慢请求日志（不依赖 Flask，异步入口直接调用）
+
+    Returns:
+        写入的日志条目，未超过阈值时返回 None
+    """
+    total_ms = timer.total_ms()
+    if total_ms < threshold_ms:
+        return None
+
+    entry = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "request_id": timer.request_id,
+        "pid": os.getpid(),
+        "method": method,
+        "path": path,
+        "endpoint": endpoint,
+        "status": status,
+        "total_ms": round(total_ms, 1),
+        "stages": {name: round(ms, 1) for name, ms in timer.stages.items()},
+        "unaccounted_ms": round(total_ms - sum(timer.stages.values()), 1),
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+        "inputs": timer.inputs,
+        "context": timer.context,
+    }
+    try:
+        _append_line(log_path, json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning("⚠️ 写入慢请求日志失败: %s", e)
+    logger.warning("🐢 慢请求 %s %s %.0fms (请求 %s)", method, path, total_ms, timer.request_id)
+    return entry
+
+
+def log_if_slow(response, threshold_ms=SLOW_REQUEST_MS, path=SLOW_LOG_FILE):
+    """Flask 请求总耗时超过阈值时写入慢请求日志
+
+    Returns:
+        写入的日志条目，未超过阈值时返回 None
+    """
+    timer = g.get("stage_timer")
+    if timer is None:
+        return None
+    return log_timer_if_slow(
+        timer,
+        request.method,
+        request.path,
+        request.endpoint,
+        response.status_code,
+        request_bytes=request.content_length,
+        response_bytes=response.calculate_content_length(),
+        threshold_ms=threshold_ms,
+        log_path=path,
+    )
@@ -0,0 +1,180 @@
+"""
+启动预热 - 在 worker 处理第一个请求之前加载字体、模板、记录索引和模型
+
+功能职责：
+- warm_up() - 依次执行预热步骤并记录各步耗时：
+  imports（延迟导入的依赖）、fonts（Pillow 插件和拼图字体）、templates（编译模板、静态文件哈希）、
+  records（列式视图、学生档案索引、统计、检索索引）、inksight（INKSIGHT_ENABLED 时加载模型权重）
+- readiness() - 预热状态（/readyz 使用）
+
+gunicorn 按 gunicorn.conf.py 启动时（preload_app），应用在 master 中创建，预热在 fork worker 之前执行一次：
+worker 继承已加载的模块、字体、索引和模型权重，只读页面写时复制共享，不再各自加载。
+预热结束时 gc.freeze()，worker 的垃圾回收不再扫描这些对象（扫描会写对象头，使共享页被复制）；
+被访问对象的引用计数仍会弄脏所在的页，numpy 数组和模型张量的数据区不受影响。
+
+未 preload 时（或 uvicorn 单独运行）在每个进程中执行一次，仍可避免第一个请求变慢。
+"""
+
+import gc
+import os
+import time
+import logging
+import importlib
+import threading
+from datetime import datetime
+
+from .config import WARMUP_ENABLED, INKSIGHT_ENABLED, INKSIGHT_DEVICE
+
+logger = logging.getLogger(__name__)
+
+# 各模块内延迟导入的依赖（见 import_time 基准），预热时提前导入
+PRELOAD_MODULES = ("numpy", "requests", "dashscope", "PIL.Image", "PIL.ImageDraw", "PIL.ImageFont")
+
+_lock = threading.Lock()
+_state = {"pid": None, "started_at": None, "finished_at": None, "steps": {}}
+
+
+def _warm_imports(app):
+    loaded = []
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return f"{len(loaded)}/{len(PRELOAD_MODULES)} 个模块"
+
+
+def _warm_fonts(app):
+    from .image_processor import preload_fonts
+
+    return f"{preload_fonts()} 个字号"
+
+
+def _warm_templates(app):
+    from .app import _static_hash
+
+    names = [name for name in app.jinja_env.list_templates() if name.endswith(".html")]
+    for name in names:
+        app.jinja_env.get_template(name)
+
+    static_files = []
+    for root, _, files in os.walk(app.static_folder):
+        for filename in files:
+            static_files.append(os.path.relpath(os.path.join(root, filename), app.static_folder).replace(os.sep, "/"))
+    with app.app_context():
+        for filename in static_files:
+            _static_hash(filename)
+    return f"{len(names)} 个模板、{len(static_files)} 个静态文件"
+
+
+def _warm_records(app):
+    from .data_manager import get_columnar_view, _get_student_index
+    from .stats_engine import get_stats_engine
+    from .search_index import get_search_index
+
+    view = get_columnar_view()
+    students = _get_student_index()
+    get_stats_engine().refresh()
+    index = get_search_index()
+    index.refresh()
+    return f"{len(view) if view is not None else '-'} 条记录、{len(students)} 位学生、{len(index.docs)} 条检索文档"
+
+
+def _warm_inksight(app):
+    from utils.inksight_wrapper import preload_model
+
+    extractor = preload_model(INKSIGHT_DEVICE)
+    return f"{extractor.MODEL_NAME} ({extractor.device})"
+
+
+def _steps():
+    steps = [
+        ("imports", _warm_imports),
+        ("fonts", _warm_fonts),
+        ("templates", _warm_templates),
+        ("records", _warm_records),
+    ]
+    if INKSIGHT_ENABLED:
+        steps.append(("inksight", _warm_inksight))
+    return steps
+
+
+def _fork_safe(name):
+    # CUDA/MPS 在 fork 出的子进程中不可用，只有 CPU 上的模型可以在 master 中加载
+    return name != "inksight" or INKSIGHT_DEVICE == "cpu"
+
+
+def warm_up(app=None, before_fork=False):
+    """执行尚未完成的预热步骤（重复调用只补做剩余步骤）
+
+    Args:
+        app: Flask 应用，默认为全局应用
+        before_fork: 是否在 gunicorn master 中执行；为 True 时跳过 fork 后不能使用的步骤，
+            留给 worker 中的下一次调用
+
+    Returns:
+        readiness() 的结果
+    """
+    if not WARMUP_ENABLED:
+        return readiness()
+    if app is None:
+        from .app import get_app
+
+        app = get_app()
+
+    with _lock:
+        if _state["started_at"] is None:
+            _state.update(pid=os.getpid(), started_at=datetime.now().isoformat())
+        started = time.perf_counter()
+        ran = 0
+        for name, func in _steps():
+            if name in _state["steps"] or (before_fork and not _fork_safe(name)):
+                continue
+            step_started = time.perf_counter()
+            try:
+                detail, ok = func(app), True
+            except Exception as e:
+                detail, ok = f"{type(e).__name__}: {e}", False
+                logger.warning("⚠️ 预热步骤 %s 失败: %s", name, detail)
+            ms = round((time.perf_counter() - step_started) * 1000, 1)
+            _state["steps"][name] = {"ok": ok, "ms": ms, "detail": detail, "pid": os.getpid()}
+            logger.debug("🔥 预热 %s: %s (%.0fms)", name, detail, ms)
+            ran += 1
+
+        if ran:
+            # fork 前冻结：之后的垃圾回收不再遍历（写入）已加载的对象
+            gc.collect()
+            gc.freeze()
+            status = readiness()
+            if status["ready"] and _state["finished_at"] is None:
+                _state["finished_at"] = datetime.now().isoformat()
+            logger.info(
+                "🔥 预热完成 %d 步，耗时 %dms (pid=%s%s)%s",
+                ran, (time.perf_counter() - started) * 1000, os.getpid(),
+                "，fork 前" if before_fork else "",
+                f"，待 worker 中完成: {'、'.join(status['pending'])}" if status["pending"] else "",
+            )
+    return readiness()
+
+
+def readiness():
+    """预热状态
+
+    Returns:
+        {"ready", "enabled", "pid", "warmed_in", "started_at", "finished_at", "pending", "failed", "steps"}；
+        warmed_in 为执行预热的进程（preload 时是 gunicorn master），失败的步骤不影响就绪
+    """
+    steps = dict(_state["steps"])
+    pending = [name for name, _ in _steps() if name not in steps] if WARMUP_ENABLED else []
+    return {
+        "ready": not pending,
+        "enabled": WARMUP_ENABLED,
+        "pid": os.getpid(),
+        "warmed_in": _state["pid"],
+        "started_at": _state["started_at"],
+        "finished_at": _state["finished_at"],
+        "pending": pending,
+        "failed": [name for name, step in steps.items() if not step["ok"]],
+        "steps": steps,
+    }
@@ -2,70 +2,105 @@
 企业微信通知模块 - 消息推送
 
 功能职责：
+- build_article() - 构造单个学生的图文卡片
+- send_news() - 发送一条（可含多篇图文的）news 消息
 - send_to_wechat() - 发送拼图和评语到企业微信家长群
 - 错误处理和日志记录
 """
 
-import requests
 import logging
 from .config import WECHAT_WEBHOOK
 
 logger = logging.getLogger(__name__)
 
+# 企业微信 news 消息最多支持 8 篇图文
+MAX_NEWS_ARTICLES = 8
 
-def send_to_wechat(image_path, class_name, student_name, comment, image_url):
-    """发送课堂记录拼图到企业微信家长群
+# 企业微信接口频率超限错误码
+ERRCODE_RATE_LIMITED = 45009
+
+
+def build_article(class_name, student_name, comment, image_url):
+    """构造单个学生的图文卡片
 
     Args:
-        image_path: 本地拼图文件路径（备用）
         class_name: 班级名称
         student_name: 学生名字
         comment: 评语文本
         image_url: 拼图的网络URL
 
     Returns:
-        (success: bool, message: str)
+        图文卡片字典
     """
+    return {
+        "title": f"【课堂记录】{student_name} ({class_name})",
+        "description": comment,
+        "url": image_url,
+        "picurl": image_url,
+    }
+
+
+def send_news(articles, webhook=WECHAT_WEBHOOK):
+    """发送一条 news 消息（最多 8 篇图文）
+
+    Args:
+        articles: 图文卡片列表
+        webhook: 群机器人地址
+
+    Returns:
+        (success: bool, message: str, errcode: int|None)
+        网络异常时 errcode 为 None
+    """
+    import requests  # 第一次推送时才加载（requests/urllib3 导入较慢）
+
     try:
-        # 企业微信消息格式（图文卡片）
         msg_data = {
             "msgtype": "news",
-            "news": {
-                "articles": [
-                    {
-                        "title": f"【课堂记录】{student_name} ({class_name})",
-                        "description": comment,
-                        "url": image_url,
-                        "picurl": image_url,
-                    }
-                ]
-            },
+            "news": {"articles": articles[:MAX_NEWS_ARTICLES]},
         }
 
-        logger.info(f"📤 正在发送到企业微信: {student_name} ({class_name})")
-
-        response = requests.post(WECHAT_WEBHOOK, json=msg_data, timeout=10)
+        response = requests.post(webhook, json=msg_data, timeout=10)
         result = response.json()
+        errcode = result.get("errcode")
 
-        if result.get("errcode") == 0:
-            logger.info("✅ 企业微信推送成功")
-            return True, "已发送到家长群"
+        if errcode == 0:
+            logger.info("✅ 企业微信推送成功（%s 篇图文）", len(msg_data['news']['articles']))
+            return True, "已发送到家长群", errcode
         else:
             error_msg = result.get("errmsg", "未知错误")
-            logger.error(f"❌ 企业微信推送失败: {error_msg}")
-            return False, error_msg
+            logger.error("❌ 企业微信推送失败: %s", error_msg)
+            return False, error_msg, errcode
 
     except requests.exceptions.Timeout:
         error_msg = "请求超时"
-        logger.error(f"❌ 企业微信推送超时: {error_msg}")
-        return False, error_msg
+        logger.error("❌ 企业微信推送超时: %s", error_msg)
+        return False, error_msg, None
 
     except requests.exceptions.RequestException as e:
         error_msg = f"网络错误: {str(e)}"
-        logger.error(f"❌ 企业微信推送错误: {error_msg}")
-        return False, error_msg
+        logger.error("❌ 企业微信推送错误: %s", error_msg)
+        return False, error_msg, None
 
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"❌ 企业微信推送异常: {error_msg}")
-        return False, error_msg
+        logger.error("❌ 企业微信推送异常: %s", error_msg)
+        return False, error_msg, None
+
+
+def send_to_wechat(image_path, class_name, student_name, comment, image_url):
+    """发送课堂记录拼图到企业微信家长群
+
+    Args:
+        image_path: 本地拼图文件路径（备用）
+        class_name: 班级名称
+        student_name: 学生名字
+        comment: 评语文本
+        image_url: 拼图的网络URL
+
+    Returns:
+        (success: bool, message: str)
+    """
+    logger.debug("📤 正在发送到企业微信: %s (%s)", student_name, class_name)
+    article = build_article(class_name, student_name, comment, image_url)
+    success, message, _ = send_news([article])
+    return success, message
@@ -0,0 +1,271 @@
+"""
+企业微信推送队列模块 - 持久化 outbox + 频率限制
+
+功能职责：
+- WechatOutbox.enqueue() - 提交时按班级路由写入持久化队列，立即返回
+- 后台调度线程按每个群的令牌桶发送，失败指数退避重试
+- 多个学生的卡片合并为一条多图文 news 消息，多个群并发推送
+- 多个 gunicorn worker 之间只有一个调度线程在发送
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+
+from .config import (
+    WECHAT_OUTBOX_FILE,
+    WECHAT_BATCH_MAX_ARTICLES,
+    WECHAT_BATCH_WINDOW,
+    WECHAT_MAX_ATTEMPTS,
+    WECHAT_RETRY_BASE_DELAY,
+    WECHAT_RETRY_MAX_DELAY,
+)
+from .storage import atomic_write_json, file_lock, try_file_lock
+from .wechat_notifier import MAX_NEWS_ARTICLES
+from .wechat_router import get_router
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_FAILED = "failed"
+
+
+class WechatOutbox:
+    """持久化的企业微信推送队列
+
+    队列文件为 JSON 数组，每项：
+        {id, webhook, article, created_at, attempts, next_attempt_at, status, last_error}
+    发送成功的项从队列删除；超过最大重试次数的项保留为 failed 供排查。
+    """
+
+    def __init__(self, path=WECHAT_OUTBOX_FILE):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.dispatch_lock_path = f"{path}.dispatch.lock"
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._dispatch_lock_file = None
+
+    # ====== 队列读写 ======
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error("❌ 读取推送队列失败: %s", e)
+            return []
+
+    def _write(self, items):
+        atomic_write_json(self.path, items)
+
+    def enqueue(self, article, class_name):
+        """加入推送队列（立即返回）
+
+        班级配置了多个家长群时，每个群各入队一项，分别限速和重试。
+
+        Args:
+            article: build_article() 生成的图文卡片
+            class_name: 班级名称（用于查找推送目标）
+
+        Returns:
+            队列项 ID 列表
+        """
+        now = time.time()
+        items_to_add = [
+            {
+                "id": uuid.uuid4().hex[:12],
+                "class": class_name,
+                "webhook": target.url,
+                "article": article,
+                "created_at": now,
+                "attempts": 0,
+                "next_attempt_at": now,
+                "status": STATUS_PENDING,
+                "last_error": None,
+            }
+            for target in get_router().targets_for(class_name)
+        ]
+        with file_lock(self.lock_path):
+            items = self._read()
+            items.extend(items_to_add)
+            self._write(items)
+
+        logger.info("📥 已加入推送队列: %s -> %s 个群", article.get('title'), len(items_to_add))
+        self.start()
+        self._wakeup.set()
+        return [i["id"] for i in items_to_add]
+
+    def stats(self):
+        """队列状态统计
+
+        Returns:
+            {"pending": int, "failed": int, "oldest_pending_age": float}
+        """
+        items = self._read()
+        pending = [i for i in items if i.get("status") == STATUS_PENDING]
+        oldest = min((i["created_at"] for i in pending), default=None)
+        return {
+            "pending": len(pending),
+            "failed": len(items) - len(pending),
+            "oldest_pending_age": round(time.time() - oldest, 1) if oldest else 0,
+        }
+
+    # ====== 调度线程 ======
+
+    def start(self):
+        """启动后台调度线程（每个进程一个；fork 后自动重启）"""
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if self._dispatch_lock_file not in (None, True):
+            # fork 继承的锁文件句柄，子进程中关闭
+            self._dispatch_lock_file.close()
+        self._dispatch_lock_file = None
+        self._thread_pid = pid
+        self._thread = threading.Thread(
+            target=self._run, name="wechat-outbox", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止调度线程"""
+        self._stop.set()
+        self._wakeup.set()
+
+    def _acquire_dispatch_lock(self):
+        """多进程下只让一个调度线程发送，保证令牌桶全局有效"""
+        if self._dispatch_lock_file is not None:
+            return True
+
+        lock_file = try_file_lock(self.dispatch_lock_path)
+        if lock_file is None:
+            return False
+        self._dispatch_lock_file = lock_file
+        logger.info("📮 推送调度线程已接管 (pid=%s)", os.getpid())
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._acquire_dispatch_lock():
+                # 其他 worker 正在调度，稍后再试
+                self._stop.wait(5)
+                continue
+
+            try:
+                delay = self.dispatch_once()
+            except Exception as e:
+                logger.error("❌ 推送调度异常: %s", e)
+                delay = WECHAT_RETRY_BASE_DELAY
+
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def dispatch_once(self):
+        """执行一轮调度
+
+        Returns:
+            下一轮调度前建议等待的秒数
+        """
+        now = time.time()
+        items = self._read()
+        pending = [i for i in items if i.get("status") == STATUS_PENDING]
+        # 其他 worker 入队不会唤醒本线程，空闲时也按合并窗口轮询
+        if not pending:
+            return WECHAT_BATCH_WINDOW
+
+        # 按 webhook 分组（保持入队顺序）
+        groups = {}
+        delay = WECHAT_BATCH_WINDOW
+        for item in pending:
+            if item["next_attempt_at"] <= now:
+                groups.setdefault(item["webhook"], []).append(item)
+            else:
+                delay = min(delay, item["next_attempt_at"] - now)
+
+        max_articles = min(WECHAT_BATCH_MAX_ARTICLES, MAX_NEWS_ARTICLES)
+        router = get_router()
+        router.refresh()
+        jobs = []
+
+        for webhook, group in groups.items():
+            # 等待合并窗口，除非已经凑满一条消息
+            oldest_age = now - group[0]["created_at"]
+            if len(group) < max_articles and oldest_age < WECHAT_BATCH_WINDOW:
+                delay = min(delay, WECHAT_BATCH_WINDOW - oldest_age)
+                continue
+
+            target = router.target_for_url(webhook)
+            if not target.is_available():
+                delay = min(delay, target.cooldown_remaining())
+                continue
+            if not target.bucket.try_acquire():
+                delay = min(delay, target.bucket.wait_time())
+                continue
+
+            batch = group[:max_articles]
+            jobs.append((target, batch))
+            if len(group) > len(batch):
+                delay = 0
+
+        # 不同的群并发发送（令牌已在上面取得）
+        results = router.send_many(
+            [(target, [i["article"] for i in batch]) for target, batch in jobs],
+            wait=False,
+            acquired=True,
+        )
+        for (target, batch), (success, message, _) in zip(jobs, results):
+            self._complete(batch, success, message)
+
+        return max(delay, 0.2)
+
+    def _complete(self, batch, success, message):
+        """根据发送结果更新队列（重新读取，避免覆盖期间新入队的项）"""
+        batch_ids = {i["id"] for i in batch}
+        now = time.time()
+
+        with file_lock(self.lock_path):
+            items = self._read()
+            if success:
+                items = [i for i in items if i["id"] not in batch_ids]
+            else:
+                for item in items:
+                    if item["id"] not in batch_ids:
+                        continue
+                    item["attempts"] += 1
+                    item["last_error"] = message
+                    if item["attempts"] >= WECHAT_MAX_ATTEMPTS:
+                        item["status"] = STATUS_FAILED
+                        logger.error("❌ 推送多次失败，已放弃: %s", item['article'].get('title'))
+                    else:
+                        backoff = min(
+                            WECHAT_RETRY_BASE_DELAY * 2 ** (item["attempts"] - 1),
+                            WECHAT_RETRY_MAX_DELAY,
+                        )
+                        item["next_attempt_at"] = now + backoff
+            self._write(items)
+
+        if success:
+            logger.info("✅ 推送队列已发送 %s 张卡片", len(batch))
+        else:
+            logger.warning("⚠️ 推送失败，将退避重试: %s", message)
+
+
+# 全局推送队列实例（延迟初始化）
+_outbox = None
+
+
+def get_outbox():
+    """获取全局推送队列实例（单例模式）"""
+    global _outbox
+    if _outbox is None:
+        _outbox = WechatOutbox()
+    return _outbox
@@ -0,0 +1,328 @@
+"""
+企业微信路由模块 - 班级到家长群的路由与并发推送
+
+功能职责：
+- TokenBucket - 令牌桶限速（每个群机器人独立限速）
+- WebhookTarget - 单个群机器人（限速 + 健康状态 + 熔断）
+- WebhookRouter.targets_for() - 按班级查找一个或多个推送目标
+- WebhookRouter.fan_out() - 并发推送到班级的所有目标
+- 路由表文件修改后自动重新加载
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (
+    WECHAT_WEBHOOK,
+    WECHAT_ROUTES_FILE,
+    WECHAT_RATE_LIMIT_PER_MINUTE,
+    WECHAT_RATE_BURST,
+    WECHAT_FANOUT_WORKERS,
+    WECHAT_TARGET_FAILURE_THRESHOLD,
+    WECHAT_TARGET_COOLDOWN,
+)
+from .wechat_notifier import send_news, ERRCODE_RATE_LIMITED
+from .metrics import WECHAT_SENDS, WECHAT_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET = "default"
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    以 rate_per_minute 的速度补充令牌，最多积攒 burst 个。
+    任意 60 秒内最多发送 rate_per_minute + burst 条。
+    """
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self):
+        """尝试取一个令牌，成功返回 True"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        """距离下一个令牌可用的秒数"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        """服务端报频率超限时清空令牌，强制等待补充"""
+        with self._lock:
+            self._refill()
+            self.tokens = 0.0
+
+
+class WebhookTarget:
+    """单个群机器人：独立令牌桶 + 健康统计
+
+    连续失败 WECHAT_TARGET_FAILURE_THRESHOLD 次后熔断 WECHAT_TARGET_COOLDOWN 秒，
+    熔断期间不再向该群发送，冷却结束后自动恢复。
+    """
+
+    def __init__(self, name, url, rate_limit_per_minute=WECHAT_RATE_LIMIT_PER_MINUTE,
+                 burst=WECHAT_RATE_BURST):
+        self.name = name
+        self.url = url
+        self.bucket = TokenBucket(rate_limit_per_minute, burst)
+        self.sent = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_success_at = None
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        """是否未处于熔断状态"""
+        return time.time() >= self.open_until
+
+    def cooldown_remaining(self):
+        """熔断剩余秒数"""
+        return max(self.open_until - time.time(), 0.0)
+
+    def record_result(self, success, message=None, errcode=None):
+        """记录一次发送结果，更新健康状态"""
+        with self._lock:
+            if success:
+                self.sent += 1
+                self.consecutive_failures = 0
+                self.last_success_at = time.time()
+                self.open_until = 0.0
+                return
+
+            self.failed += 1
+            self.consecutive_failures += 1
+            self.last_error = message
+            if errcode == ERRCODE_RATE_LIMITED:
+                self.bucket.drain()
+            if self.consecutive_failures >= WECHAT_TARGET_FAILURE_THRESHOLD:
+                self.open_until = time.time() + WECHAT_TARGET_COOLDOWN
+                logger.warning(
+                    "⚠️ 群机器人 %s 连续失败 %d 次，暂停 %s 秒",
+                    self.name, self.consecutive_failures, WECHAT_TARGET_COOLDOWN,
+                )
+
+    def snapshot(self):
+        """健康状态快照（用于状态接口）"""
+        return {
+            "name": self.name,
+            "healthy": self.is_available(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "consecutive_failures": self.consecutive_failures,
+            "cooldown_remaining": round(self.cooldown_remaining(), 1),
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
+
+
+class WebhookRouter:
+    """班级 → 群机器人路由表
+
+    路由表文件不存在时，所有班级推送到默认群 WECHAT_WEBHOOK。
+    目标对象按 URL 复用，令牌桶和健康状态在重新加载路由表后保留。
+    """
+
+    def __init__(self, routes_file=WECHAT_ROUTES_FILE):
+        self.routes_file = routes_file
+        self._targets_by_url = {}
+        self._named = {}
+        self._routes = {}
+        self._default = [DEFAULT_TARGET]
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._targets_lock = threading.Lock()
+        self._executor = None
+
+    # ====== 路由表 ======
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.routes_file)
+        except OSError:
+            mtime = None
+
+        if self._named and mtime == self._mtime:
+            return
+
+        config = {}
+        if mtime is not None:
+            try:
+                with open(self.routes_file, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+                logger.info("✅ 已加载推送路由表: %s", self.routes_file)
+            except Exception as e:
+                logger.error("❌ 读取推送路由表失败: %s", e)
+                if self._named:
+                    return
+
+        named = {DEFAULT_TARGET: self.target_for_url(WECHAT_WEBHOOK, DEFAULT_TARGET)}
+        for name, spec in config.get("targets", {}).items():
+            if isinstance(spec, str):
+                spec = {"url": spec}
+            named[name] = self.target_for_url(
+                spec["url"],
+                name,
+                spec.get("rate_limit_per_minute", WECHAT_RATE_LIMIT_PER_MINUTE),
+                spec.get("burst", WECHAT_RATE_BURST),
+            )
+
+        self._named = named
+        self._routes = config.get("routes", {})
+        self._default = config.get("default", [DEFAULT_TARGET])
+        self._mtime = mtime
+
+    def target_for_url(self, url, name=None, rate_limit_per_minute=WECHAT_RATE_LIMIT_PER_MINUTE,
+                       burst=WECHAT_RATE_BURST):
+        """按 URL 获取（或创建）推送目标"""
+        with self._targets_lock:
+            target = self._targets_by_url.get(url)
+            if target is None:
+                target = WebhookTarget(name or url[-8:], url, rate_limit_per_minute, burst)
+                self._targets_by_url[url] = target
+            return target
+
+    def targets_for(self, class_name):
+        """获取班级的所有推送目标
+
+        Args:
+            class_name: 班级名称
+
+        Returns:
+            WebhookTarget 列表（去重，保持配置顺序）
+        """
+        with self._lock:
+            self._reload_if_changed()
+            refs = self._routes.get(class_name) or self._default
+            if isinstance(refs, str):
+                refs = [refs]
+
+            targets = []
+            for ref in refs:
+                if ref in self._named:
+                    target = self._named[ref]
+                elif ref.startswith("http"):
+                    target = self.target_for_url(ref)
+                else:
+                    logger.warning("⚠️ 路由表中未定义的推送目标: %s", ref)
+                    continue
+                if target not in targets:
+                    targets.append(target)
+
+            return targets or [self._named[DEFAULT_TARGET]]
+
+    def refresh(self):
+        """路由表文件有变化时重新加载"""
+        with self._lock:
+            self._reload_if_changed()
+
+    def health(self):
+        """所有已知目标的健康状态"""
+        self.refresh()
+        return [t.snapshot() for t in list(self._targets_by_url.values())]
+
+    # ====== 并发推送 ======
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=WECHAT_FANOUT_WORKERS, thread_name_prefix="wechat-fanout"
+            )
+        return self._executor
+
+    def send(self, target, articles, wait=True, acquired=False):
+        """向单个目标发送（遵守该目标的限速和熔断）
+
+        Args:
+            target: WebhookTarget
+            articles: 图文卡片列表
+            wait: 没有令牌时是否等待
+            acquired: 调用方是否已取得令牌（推送队列先取令牌再组批）
+
+        Returns:
+            (success: bool, message: str, errcode: int|None)
+        """
+        if not target.is_available():
+            WECHAT_SENDS.inc(result="paused")
+            return False, f"推送目标 {target.name} 暂停中", None
+
+        while not acquired and not target.bucket.try_acquire():
+            if not wait:
+                WECHAT_SENDS.inc(result="throttled")
+                return False, f"推送目标 {target.name} 频率受限", ERRCODE_RATE_LIMITED
+            time.sleep(target.bucket.wait_time())
+
+        started = time.perf_counter()
+        success, message, errcode = send_news(articles, webhook=target.url)
+        WECHAT_SEND_SECONDS.observe(time.perf_counter() - started)
+        WECHAT_SENDS.inc(result="ok" if success else "error")
+        target.record_result(success, message, errcode)
+        return success, message, errcode
+
+    def send_many(self, jobs, wait=True, acquired=False):
+        """并发执行多个 (target, articles) 发送任务
+
+        Returns:
+            与 jobs 顺序一致的 (success, message, errcode) 列表
+        """
+        if not jobs:
+            return []
+        if len(jobs) == 1:
+            target, articles = jobs[0]
+            return [self.send(target, articles, wait, acquired)]
+
+        executor = self._get_executor()
+        futures = [executor.submit(self.send, t, a, wait, acquired) for t, a in jobs]
+        return [f.result() for f in futures]
+
+    def fan_out(self, class_name, articles, wait=True, skip=()):
+        """并发推送到班级的所有目标
+
+        Args:
+            class_name: 班级名称
+            articles: 图文卡片列表
+            wait: 没有令牌时是否等待
+            skip: 不再发送的目标名称（如已送达的目标）
+
+        Returns:
+            {目标名称: (success, message)}，不含 skip 中的目标
+        """
+        targets = [t for t in self.targets_for(class_name) if t.name not in skip]
+        results = self.send_many([(t, articles) for t in targets], wait)
+        return {t.name: (ok, msg) for t, (ok, msg, _) in zip(targets, results)}
+
+
+# 全局路由实例（延迟初始化）
+_router = None
+
+
+def get_router():
+    """获取全局路由实例（单例模式）"""
+    global _router
+    if _router is None:
+        _router = WebhookRouter()
+    return _router
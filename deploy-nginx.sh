@@ -37,6 +37,14 @@ server {
         expires 30d;
         add_header Cache-Control "public";
     }
+
+    # Flask 校验文件名后通过 X-Accel-Redirect 交给 nginx 发送（FILE_SERVE_MODE=nginx）
+    # Cache-Control / Content-Type 沿用 Flask 响应头，ETag 与条件请求由 nginx 处理
+    location /_protected_uploads/ {
+        internal;
+        alias /root/classroom_test/uploads/;
+        etag on;
+    }
 }
 EOF
 
@@ -71,6 +71,7 @@ User=root
 WorkingDirectory=$PROJECT_DIR
 ExecStart=$VENV_DIR/bin/gunicorn -w 4 -b 127.0.0.1:5000 ${APP_NAME}:app
 Restart=always
+Environment=FILE_SERVE_MODE=nginx
 StandardOutput=journal
 StandardError=journal
 
@@ -102,6 +103,14 @@ server {
         alias $PROJECT_DIR/uploads/;
         expires 30d;
     }
+
+    # Flask 校验文件名后通过 X-Accel-Redirect 交给 nginx 发送（FILE_SERVE_MODE=nginx）
+    # Cache-Control / Content-Type 沿用 Flask 响应头，ETag 与条件请求由 nginx 处理
+    location /_protected_uploads/ {
+        internal;
+        alias $PROJECT_DIR/uploads/;
+        etag on;
+    }
 }
 EOF
 
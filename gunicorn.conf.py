@@ -0,0 +1,32 @@
+"""
+gunicorn 配置 - 在 master 中创建应用并预热，worker fork 后共享
+
+在项目目录运行 gunicorn 时自动读取（gunicorn -w 4 -b 127.0.0.1:5000 run:app），
+命令行参数优先于本文件。
+
+- preload_app: master 导入应用，when_ready（fork 第一个 worker 之前）执行预热：
+  字体、模板、记录索引、InkSight 模型权重只加载一次，worker 写时复制共享，第一个请求不再变慢
+- post_worker_init: worker 中重新注册剖析信号（gunicorn 在 worker 初始化时重置了信号处理），
+  并补做 fork 前不能执行的预热步骤（如 GPU 上的模型）
+- GUNICORN_PRELOAD=0 时每个 worker 各自创建应用并预热
+- /readyz 在本 worker 预热完成后返回 200
+"""
+
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+
+def when_ready(server):
+    if preload_app:
+        from classroom_mvp.warmup import warm_up
+
+        warm_up(before_fork=True)
+
+
+def post_worker_init(worker):
+    from classroom_mvp.profiler import install_signal_handler
+    from classroom_mvp.warmup import warm_up
+
+    install_signal_handler()
+    warm_up()
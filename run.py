@@ -6,9 +6,16 @@
     python run.py
 
 这是模块化重构后的新启动方式（替代原 class_mvp.py）
+生产环境: gunicorn -w 4 -b 127.0.0.1:5000 run:app
+（在本目录运行时自动读取 gunicorn.conf.py：master 中创建应用并预热，worker 共享）
 """
 
-from classroom_mvp.app import app
+from classroom_mvp.app import get_app
+
+app = get_app()
 
 if __name__ == "__main__":
+    from classroom_mvp.warmup import warm_up
+
+    warm_up(app)
     app.run(host="0.0.0.0", port=5000, debug=False)
@@ -0,0 +1,23 @@
+"""
+测试公共配置
+
+记录文件、统计文件、推送队列等路径在 config.py 中是相对路径，
+每个测试切换到独立的临时目录，互不影响，也不会改动仓库中的数据文件。
+指标文件在进程退出时写出（此时已不在测试目录中），导入应用之前改到临时目录。
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="classroom-metrics-"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时工作目录"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,103 @@
+"""AI 评语生成：同步（SDK）与异步（SDK 上传 + httpx 生成）入口对本地模拟 DashScope 服务的请求"""
+
+import os
+import sys
+import json
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("dashscope")
+pytest.importorskip("httpx")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from mock_common import LatencyModel, create_server  # noqa: E402
+from mock_dashscope import DashScopeHandler  # noqa: E402
+
+from classroom_mvp import ai_engine  # noqa: E402
+
+GENERATION_PATH = "/api/v1/services/aigc/multimodal-generation/generation"
+
+
+class RecordingHandler(DashScopeHandler):
+    """记录收到的每个请求（路径、请求头、请求体）"""
+
+    def read_body(self):
+        body = super().read_body()
+        with self.server.stats_lock:
+            self.server.requests.append((self.command, self.path_only, dict(self.headers), body))
+        return body
+
+
+@pytest.fixture
+def dashscope_server(monkeypatch):
+    server = create_server(RecordingHandler, upload_latency=LatencyModel(0), requests=[])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    monkeypatch.setattr(ai_engine, "DASHSCOPE_BASE_URL", f"http://{host}:{port}/api/v1")
+    monkeypatch.setattr(ai_engine, "DASHSCOPE_API_KEY", "mock-key")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def image(tmp_path):
+    from PIL import Image
+
+    path = tmp_path / "w_test.jpg"
+    Image.new("RGB", (64, 48), "white").save(path)
+    return str(path)
+
+
+def _generation_requests(server):
+    return [
+        (headers, json.loads(body))
+        for method, path, headers, body in server.requests
+        if method == "POST" and path == GENERATION_PATH
+    ]
+
+
+def _image_url(payload):
+    content = payload["input"]["messages"][0]["content"]
+    return next(item["image"] for item in content if "image" in item)
+
+
+def test_async_comment_uploads_then_generates(dashscope_server, image):
+    comment, error, elapsed_ms = asyncio.run(ai_engine.generate_ai_comment_async(image, "张三"))
+
+    assert error is None and comment and elapsed_ms >= 0
+    assert dashscope_server.stats["policy"] == 1
+    assert dashscope_server.stats["upload"] == 1
+    assert dashscope_server.stats["ok"] == 1
+
+    ((headers, payload),) = _generation_requests(dashscope_server)
+    assert headers["Authorization"] == "Bearer mock-key"
+    assert headers["X-DashScope-OssResourceResolve"] == "enable"
+    assert payload["model"] == ai_engine.AI_MODEL
+    assert _image_url(payload) == f"oss://mock/{ai_engine.AI_MODEL}/w_test.jpg"
+
+
+def test_async_request_matches_sdk_request(dashscope_server, image):
+    """异步入口发出的生成请求与 SDK 同步调用一致（图片地址、模型、资源解析头）"""
+    sync_comment, sync_error, _ = ai_engine.generate_ai_comment(image, "张三")
+    async_comment, async_error, _ = asyncio.run(ai_engine.generate_ai_comment_async(image, "张三"))
+
+    assert sync_error is None and async_error is None
+    (sync_headers, sync_payload), (async_headers, async_payload) = _generation_requests(dashscope_server)
+    assert _image_url(async_payload) == _image_url(sync_payload)
+    assert async_payload["model"] == sync_payload["model"]
+    assert async_headers["X-DashScope-OssResourceResolve"] == sync_headers["X-DashScope-OssResourceResolve"]
+
+
+def test_async_upload_failure_returns_unavailable(dashscope_server, image, monkeypatch):
+    monkeypatch.setattr(ai_engine, "AI_MAX_RETRIES", 1)
+    os.remove(image)
+
+    comment, error, elapsed_ms = asyncio.run(ai_engine.generate_ai_comment_async(image, "张三"))
+
+    assert (comment, error, elapsed_ms) == (None, ai_engine.UNAVAILABLE_MSG, 0)
+    assert _generation_requests(dashscope_server) == []
@@ -0,0 +1,62 @@
+"""列式视图：向量化筛选与计数，以及 created_at 无法解析的记录不影响其他记录"""
+
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from classroom_mvp.analytics import ColumnarView  # noqa: E402
+from classroom_mvp.data_manager import filter_records, get_all_classes  # noqa: E402
+
+RECORDS = [
+    {"id": "r1", "class": "一班", "student": "张三", "created_at": "2026-03-01T09:00:00", "ai_generated": True},
+    {"id": "r2", "class": "一班", "student": "李四", "created_at": "2026-03-02T10:00:00", "ai_generated": False},
+    {"id": "r3", "class": "二班", "student": "王五", "created_at": "2026-04-01T10:00:00", "ai_generated": True},
+]
+
+# 手工编辑或导入的记录
+MALFORMED = [
+    {"id": "b1", "class": "二班", "student": "赵六", "created_at": "2026/03/01 9点"},
+    {"id": "b2", "class": "一班", "student": "钱七", "created_at": "2026-03-01 9:5"},
+    {"id": "b3", "class": "三班", "student": "孙八"},
+]
+
+
+def test_mask_by_class_and_date():
+    view = ColumnarView.build(RECORDS)
+
+    assert [r["id"] for r in view.select(view.mask(class_name="一班"))] == ["r1", "r2"]
+    assert [r["id"] for r in view.select(view.mask(date_str="2026-03"))] == ["r1", "r2"]
+    assert [r["id"] for r in view.select(view.mask("一班", "2026-03-02"))] == ["r2"]
+    assert not view.mask(class_name="不存在").any()
+
+
+def test_malformed_created_at_does_not_break_the_view():
+    view = ColumnarView.build(RECORDS + MALFORMED)
+
+    # 只有日期部分可解析的记录仍按日期命中；完全无法解析或缺失的按无日期处理
+    assert [r["id"] for r in view.select(view.mask(date_str="2026-03-01"))] == ["r1", "b2"]
+    assert [r["id"] for r in view.select(view.mask(class_name="二班"))] == ["r3", "b1"]
+    assert len(view) == 6
+
+
+@pytest.fixture
+def records_file(workdir):
+    with open("records.json", "w", encoding="utf-8") as f:
+        json.dump(RECORDS + MALFORMED, f, ensure_ascii=False)
+
+
+def test_filter_and_class_listing_survive_malformed_rows(records_file):
+    assert [r.get("id") for r in filter_records(class_name="二班")] == ["r3", "b1"]
+    assert [r.get("id") for r in filter_records(date_str="2026-03-02")] == ["r2"]
+    assert set(get_all_classes()) == {"一班", "二班", "三班"}
+
+
+def test_export_and_stats_pages_survive_malformed_rows(records_file):
+    from classroom_mvp.app import create_app
+
+    client = create_app().test_client()
+
+    assert client.get("/export", query_string={"class": "二班"}).status_code == 200
+    assert client.get("/stats").status_code == 200
@@ -0,0 +1,141 @@
+"""InkSight 微批推理：请求合并成批、结果按请求分发、缓存命中不入队、停止时不遗留等待的请求"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("torch")
+
+from utils.inksight_batcher import InkSightBatchServer  # noqa: E402
+
+
+class FakeExtractor:
+    """实现微批服务用到的提取器接口；按图像路径生成可区分的预测，记录每次推理的批大小"""
+
+    def __init__(self, delay=0.0, fail=False, cached=()):
+        self.delay = delay
+        self.fail = fail
+        self.cached = set(cached)
+        self.batches = []
+        self.remembered = []
+        self._lock = threading.Lock()
+
+    def new_result(self, image_path):
+        return {"success": False, "image_path": image_path, "error": None, "cached": False}
+
+    def lookup(self, image_path):
+        if image_path in self.cached:
+            return image_path, {"features": [0.0], "stroke_count": -1, "confidence": 1.0, "cached": True}
+        return image_path, None
+
+    def remember(self, key, prediction):
+        self.remembered.append(key)
+
+    def load_image(self, image_path):
+        if image_path.startswith("missing"):
+            raise FileNotFoundError(image_path)
+        return image_path
+
+    def preprocess(self, image):
+        return {"path": image}
+
+    def infer_preprocessed(self, inputs):
+        with self._lock:
+            self.batches.append(len(inputs))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("out of memory")
+        return [
+            {"features": [float(len(i["path"]))], "stroke_count": int(i["path"].split("_")[1]), "confidence": 0.9}
+            for i in inputs
+        ]
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def make(extractor, **kwargs):
+        server = InkSightBatchServer(extractor, **kwargs)
+        started.append(server)
+        return server
+
+    yield make
+    for server in started:
+        server.stop()
+
+
+def test_concurrent_requests_are_batched_and_scattered(servers):
+    extractor = FakeExtractor(delay=0.02)
+    server = servers(extractor, max_batch_size=4, max_wait_ms=200)
+    paths = [f"img_{i}" for i in range(12)]
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(server.extract_digital_ink, paths))
+
+    # 每个请求拿到自己图像的结果
+    assert [r["stroke_count"] for r in results] == list(range(12))
+    assert all(r["success"] and r["image_path"] == p for r, p in zip(results, paths))
+    assert sum(extractor.batches) == 12
+    assert max(extractor.batches) == 4
+    assert len(extractor.batches) < 12
+    assert sorted(extractor.remembered) == sorted(paths)
+
+    stats = server.stats()
+    assert stats["images"] == 12 and stats["batches"] == len(extractor.batches)
+
+
+def test_partial_batch_runs_after_max_wait(servers):
+    extractor = FakeExtractor()
+    server = servers(extractor, max_batch_size=8, max_wait_ms=20)
+
+    started = time.perf_counter()
+    result = server.extract_digital_ink("img_7", timeout=5)
+
+    assert result["success"] and result["batch_size"] == 1
+    assert time.perf_counter() - started < 2
+    assert extractor.batches == [1]
+
+
+def test_cache_hits_and_load_errors_skip_the_queue(servers):
+    extractor = FakeExtractor(cached={"img_1"})
+    server = servers(extractor, max_wait_ms=0)
+
+    hit = server.extract_digital_ink("img_1", timeout=5)
+    missing = server.extract_digital_ink("missing_2", timeout=5)
+
+    assert hit["success"] and hit["cached"] and hit["stroke_count"] == -1
+    assert not missing["success"] and missing["error"].startswith("文件错误")
+    assert extractor.batches == []
+
+
+def test_inference_error_fails_the_whole_batch(servers):
+    extractor = FakeExtractor(fail=True)
+    server = servers(extractor, max_batch_size=4, max_wait_ms=100)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(server.extract_digital_ink, [f"img_{i}" for i in range(4)]))
+
+    assert all(not r["success"] and "out of memory" in r["error"] for r in results)
+    assert extractor.remembered == []
+
+
+def test_stop_leaves_no_request_waiting(servers):
+    extractor = FakeExtractor(delay=0.05)
+    server = servers(extractor, max_batch_size=2, max_wait_ms=5)
+
+    queued = [server.submit(f"img_{i}") for i in range(6)]
+    stopper = threading.Thread(target=server.stop)
+    stopper.start()
+    late = [server.submit(f"img_{i}") for i in range(6, 30)]
+    stopper.join()
+
+    results = [f.result(timeout=5) for f in queued + late]
+    # 停止前入队的请求都处理完，停止过程中提交的请求立即失败
+    assert all(r["success"] for r in results[:6])
+    assert all(r["success"] or r["error"] == "微批推理服务正在停止" for r in results[6:])
+
+    # 停止后再次提交会重新启动推理线程
+    assert server.extract_digital_ink("img_99", timeout=5)["success"]
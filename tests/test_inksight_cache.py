@@ -0,0 +1,113 @@
+"""InkSight 特征缓存：读写、跨实例可见、写入中断后的恢复"""
+
+import numpy as np
+import pytest
+
+from utils.inksight_cache import FEATURE_DTYPE, FeatureCache
+
+MODEL_VERSION = "Derendering/InkSight-Small-p@main/f1"
+
+
+def _prediction(seed, dim=16):
+    rng = np.random.default_rng(seed)
+    return {"features": rng.random(dim).astype(np.float32), "stroke_count": seed, "confidence": 0.5 + seed / 100}
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "features")
+
+
+def test_put_then_get(root):
+    cache = FeatureCache(MODEL_VERSION, root=root)
+    prediction = _prediction(3)
+
+    assert cache.get("k3") is None
+    assert cache.put("k3", prediction)
+
+    hit = cache.get("k3")
+    assert hit["stroke_count"] == 3
+    assert hit["confidence"] == pytest.approx(0.53)
+    assert hit["features"].dtype == FEATURE_DTYPE
+    np.testing.assert_allclose(hit["features"], prediction["features"], rtol=1e-3)
+    assert cache.stats()["entries"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_put_is_idempotent(root):
+    cache = FeatureCache(MODEL_VERSION, root=root)
+    cache.put("k1", _prediction(1))
+    cache.put("k1", _prediction(2))
+
+    assert cache.stats()["entries"] == 1
+    assert cache.get("k1")["stroke_count"] == 1
+    assert cache.matrix().shape == (1, 16)
+
+
+def test_other_instance_sees_new_entries(root):
+    writer = FeatureCache(MODEL_VERSION, root=root)
+    reader = FeatureCache(MODEL_VERSION, root=root)
+    writer.put("k1", _prediction(1))
+    assert reader.get("k1")["stroke_count"] == 1
+
+    writer.put("k2", _prediction(2))
+    # 读者的内存映射已建立，新行写入后重新映射
+    assert reader.get("k2")["stroke_count"] == 2
+    assert reader.matrix().shape == (2, 16)
+
+
+def test_model_versions_are_isolated(root):
+    FeatureCache(MODEL_VERSION, root=root).put("k1", _prediction(1))
+
+    assert FeatureCache("Derendering/InkSight-Small-p@main/f2", root=root).get("k1") is None
+
+
+def test_dimension_mismatch_is_not_written(root):
+    cache = FeatureCache(MODEL_VERSION, root=root)
+    cache.put("k1", _prediction(1, dim=16))
+
+    assert not cache.put("k2", _prediction(2, dim=8))
+    assert cache.get("k2") is None
+
+
+def test_recovers_from_torn_data_row(root):
+    cache = FeatureCache(MODEL_VERSION, root=root)
+    cache.put("k1", _prediction(1))
+    # 模拟写特征时进程被杀：数据文件末尾留下半行，索引没有对应的行
+    with open(cache.data_path, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    reopened = FeatureCache(MODEL_VERSION, root=root)
+    assert reopened.put("k2", _prediction(2))
+
+    row_bytes = 16 * np.dtype(FEATURE_DTYPE).itemsize
+    assert cache.data_path.stat().st_size == 2 * row_bytes
+    np.testing.assert_allclose(reopened.get("k2")["features"], _prediction(2)["features"], rtol=1e-3)
+    np.testing.assert_allclose(reopened.get("k1")["features"], _prediction(1)["features"], rtol=1e-3)
+
+
+def test_recovers_from_torn_index_line(root):
+    cache = FeatureCache(MODEL_VERSION, root=root)
+    cache.put("k1", _prediction(1))
+    # 模拟写索引时进程被杀：最后一行没有换行符
+    with open(cache.index_path, "ab") as f:
+        f.write(b'{"k": "torn", "r": 1')
+
+    reopened = FeatureCache(MODEL_VERSION, root=root)
+    assert reopened.get("torn") is None
+    reopened.put("k2", _prediction(2))
+
+    fresh = FeatureCache(MODEL_VERSION, root=root)
+    assert fresh.get("k1")["stroke_count"] == 1
+    assert fresh.get("k2")["stroke_count"] == 2
+    assert fresh.stats()["entries"] == 2
+
+
+def test_content_hash_follows_bytes_not_name(tmp_path):
+    a, b, c = tmp_path / "a.jpg", tmp_path / "b.jpg", tmp_path / "c.jpg"
+    a.write_bytes(b"same image")
+    b.write_bytes(b"same image")
+    c.write_bytes(b"other image")
+
+    assert FeatureCache.content_hash(str(a)) == FeatureCache.content_hash(str(b))
+    assert FeatureCache.content_hash(str(a)) != FeatureCache.content_hash(str(c))
@@ -0,0 +1,95 @@
+"""Record 存储格式：v1/v2 读取、往返转换、URL 压缩，以及 maintenance.migrate_records 迁移"""
+
+import gzip
+import json
+import os
+
+from classroom_mvp.data_manager import cold_segment_path, load_all_records
+from classroom_mvp.maintenance import migrate_records
+from classroom_mvp.record import SCHEMA_VERSION, Record, needs_migration
+
+V1 = {
+    "id": "a1b2c3",
+    "class": "一班",
+    "group": "一班",
+    "student": "张三",
+    "comment": "结构端正",
+    "ai_generated": True,
+    "comment_length": 4,
+    "posture_url": "/p_a1b2c3.jpg",
+    "work_url": "/w_a1b2c3.jpg",
+    "collage_url": "/c_custom.jpg",
+    "created_at": "2026-03-01T09:15:00",
+    "timestamp": "2026-03-01T09:15:00",
+    "ai_model": "qwen-vl-plus",
+    "generation_time_ms": 820,
+    "teacher": "王老师",
+}
+
+
+def test_from_v1_drops_duplicate_fields():
+    record = Record.from_dict(V1)
+    data = record.to_dict()
+
+    assert data["schema"] == SCHEMA_VERSION
+    assert "timestamp" not in data and "group" not in data
+    assert data["class"] == "一班"
+    assert data["created_at"] == "2026-03-01T09:15:00"
+    # 未知字段原样保留
+    assert data["teacher"] == "王老师"
+
+
+def test_round_trip_is_stable():
+    data = Record.from_dict(V1).to_dict()
+
+    assert Record.from_dict(data).to_dict() == data
+    assert not needs_migration(data)
+    assert needs_migration(V1)
+
+
+def test_v1_without_class_uses_group():
+    legacy = {k: v for k, v in V1.items() if k != "class"}
+
+    assert Record.from_dict(legacy).get("class") == "一班"
+
+
+def test_default_urls_are_derived_not_stored():
+    record = Record.from_dict(V1)
+
+    assert record._posture_url is None and record._work_url is None
+    assert record.posture_url == "/p_a1b2c3.jpg"
+    # 与默认值不同的 URL 单独保存
+    assert record.collage_url == "/c_custom.jpg"
+    assert record.to_dict()["work_url"] == "/w_a1b2c3.jpg"
+
+
+def test_dict_style_access():
+    record = Record.from_dict(V1)
+
+    assert record["student"] == "张三"
+    assert record.get("ai_requested") is None
+    assert record.get("missing", "默认") == "默认"
+    assert "teacher" in record and "missing" not in record
+
+
+def test_migrate_rewrites_hot_and_cold_files(workdir):
+    with open("records.json", "w", encoding="utf-8") as f:
+        json.dump([V1], f)
+    os.makedirs("cold")
+    cold_v1 = dict(V1, id="old001", created_at="2025-01-05T10:00:00", timestamp="2025-01-05T10:00:00")
+    with gzip.open(cold_segment_path("2025-01"), "wt", encoding="utf-8") as f:
+        json.dump([cold_v1], f)
+
+    assert migrate_records(dry_run=True)["migrated_files"] == ["records.json", cold_segment_path("2025-01")]
+    result = migrate_records()
+
+    assert len(result["migrated_files"]) == 2
+    with open("records.json", "r", encoding="utf-8") as f:
+        assert [d["schema"] for d in json.load(f)] == [SCHEMA_VERSION]
+    with gzip.open(cold_segment_path("2025-01"), "rt", encoding="utf-8") as f:
+        (cold,) = json.load(f)
+    assert cold["schema"] == SCHEMA_VERSION and "timestamp" not in cold
+    assert [r.get("id") for r in load_all_records()] == ["old001", "a1b2c3"]
+
+    # 已是当前版本，不再重写
+    assert migrate_records()["migrated_files"] == []
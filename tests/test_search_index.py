@@ -0,0 +1,43 @@
+"""评语全文检索：分词命中、班级过滤，以及冷数据与热记录重复时不返回重复结果"""
+
+import os
+
+from classroom_mvp.data_manager import cold_segment_path, dump_records, save_record
+from classroom_mvp.record import Record
+from classroom_mvp.search_index import SearchIndex
+from classroom_mvp.storage import atomic_write_json
+
+
+def _record(record_id, class_name, student, comment, created_at="2026-03-01T09:00:00"):
+    return {"id": record_id, "class": class_name, "student": student, "comment": comment, "created_at": created_at}
+
+
+def test_search_matches_comment_and_class(workdir):
+    save_record(_record("r1", "一班", "张三", "笔顺正确，结构端正"))
+    save_record(_record("r2", "二班", "李四", "笔顺需要加强"))
+    save_record(_record("r3", "一班", "王五", "墨色均匀"))
+    index = SearchIndex()
+
+    records, total = index.search("笔顺")
+    assert total == 2
+    # 按保存时间倒序
+    assert [r.get("id") for r in records] == ["r2", "r1"]
+
+    records, total = index.search("笔顺", class_name="一班")
+    assert [r.get("id") for r in records] == ["r1"]
+    assert index.search("张三")[1] == 1
+
+
+def test_rebuild_does_not_duplicate_records_in_cold_and_hot(workdir):
+    # 归档写完冷数据段、还没从热记录文件删除时重建索引
+    archived = [_record("c1", "一班", "张三", "笔顺正确", "2026-01-05T09:00:00")]
+    os.makedirs("cold")
+    atomic_write_json(cold_segment_path("2026-01"), dump_records([Record.from_dict(r) for r in archived]),
+                      compress=True)
+    save_record(archived[0])
+    save_record(_record("h1", "一班", "李四", "笔顺清楚"))
+
+    records, total = SearchIndex().search("笔顺")
+
+    assert total == 2
+    assert [r.get("id") for r in records] == ["h1", "c1"]
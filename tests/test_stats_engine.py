@@ -0,0 +1,166 @@
+"""StatsEngine 分桶、按日期范围查询、延迟分位数，以及 /stats 的参数校验"""
+
+import os
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from classroom_mvp.config import STATS_MAX_RANGE_DAYS
+from classroom_mvp.data_manager import cold_segment_path, dump_records, save_record
+from classroom_mvp.record import Record
+from classroom_mvp.stats_engine import LatencyHistogram, StatsEngine
+from classroom_mvp.storage import atomic_write_json
+
+
+def _record(record_id, class_name, created_at, ai_generated=True, generation_time_ms=None):
+    return {
+        "id": record_id,
+        "class": class_name,
+        "student": f"学生{record_id}",
+        "comment": "写得不错",
+        "ai_generated": ai_generated,
+        "ai_requested": True,
+        "created_at": created_at,
+        "generation_time_ms": generation_time_ms,
+    }
+
+
+@pytest.fixture
+def engine(workdir):
+    save_record(_record("r1", "一班", "2026-03-01T09:15:00", generation_time_ms=100))
+    save_record(_record("r2", "一班", "2026-03-01T10:30:00", generation_time_ms=1000))
+    save_record(_record("r3", "二班", "2026-03-01T10:45:00", ai_generated=False))
+    save_record(_record("r4", "一班", "2026-03-03T09:00:00", generation_time_ms=400))
+    save_record(_record("r5", "二班", "2026-02-20T09:00:00", generation_time_ms=400))
+    return StatsEngine()
+
+
+def test_query_merges_buckets_in_range(engine):
+    result = engine.query("2026-03-01", "2026-03-03")
+
+    assert [d["date"] for d in result["days"]] == ["2026-03-01", "2026-03-02", "2026-03-03"]
+    assert [d["submissions"] for d in result["days"]] == [3, 0, 1]
+    assert result["totals"]["submissions"] == 4
+    assert result["totals"]["ai_requested"] == 4
+    assert result["totals"]["ai_success"] == 3
+    assert result["totals"]["ai_success_rate"] == 75.0
+    assert result["hours"][9] == 2 and result["hours"][10] == 2
+    assert [c["class"] for c in result["classes"]] == ["一班", "二班"]
+    # 范围外的 2 月记录不计入
+    assert result["days"][1]["latency_p50"] is None
+
+
+def test_query_filters_class(engine):
+    result = engine.query("2026-03-01", "2026-03-03", class_name="二班")
+
+    assert result["totals"]["submissions"] == 1
+    assert result["totals"]["ai_success_rate"] == 0.0
+    assert [c["class"] for c in result["classes"]] == ["二班"]
+
+
+def test_query_defaults_to_recent_days(engine):
+    result = engine.query(end="2026-03-03")
+
+    assert len(result["days"]) == 14
+    assert result["end"] == "2026-03-03"
+    assert result["totals"]["submissions"] == 5
+
+
+def test_query_clamps_long_ranges(engine):
+    result = engine.query("0001-01-01", "2026-03-03")
+
+    assert len(result["days"]) == STATS_MAX_RANGE_DAYS
+    assert result["start"] == (datetime(2026, 3, 3) - timedelta(days=STATS_MAX_RANGE_DAYS - 1)).strftime("%Y-%m-%d")
+
+
+def test_refresh_is_incremental(engine):
+    engine.query("2026-03-01", "2026-03-03")
+    save_record(_record("r6", "一班", "2026-03-02T15:00:00", generation_time_ms=200))
+
+    result = engine.query("2026-03-01", "2026-03-03")
+
+    assert [d["submissions"] for d in result["days"]] == [3, 1, 1]
+    with open("stats.json", "r", encoding="utf-8") as f:
+        assert json.load(f)["watermark"] == "r6"
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.add(ms)
+
+    # 对数分桶误差约 ±12%
+    assert histogram.percentile(50) == pytest.approx(500, rel=0.12)
+    assert histogram.percentile(90) == pytest.approx(900, rel=0.12)
+    assert histogram.percentile(99) == pytest.approx(990, rel=0.12)
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_histogram_merge_matches_single_histogram():
+    merged, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for ms in (20, 80, 300, 2500):
+        left.add(ms)
+        merged.add(ms)
+    for ms in (50, 700, 9000):
+        right.add(ms)
+        merged.add(ms)
+
+    left.merge(right)
+
+    assert left.counts == merged.counts
+    assert left.total == 7
+
+
+# ====== /stats 与 /api/stats/timeseries 参数校验 ======
+
+@pytest.fixture
+def client(workdir):
+    from classroom_mvp.app import create_app
+
+    save_record(_record("r1", "一班", datetime.now().strftime("%Y-%m-%dT%H:%M:%S"), generation_time_ms=100))
+    return create_app().test_client()
+
+
+def test_stats_page_escapes_invalid_date(client):
+    response = client.get("/stats", query_string={"start": "<script>alert(1)</script>"})
+
+    assert response.status_code == 400
+    assert b"<script>alert(1)</script>" not in response.data
+    assert b"&lt;script&gt;" in response.data
+
+
+@pytest.mark.parametrize("query, message", [
+    ({"start": "2026-13-01"}, "日期格式错误"),
+    ({"start": "2026-03-05", "end": "2026-03-01"}, "开始日期晚于结束日期"),
+    ({"start": "0001-01-01"}, f"日期范围不能超过 {STATS_MAX_RANGE_DAYS} 天"),
+    ({"start": "2025-01-01", "end": "2026-01-02"}, f"日期范围不能超过 {STATS_MAX_RANGE_DAYS} 天"),
+])
+def test_timeseries_rejects_bad_ranges(client, query, message):
+    response = client.get("/api/stats/timeseries", query_string=query)
+
+    assert response.status_code == 400
+    assert message in response.get_json()["error"]
+
+
+def test_timeseries_accepts_a_full_year(client):
+    response = client.get("/api/stats/timeseries", query_string={"start": "2025-01-01", "end": "2025-12-31"})
+
+    assert response.status_code == 200
+    assert len(response.get_json()["days"]) == 365
+
+
+def test_rebuild_counts_records_in_both_cold_and_hot_once(workdir):
+    # 归档写完冷数据段、还没从热记录文件删除时重建（或维护任务在两步之间中断）
+    archived = [_record("c1", "一班", "2026-01-05T09:00:00", generation_time_ms=300),
+                _record("c2", "一班", "2026-01-06T09:00:00", generation_time_ms=300)]
+    os.makedirs("cold")
+    atomic_write_json(cold_segment_path("2026-01"), dump_records([Record.from_dict(r) for r in archived]),
+                      compress=True)
+    for r in archived + [_record("h1", "一班", "2026-01-06T10:00:00")]:
+        save_record(r)
+
+    result = StatsEngine().query("2026-01-05", "2026-01-06")
+
+    assert [d["submissions"] for d in result["days"]] == [1, 2]
+    assert result["totals"]["submissions"] == 3
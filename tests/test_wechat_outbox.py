@@ -0,0 +1,127 @@
+"""推送队列：按班级路由入队、合并发送、失败退避重试、超过最大次数标记失败"""
+
+import json
+import time
+
+import pytest
+
+from classroom_mvp import wechat_outbox, wechat_router
+from classroom_mvp.wechat_outbox import STATUS_FAILED, STATUS_PENDING, WechatOutbox
+from classroom_mvp.wechat_router import WebhookRouter
+
+ROUTES = {
+    "targets": {"g1": "http://wechat.test/g1", "g2": "http://wechat.test/g2"},
+    "routes": {"一班": ["g1", "g2"]},
+    "default": ["g1"],
+}
+
+
+class FakeWebhooks:
+    """代替企业微信接口：记录每次发送，按 URL 返回预设结果"""
+
+    def __init__(self):
+        self.sent = []
+        self.failing = set()
+
+    def __call__(self, articles, webhook=None):
+        self.sent.append((webhook, [a["title"] for a in articles]))
+        if webhook in self.failing:
+            return False, "errcode=-1", -1
+        return True, "ok", 0
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    fake = FakeWebhooks()
+    monkeypatch.setattr(wechat_router, "send_news", fake)
+    return fake
+
+
+@pytest.fixture
+def outbox(workdir, monkeypatch, webhooks):
+    with open("routes.json", "w", encoding="utf-8") as f:
+        json.dump(ROUTES, f)
+    router = WebhookRouter(routes_file="routes.json")
+    monkeypatch.setattr(wechat_outbox, "get_router", lambda: router)
+    # 不等合并窗口，立即发送
+    monkeypatch.setattr(wechat_outbox, "WECHAT_BATCH_WINDOW", 0)
+
+    box = WechatOutbox(path="outbox.json")
+    # 由测试直接调用 dispatch_once()，不启动后台调度线程
+    monkeypatch.setattr(box, "start", lambda: None)
+    return box
+
+
+def _article(title):
+    return {"title": title, "description": "", "url": "https://example.test", "picurl": ""}
+
+
+def _items(box):
+    with open(box.path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_enqueue_fans_out_to_every_class_target(outbox):
+    ids = outbox.enqueue(_article("张三"), "一班")
+
+    items = _items(outbox)
+    assert len(ids) == 2
+    assert [i["webhook"] for i in items] == [ROUTES["targets"]["g1"], ROUTES["targets"]["g2"]]
+    assert all(i["status"] == STATUS_PENDING and i["attempts"] == 0 for i in items)
+    assert outbox.stats()["pending"] == 2
+
+
+def test_dispatch_batches_articles_per_webhook(outbox, webhooks):
+    for name in ("张三", "李四", "王五"):
+        outbox.enqueue(_article(name), "二班")
+
+    outbox.dispatch_once()
+
+    assert webhooks.sent == [(ROUTES["targets"]["g1"], ["张三", "李四", "王五"])]
+    assert _items(outbox) == []
+
+
+def test_failed_target_backs_off_and_retries(outbox, webhooks):
+    webhooks.failing.add(ROUTES["targets"]["g2"])
+    outbox.enqueue(_article("张三"), "一班")
+
+    before = time.time()
+    outbox.dispatch_once()
+
+    # g1 已送达出队，g2 留在队列中退避
+    (item,) = _items(outbox)
+    assert item["webhook"] == ROUTES["targets"]["g2"]
+    assert item["attempts"] == 1
+    assert item["last_error"] == "errcode=-1"
+    assert item["next_attempt_at"] >= before + wechat_outbox.WECHAT_RETRY_BASE_DELAY
+
+    # 退避期间不重发
+    outbox.dispatch_once()
+    assert len(webhooks.sent) == 2
+
+    # 退避到期后重试成功
+    webhooks.failing.clear()
+    item["next_attempt_at"] = 0
+    with open(outbox.path, "w", encoding="utf-8") as f:
+        json.dump([item], f)
+    outbox.dispatch_once()
+
+    assert webhooks.sent[-1] == (ROUTES["targets"]["g2"], ["张三"])
+    assert _items(outbox) == []
+
+
+def test_gives_up_after_max_attempts(outbox, webhooks, monkeypatch):
+    monkeypatch.setattr(wechat_outbox, "WECHAT_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(wechat_outbox, "WECHAT_RETRY_BASE_DELAY", 0)
+    webhooks.failing.add(ROUTES["targets"]["g1"])
+    outbox.enqueue(_article("张三"), "二班")
+
+    outbox.dispatch_once()
+    outbox.dispatch_once()
+    outbox.dispatch_once()
+
+    (item,) = _items(outbox)
+    assert item["status"] == STATUS_FAILED
+    assert item["attempts"] == 2
+    assert len(webhooks.sent) == 2
+    assert outbox.stats() == {"pending": 0, "failed": 1, "oldest_pending_age": 0}
@@ -3,8 +3,10 @@ classroom_test 工具模块包
 
 子模块：
 - inksight_wrapper: Google InkSight 笔迹识别封装
+- inksight_batcher: 动态微批推理服务（合并并发请求，整批推理）
+- inksight_cache: 特征缓存（按图像内容哈希和模型版本，float16 内存映射文件）
 - inksight_integration: Flask 应用集成接口
 """
 
 __version__ = "1.0.0"
-__all__ = ["inksight_wrapper", "inksight_integration"]
+__all__ = ["inksight_wrapper", "inksight_batcher", "inksight_cache", "inksight_integration"]
@@ -0,0 +1,315 @@
+"""
+InkSight 动态微批推理服务
+把并发到达的单张识别请求在很短的时间窗口内合并成一个批次，一次前向计算后把结果分发回各调用方
+
+功能：
+- submit() 返回 Future；extract_digital_ink() 阻塞等待，返回值与 InkSightExtractor.extract_digital_ink 相同
+  （另含 batch_size、queue_ms）
+- 批次凑满 max_batch_size，或批次中第一个请求入队后已等待 max_wait_ms 时执行
+- 图像读取、解码和预处理在调用方线程中并行完成，推理线程只做拼批和前向计算
+- 特征缓存命中的图像不入队，submit() 直接返回结果
+- stats() 报告吞吐（张/秒）、平均批大小、排队耗时
+- stop() 处理完已入队的请求后退出；停止过程中提交的请求立即返回失败，不会一直等待
+
+推理线程在第一次 submit() 时启动（gunicorn fork 出的 worker 各自启动自己的线程）。
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, NamedTuple, Optional
+
+from utils.inksight_wrapper import InkSightExtractor, get_extractor
+
+logger = logging.getLogger(__name__)
+
+# 默认批次上限与最长等待（可用环境变量覆盖）
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("INKSIGHT_MAX_BATCH_SIZE", "8"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("INKSIGHT_MAX_WAIT_MS", "10"))
+
+# 每处理该数量的批次输出一次吞吐日志
+STATS_LOG_EVERY = 100
+
+
+class _Request(NamedTuple):
+    image_path: str
+    key: Optional[str]
+    inputs: Dict
+    future: Future
+    submitted: float
+    enqueued: float
+
+
+class InkSightBatchServer:
+    """
+    InkSight 微批推理服务
+
+    多个线程（如 Flask worker 的请求线程）同时调用 submit()，请求进入队列；
+    推理线程取出第一个请求后继续收集，直到批次满或等待超时，然后整批推理并分发结果。
+    同一时刻只有推理线程使用模型。
+    """
+
+    def __init__(
+        self,
+        extractor: Optional[InkSightExtractor] = None,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+    ):
+        """
+        初始化微批推理服务
+
+        Args:
+            extractor: 使用的提取器，默认为全局提取器
+            max_batch_size: 每批最多图像数
+            max_wait_ms: 批次中第一个请求最长等待时间（毫秒），越大批次越满、单个请求延迟越高
+        """
+        self.extractor = extractor or get_extractor()
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._started_at = None
+        self._images = 0
+        self._batches = 0
+        self._busy_seconds = 0.0
+        self._queue_seconds = 0.0
+
+    def start(self):
+        """启动推理线程（已在运行时不重复启动）"""
+        with self._lock:
+            started = self._start_locked()
+        if started:
+            self._log_started()
+
+    def _start_locked(self) -> bool:
+        """启动推理线程（调用方持有 _lock）；返回是否新启动了线程"""
+        if self._pid != os.getpid():
+            # fork 出的子进程没有父进程的推理线程，队列和统计重新开始
+            self._queue = queue.Queue()
+            self._thread = None
+            self._pid = os.getpid()
+            self._reset_stats()
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._stopping = False
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="inksight-batcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def _log_started(self):
+        logger.info(
+            f"🚀 InkSight 微批推理已启动 (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:g}, pid={os.getpid()})"
+        )
+
+    def stop(self, timeout: float = 10):
+        """处理完已入队的请求后停止推理线程"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._queue.put(None)
+        thread.join(timeout)
+        self._log_stats("🛑 InkSight 微批推理已停止")
+
+    def submit(self, image_path: str) -> Future:
+        """
+        提交一张图像
+
+        Args:
+            image_path: 输入图像路径 (JPEG/PNG)
+
+        Returns:
+            Future，结果为 extract_digital_ink 格式的字典
+        """
+        submitted = time.perf_counter()
+        future = Future()
+        try:
+            key, cached = self.extractor.lookup(image_path)
+            if cached is not None:
+                result = self.extractor.new_result(image_path)
+                result["success"] = True
+                result.update(cached)
+                result["processing_time_ms"] = round((time.perf_counter() - submitted) * 1000, 2)
+                future.set_result(result)
+                return future
+            inputs = self.extractor.preprocess(self.extractor.load_image(image_path))
+        except FileNotFoundError as e:
+            future.set_result(self._failed(image_path, f"文件错误: {str(e)}", submitted))
+            return future
+        except Exception as e:
+            future.set_result(self._failed(image_path, f"处理失败: {str(e)}", submitted))
+            return future
+
+        # 检查停止状态和入队在同一把锁内：stop() 放入结束标记之后不会再有请求入队
+        with self._lock:
+            started = self._start_locked()
+            stopping = self._stopping
+            if not stopping:
+                self._queue.put(_Request(image_path, key, inputs, future, submitted, time.perf_counter()))
+        if started:
+            self._log_started()
+        if stopping:
+            future.set_result(self._failed(image_path, "微批推理服务正在停止", submitted))
+        return future
+
+    def extract_digital_ink(self, image_path: str, timeout: Optional[float] = None) -> Dict:
+        """提交一张图像并等待结果（返回值同 InkSightExtractor.extract_digital_ink）"""
+        return self.submit(image_path).result(timeout)
+
+    def _failed(self, image_path: str, error: str, submitted: float) -> Dict:
+        result = self.extractor.new_result(image_path)
+        result["error"] = error
+        result["processing_time_ms"] = round((time.perf_counter() - submitted) * 1000, 2)
+        logger.error(f"❌ {error}")
+        return result
+
+    def _collect(self, first: _Request) -> list:
+        """从 first 开始收集一个批次：凑满或 first 入队后等待超过 max_wait 为止"""
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                # 超时后仍取走已在队列中的请求，不再等待新请求
+                request = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    if self._stopping:
+                        return
+                    continue
+                self._process(self._collect(first))
+        finally:
+            # 线程退出（停止或异常）时不再接收请求，队列中剩下的请求直接返回失败，调用方不会一直等待；
+            # 线程结束后的下一次 submit() 重新启动推理线程
+            with self._lock:
+                self._stopping = True
+            self._drain("微批推理服务已停止")
+
+    def _drain(self, error: str):
+        """取出队列中剩余的请求并返回失败结果"""
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and request.future.set_running_or_notify_cancel():
+                request.future.set_result(self._failed(request.image_path, error, request.submitted))
+
+    def _process(self, batch: list):
+        """整批推理并把结果分发给各请求"""
+        started = time.perf_counter()
+        try:
+            predictions, error = self.extractor.infer_preprocessed([r.inputs for r in batch]), None
+        except Exception as e:
+            predictions, error = [None] * len(batch), f"处理失败: {str(e)}"
+            logger.error(f"❌ 批量推理失败 ({len(batch)} 张): {str(e)}")
+        finished = time.perf_counter()
+
+        for request, prediction in zip(batch, predictions):
+            result = self.extractor.new_result(request.image_path)
+            if prediction is None:
+                result["error"] = error
+            else:
+                self.extractor.remember(request.key, prediction)
+                result["success"] = True
+                result.update(prediction)
+            result["batch_size"] = len(batch)
+            result["queue_ms"] = round((started - request.enqueued) * 1000, 2)
+            result["processing_time_ms"] = round((finished - request.submitted) * 1000, 2)
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_result(result)
+
+        with self._lock:
+            self._images += len(batch)
+            self._batches += 1
+            self._busy_seconds += finished - started
+            self._queue_seconds += sum(started - r.enqueued for r in batch)
+            log = self._batches % STATS_LOG_EVERY == 0
+        if log:
+            self._log_stats("📈 InkSight 微批推理")
+
+    def stats(self) -> Dict:
+        """
+        吞吐统计（本进程）
+
+        Returns:
+            字典，包含：
+            - images / batches: 已处理图像数、批次数
+            - avg_batch_size: 平均批大小
+            - images_per_second: 推理吞吐（张/秒，按推理线程忙碌时间计算）
+            - wall_images_per_second: 启动以来的平均吞吐（张/秒，含空闲时间）
+            - avg_queue_ms: 平均排队等待（毫秒）
+            - pending: 队列中等待的请求数
+        """
+        with self._lock:
+            images, batches = self._images, self._batches
+            busy, waited, started_at = self._busy_seconds, self._queue_seconds, self._started_at
+        wall = time.perf_counter() - started_at if started_at else 0
+        return {
+            "images": images,
+            "batches": batches,
+            "avg_batch_size": round(images / batches, 2) if batches else 0.0,
+            "images_per_second": round(images / busy, 2) if busy else 0.0,
+            "wall_images_per_second": round(images / wall, 2) if wall else 0.0,
+            "avg_queue_ms": round(waited / images * 1000, 2) if images else 0.0,
+            "pending": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def _log_stats(self, title: str):
+        stats = self.stats()
+        logger.info(
+            f"{title} | 图像: {stats['images']} | 批次: {stats['batches']} | "
+            f"平均批大小: {stats['avg_batch_size']} | 吞吐: {stats['images_per_second']} 张/秒 | "
+            f"平均排队: {stats['avg_queue_ms']}ms"
+        )
+
+
+# 全局微批推理服务（延迟初始化）
+_server = None
+
+
+def get_batch_server() -> InkSightBatchServer:
+    """获取全局微批推理服务（使用全局提取器）"""
+    global _server
+    if _server is None:
+        _server = InkSightBatchServer()
+    return _server
+
+
+def extract_digital_ink(image_path: str, timeout: Optional[float] = None) -> Dict:
+    """
+    快捷函数：经由全局微批推理服务提取数字笔迹
+
+    Args:
+        image_path: 输入图像路径
+        timeout: 最长等待秒数，None 为一直等待
+
+    Returns:
+        同 InkSightExtractor.extract_digital_ink，另含 batch_size、queue_ms
+    """
+    return get_batch_server().extract_digital_ink(image_path, timeout)
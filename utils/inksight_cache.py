@@ -0,0 +1,208 @@
+"""
+InkSight 特征缓存
+按图像内容哈希和模型版本持久化笔迹特征与预测结果，重复分析、批处理重跑直接查表，不再运行模型
+
+存储（每个模型版本一个目录：utils/.inksight_cache/features/<模型版本>/）：
+- features.f16 - float16 特征矩阵，每张图像一行，只追加；读取时内存映射（numpy.memmap），
+  get() 返回映射中该行的视图，不复制、不解析
+- index.jsonl - 内容哈希 → 行号、笔画数、置信度，每张图像一行，只追加
+- meta.json - 模型版本、特征维度
+
+多个进程（gunicorn worker）共享同一目录：写入时持有跨进程文件锁，读者在未命中时读取索引新增的行。
+float16 与 float32 相比相对误差约 1e-3，占用一半空间。
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from classroom_mvp.storage import atomic_write_json, file_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = Path(__file__).parent / ".inksight_cache" / "features"
+FEATURE_DTYPE = np.float16
+
+
+def _dir_name(model_version: str) -> str:
+    """模型版本 → 目录名（如 Derendering/InkSight-Small-p@main/f1 → Derendering_InkSight-Small-p_main_f1）"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_version)
+
+
+class FeatureCache:
+    """
+    InkSight 特征与预测的磁盘缓存（单个模型版本）
+
+    键为图像内容哈希（content_hash），同一张图重新上传、改名后仍能命中；
+    模型或特征提取方式变化时使用新的模型版本，旧缓存自然失效。
+    """
+
+    def __init__(self, model_version: str, root: Optional[str] = None):
+        """
+        打开（或创建）某个模型版本的缓存目录
+
+        Args:
+            model_version: 模型版本（InkSightExtractor.model_version）
+            root: 缓存根目录，默认为 utils/.inksight_cache/features
+        """
+        self.model_version = model_version
+        self.dir = Path(root or DEFAULT_ROOT) / _dir_name(model_version)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.dir / "features.f16"
+        self.index_path = self.dir / "index.jsonl"
+        self.meta_path = self.dir / "meta.json"
+        self.lock_path = str(self.dir / ".lock")
+
+        self._lock = threading.Lock()
+        self._index = {}  # 内容哈希 -> (行号, 笔画数, 置信度)
+        self._index_offset = 0
+        self._dim = None
+        self._map = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(image_path: str) -> str:
+        """图像文件内容哈希（blake2b-128，十六进制）"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _refresh(self):
+        """读取其他进程追加的索引行（调用方持有 _lock）"""
+        if self._dim is None and self.meta_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+
+        try:
+            size = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            return
+        if size <= self._index_offset:
+            return
+
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            chunk = f.read(size - self._index_offset)
+        # 只处理完整的行（另一个进程可能正在写最后一行）
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                self._index[entry["k"]] = (entry["r"], entry["s"], entry["c"])
+            except (ValueError, KeyError):
+                continue
+        self._index_offset += end
+
+    def _matrix(self, min_rows: int = 0) -> Optional[np.ndarray]:
+        """特征矩阵的只读内存映射，文件变长后重新映射（调用方持有 _lock）"""
+        if self._dim is None:
+            return None
+        if self._map is None or self._map.shape[0] < min_rows:
+            rows = os.path.getsize(self.data_path) // (self._dim * FEATURE_DTYPE().itemsize)
+            if rows == 0:
+                return None
+            self._map = np.memmap(self.data_path, dtype=FEATURE_DTYPE, mode="r", shape=(rows, self._dim))
+        return self._map
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        按内容哈希查找
+
+        Returns:
+            {"features": 只读 float16 视图, "stroke_count", "confidence"}；未命中返回 None
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self._refresh()
+                entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            row, stroke_count, confidence = entry
+            matrix = self._matrix(row + 1)
+            if matrix is None or row >= matrix.shape[0]:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"features": matrix[row], "stroke_count": stroke_count, "confidence": confidence}
+
+    def put(self, key: str, prediction: Dict) -> bool:
+        """
+        写入一张图像的预测（features、stroke_count、confidence）
+
+        Returns:
+            是否已在缓存中；特征维度与已有数据不同时不写入，返回 False
+        """
+        vector = np.asarray(prediction["features"], dtype=FEATURE_DTYPE).ravel()
+
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+            if key in self._index:
+                return True
+
+            if self._dim is None:
+                self._dim = vector.size
+                atomic_write_json(
+                    str(self.meta_path),
+                    {"model_version": self.model_version, "dim": self._dim, "dtype": "float16"},
+                )
+            if vector.size != self._dim:
+                logger.warning(f"⚠️ 特征维度 {vector.size} 与缓存 {self._dim} 不一致，不写入缓存")
+                return False
+
+            row_bytes = self._dim * FEATURE_DTYPE().itemsize
+            with open(self.data_path, "ab") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size % row_bytes:
+                    # 上次写入中断留下的半行
+                    size -= size % row_bytes
+                    f.truncate(size)
+                f.write(vector.tobytes())
+            row = size // row_bytes
+
+            line = json.dumps({
+                "k": key,
+                "r": row,
+                "s": int(prediction["stroke_count"]),
+                "c": float(prediction["confidence"]),
+            }).encode("utf-8") + b"\n"
+            with open(self.index_path, "ab") as f:
+                index_size = f.seek(0, os.SEEK_END)
+                if index_size > self._index_offset:
+                    # 上次写入中断留下的半行，另起一行
+                    line = b"\n" + line
+                f.write(line)
+            self._index_offset = index_size + len(line)
+            self._index[key] = (row, int(prediction["stroke_count"]), float(prediction["confidence"]))
+        return True
+
+    def matrix(self) -> Optional[np.ndarray]:
+        """全部特征（行号见索引）的只读内存映射，批量计算相似度等场景直接使用，不复制"""
+        with self._lock:
+            self._refresh()
+            return self._matrix(max((row for row, _, _ in self._index.values()), default=-1) + 1)
+
+    def stats(self) -> Dict:
+        """缓存条目数、命中/未命中次数、特征维度和数据文件大小"""
+        with self._lock:
+            self._refresh()
+            return {
+                "model_version": self.model_version,
+                "entries": len(self._index),
+                "dim": self._dim,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": os.path.getsize(self.data_path) if self.data_path.exists() else 0,
+            }
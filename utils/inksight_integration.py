@@ -3,7 +3,9 @@ InkSight 与 Flask 应用的集成示例
 展示如何将笔迹识别功能集成到现有的评语生成系统中
 """
 
-from utils.inksight_wrapper import extract_digital_ink, InkSightExtractor
+from utils.inksight_wrapper import InkSightExtractor
+# 并发请求经微批推理服务合并成批次推理
+from utils.inksight_batcher import extract_digital_ink
 from typing import Dict, Optional
 import logging
 
@@ -51,7 +53,8 @@ def analyze_handwriting(image_path: str, student_name: str = "学生") -> Dict:
             "estimated_stroke_count": result["stroke_count"],
             "confidence": result["confidence"],
             "device_used": result["device"],
-            "processing_time_ms": result["processing_time_ms"]
+            "processing_time_ms": result["processing_time_ms"],
+            "cached": result["cached"]
         }
         
         # 数字笔迹特征
@@ -4,12 +4,18 @@ InkSight 数字笔迹识别封装模块
 """
 
 import os
+import time
 import torch
+import threading
 import numpy as np
 from PIL import Image
 from pathlib import Path
 import logging
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.inksight_cache import FeatureCache
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -28,30 +34,48 @@ class InkSightExtractor:
     - 加载 Google InkSight 模型（通过 Hugging Face Transformers）
     - 处理书法图像并提取数字笔迹信息
     - 自动检测 CPU/GPU 设备
+    - 按图像内容哈希缓存特征与预测（FeatureCache），已分析过的图像不再运行模型
     - 包含完整错误处理
     """
     
     MODEL_NAME = "Derendering/InkSight-Small-p"
+    # 固定模型版本（Hugging Face 分支、标签或提交），特征缓存按版本区分
+    MODEL_REVISION = os.getenv("INKSIGHT_MODEL_REVISION", "main")
+    # 特征提取方式变化时加一，旧的特征缓存随之失效
+    FEATURE_VERSION = 1
     CACHE_DIR = Path(__file__).parent / ".inksight_cache"
     
-    def __init__(self, device: Optional[str] = None, use_cache: bool = True):
+    def __init__(self, device: Optional[str] = None, use_cache: bool = True,
+                 feature_cache: Optional[bool] = None):
         """
         初始化 InkSight 提取器
         
         Args:
             device: 计算设备 ('cpu'/'cuda'/'mps')，None 时自动检测
             use_cache: 是否使用缓存的模型
+            feature_cache: 是否使用特征缓存，None 时由环境变量 INKSIGHT_FEATURE_CACHE 决定（默认开启）
         """
         self.device = device or self._detect_device()
         self.use_cache = use_cache
         self.model = None
         self.processor = None
+        # 预取线程、微批推理服务的调用方线程可能同时首次加载模型
+        self._load_lock = threading.Lock()
         
         if self.use_cache:
             self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
         
+        if feature_cache is None:
+            feature_cache = os.getenv("INKSIGHT_FEATURE_CACHE", "1") != "0"
+        self.feature_cache = FeatureCache(self.model_version) if feature_cache else None
+        
         logger.info(f"✅ InkSight 提取器初始化 (Device: {self.device})")
     
+    @property
+    def model_version(self) -> str:
+        """模型版本（模型名@版本/特征提取版本），特征缓存的命名空间"""
+        return f"{self.MODEL_NAME}@{self.MODEL_REVISION}/f{self.FEATURE_VERSION}"
+    
     def _detect_device(self) -> str:
         """自动检测最优计算设备"""
         if torch.cuda.is_available():
@@ -74,6 +98,13 @@ class InkSightExtractor:
         if self.model is not None and self.processor is not None:
             return self.processor, self.model
         
+        with self._load_lock:
+            if self.model is not None and self.processor is not None:
+                return self.processor, self.model
+            return self._load_model_locked()
+    
+    def _load_model_locked(self) -> Tuple:
+        """加载模型（调用方持有 _load_lock）"""
         try:
             logger.info(f"🤖 加载 InkSight 模型: {self.MODEL_NAME}")
             
@@ -83,12 +114,14 @@ class InkSightExtractor:
             # 加载处理器和模型
             self.processor = AutoImageProcessor.from_pretrained(
                 self.MODEL_NAME,
+                revision=self.MODEL_REVISION,
                 cache_dir=cache_dir,
                 trust_remote_code=True
             )
             
             self.model = AutoModelForImageClassification.from_pretrained(
                 self.MODEL_NAME,
+                revision=self.MODEL_REVISION,
                 cache_dir=cache_dir,
                 trust_remote_code=True,
                 device_map=self.device if self.device != "cpu" else None
@@ -106,6 +139,139 @@ class InkSightExtractor:
             logger.error(f"❌ 模型加载失败: {str(e)}")
             raise RuntimeError(f"无法加载 InkSight 模型: {str(e)}")
     
+    def new_result(self, image_path: str) -> Dict:
+        """单张图像的结果字典（字段见 extract_digital_ink）"""
+        return {
+            "success": False,
+            "image_path": image_path,
+            "device": self.device,
+            "features": [],
+            "stroke_count": 0,
+            "confidence": 0.0,
+            "error": None,
+            "processing_time_ms": 0,
+            "cached": False
+        }
+    
+    def load_image(self, image_path: str) -> Image.Image:
+        """
+        读取图像并转为 RGB
+        
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"图像文件不存在: {image_path}")
+        
+        image = Image.open(image_path)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+    
+    def lookup(self, image_path: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        查特征缓存
+        
+        Returns:
+            (内容哈希, 缓存的预测)；未命中时预测为 None，未启用缓存时为 (None, None)
+        
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        if self.feature_cache is None:
+            return None, None
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"图像文件不存在: {image_path}")
+        
+        key = FeatureCache.content_hash(image_path)
+        hit = self.feature_cache.get(key)
+        if hit is None:
+            return key, None
+        return key, {
+            "features": hit["features"].tolist(),
+            "stroke_count": hit["stroke_count"],
+            "confidence": hit["confidence"],
+            "cached": True,
+        }
+    
+    def remember(self, key: Optional[str], prediction: Dict):
+        """把预测写入特征缓存（缓存写入失败不影响结果）"""
+        if self.feature_cache is None or key is None:
+            return
+        try:
+            self.feature_cache.put(key, prediction)
+        except Exception as e:
+            logger.warning(f"⚠️ 特征缓存写入失败: {str(e)}")
+    
+    def preprocess(self, image: Image.Image) -> Dict:
+        """
+        单张图像预处理（缩放、归一化），可在多个线程中并行执行
+        
+        Returns:
+            processor 输出的张量字典（批次维为 1）
+        """
+        processor, _ = self._load_model()
+        return processor(images=image, return_tensors="pt")
+    
+    def infer_batch(self, images: List[Image.Image]) -> List[Dict]:
+        """
+        一次前向计算处理一批图像
+        
+        processor 把各图像缩放/填充到模型输入尺寸后堆叠为一个批次张量，
+        CPU 上批量矩阵运算的吞吐明显高于逐张推理。
+        
+        Args:
+            images: RGB 图像列表
+        
+        Returns:
+            与 images 一一对应的预测列表，每项包含 features、confidence、stroke_count
+        """
+        processor, _ = self._load_model()
+        return self._forward(processor(images=images, return_tensors="pt"))
+    
+    def infer_preprocessed(self, inputs: List[Dict]) -> List[Dict]:
+        """
+        把已预处理的单张输入（preprocess() 的返回值）拼成一个批次做前向计算
+        
+        Returns:
+            与 inputs 一一对应的预测列表（同 infer_batch）
+        """
+        return self._forward({key: _stack([item[key] for item in inputs]) for key in inputs[0]})
+    
+    def _forward(self, inputs) -> List[Dict]:
+        """批次前向计算，按样本拆分结果"""
+        _, model = self._load_model()
+        
+        with torch.no_grad():
+            if self.device != "cpu":
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            
+            # 模型推理
+            outputs = model(**inputs)
+            
+            # 提取特征和预测
+            logits = outputs.logits
+            probabilities = torch.softmax(logits, dim=-1)
+            
+            # 获取置信度和类别
+            confidence, predicted_class = torch.max(probabilities, dim=-1)
+            
+            # 提取隐层特征（通常在模型的倒数第二层）
+            if hasattr(outputs, 'hidden_states') and outputs.hidden_states:
+                features = outputs.hidden_states[-1].mean(dim=1).detach().cpu().numpy()
+            else:
+                # 降级处理：使用logits作为特征向量
+                features = logits.detach().cpu().numpy()
+        
+        return [
+            {
+                "features": features[i].tolist(),
+                "confidence": float(confidence[i].item()),
+                "stroke_count": int(predicted_class[i].item()),
+            }
+            for i in range(logits.shape[0])
+        ]
+    
     def extract_digital_ink(self, image_path: str) -> Dict:
         """
         从书法图像提取数字笔迹数据
@@ -123,71 +289,39 @@ class InkSightExtractor:
             - confidence: 模型置信度
             - error: 错误信息（失败时）
             - processing_time_ms: 处理耗时（毫秒）
+            - cached: 是否来自特征缓存（同一内容的图像已分析过）
         """
-        import time
         start_time = time.time()
         
-        result = {
-            "success": False,
-            "image_path": image_path,
-            "device": self.device,
-            "features": [],
-            "stroke_count": 0,
-            "confidence": 0.0,
-            "error": None,
-            "processing_time_ms": 0
-        }
+        result = self.new_result(image_path)
         
         try:
-            # 验证文件存在
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"图像文件不存在: {image_path}")
+            # 已分析过的图像直接查表
+            key, cached = self.lookup(image_path)
+            if cached is not None:
+                result["success"] = True
+                result.update(cached)
+                logger.info(f"♻️ 笔迹特征缓存命中: {image_path}")
+                return result
             
             # 加载并验证图像
-            image = Image.open(image_path)
-            if image.mode != "RGB":
-                image = image.convert("RGB")
+            image = self.load_image(image_path)
             
             logger.info(f"📸 处理图像: {image_path} (Size: {image.size})")
             
-            # 加载模型
-            processor, model = self._load_model()
+            # 图像预处理与推理（单张作为大小为 1 的批次）
+            prediction = self.infer_batch([image])[0]
+            self.remember(key, prediction)
             
-            # 图像预处理与推理
-            with torch.no_grad():
-                inputs = processor(images=image, return_tensors="pt")
-                
-                if self.device != "cpu":
-                    inputs = {k: v.to(self.device) for k, v in inputs.items()}
-                
-                # 模型推理
-                outputs = model(**inputs)
-                
-                # 提取特征和预测
-                logits = outputs.logits
-                probabilities = torch.softmax(logits, dim=-1)
-                
-                # 获取置信度和类别
-                confidence, predicted_class = torch.max(probabilities, dim=-1)
-                
-                # 提取隐层特征（通常在模型的倒数第二层）
-                if hasattr(outputs, 'hidden_states') and outputs.hidden_states:
-                    features = outputs.hidden_states[-1].mean(dim=1).detach().cpu().numpy()
-                else:
-                    # 降级处理：使用logits作为特征向量
-                    features = logits.detach().cpu().numpy()
-                
-                # 结果收集
-                result["success"] = True
-                result["features"] = features.squeeze().tolist()
-                result["confidence"] = float(confidence.item())
-                result["stroke_count"] = int(predicted_class.item())
-                
-                logger.info(
-                    f"✅ 笔迹提取成功 | "
-                    f"笔画数: {result['stroke_count']} | "
-                    f"置信度: {result['confidence']:.4f}"
-                )
+            # 结果收集
+            result["success"] = True
+            result.update(prediction)
+            
+            logger.info(
+                f"✅ 笔迹提取成功 | "
+                f"笔画数: {result['stroke_count']} | "
+                f"置信度: {result['confidence']:.4f}"
+            )
         
         except FileNotFoundError as e:
             result["error"] = f"文件错误: {str(e)}"
@@ -209,36 +343,158 @@ class InkSightExtractor:
         
         return result
     
-    def batch_extract(self, image_dir: str) -> List[Dict]:
+    def batch_extract(
+        self,
+        image_dir: str,
+        batch_size: int = 8,
+        workers: int = 4,
+        progress: Optional[Callable[[int, int, Dict], None]] = None,
+    ) -> List[Dict]:
         """
-        批量处理目录中的图像
+        批量处理目录中的图像（iter_extract 的列表版本，按文件名顺序返回）
         
         Args:
             image_dir: 包含图像的目录路径
+            batch_size: 每批推理的图像数
+            workers: 读取和预处理图像的线程数
+            progress: 进度回调 progress(已完成数, 总数, 本张结果)
         
         Returns:
             结果列表
         """
-        results = []
         image_dir_path = Path(image_dir)
         
         if not image_dir_path.is_dir():
             logger.error(f"❌ 目录不存在: {image_dir}")
-            return results
+            return []
         
         # 支持的图像格式
-        image_files = list(image_dir_path.glob("*.jpg")) + \
-                     list(image_dir_path.glob("*.jpeg")) + \
-                     list(image_dir_path.glob("*.png"))
+        image_files = sorted(
+            list(image_dir_path.glob("*.jpg")) +
+            list(image_dir_path.glob("*.jpeg")) +
+            list(image_dir_path.glob("*.png"))
+        )
         
-        logger.info(f"🔄 开始批处理 {len(image_files)} 张图像")
+        return list(self.iter_extract(image_files, batch_size=batch_size, workers=workers, progress=progress))
+    
+    def iter_extract(
+        self,
+        image_paths: Iterable,
+        batch_size: int = 8,
+        workers: int = 4,
+        ordered: bool = True,
+        progress: Optional[Callable[[int, int, Dict], None]] = None,
+        prefetch: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        流水线批量提取：线程池读取、解码、预处理后续图像的同时，模型处理当前批次
         
-        for idx, img_path in enumerate(image_files, 1):
-            logger.info(f"处理进度: {idx}/{len(image_files)}")
-            result = self.extract_digital_ink(str(img_path))
-            results.append(result)
+        预取的图像数有上限（prefetch），处理整学期的作品档案时内存占用固定，
+        耗时取决于模型计算而不是磁盘读取和 JPEG 解码。特征缓存命中的图像不解码、不进入批次，
+        重跑同一批图像只需查表。
+        
+        Args:
+            image_paths: 图像路径列表
+            batch_size: 每批推理的图像数
+            workers: 读取和预处理图像的线程数
+            ordered: True 时按 image_paths 顺序产出结果；False 时先预处理完的先组批，
+                个别大图或慢盘不会拖住后面的图像
+            progress: 进度回调 progress(已完成数, 总数, 本张结果)
+            prefetch: 同时在预处理中或已就绪的最大图像数，默认 batch_size 的 2 倍
+        
+        Yields:
+            每张图像的结果（格式同 extract_digital_ink，另含 batch_size）
+        """
+        paths = [str(p) for p in image_paths]
+        total = len(paths)
+        prefetch = max(prefetch or batch_size * 2, batch_size)
+        
+        logger.info(f"🔄 开始批处理 {total} 张图像 (batch_size={batch_size}, workers={workers})")
+        self._load_model()
+        
+        started = time.time()
+        done = succeeded = 0
+        upcoming = iter(paths)
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inksight-prefetch")
         
-        logger.info(f"✅ 批处理完成，成功: {sum(1 for r in results if r['success'])}/{len(results)}")
+        def fill():
+            while len(pending) < prefetch:
+                path = next(upcoming, None)
+                if path is None:
+                    return
+                pending.append(pool.submit(self._prepare, path))
+        
+        try:
+            fill()
+            while pending:
+                batch = []
+                while pending and len(batch) < batch_size:
+                    if ordered:
+                        future = pending.popleft()
+                    else:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        future = next(iter(finished))
+                        pending.remove(future)
+                    batch.append(future.result())
+                    fill()
+                
+                for result in self._run_prepared(batch):
+                    done += 1
+                    succeeded += result["success"]
+                    if progress:
+                        progress(done, total, result)
+                    yield result
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        
+        elapsed = time.time() - started
+        logger.info(
+            f"✅ 批处理完成，成功: {succeeded}/{total} | "
+            f"耗时: {elapsed:.1f}s | 吞吐: {total / elapsed if elapsed else 0:.2f} 张/秒"
+        )
+    
+    def _prepare(self, image_path: str) -> Dict:
+        """预取线程：查特征缓存，未命中时读取并预处理图像，失败时记录错误"""
+        item = {"path": image_path, "key": None, "inputs": None, "error": None, "started": time.time()}
+        try:
+            item["key"], cached = self.lookup(image_path)
+            if cached is not None:
+                item["prediction"] = cached
+                return item
+            item["inputs"] = self.preprocess(self.load_image(image_path))
+        except FileNotFoundError as e:
+            item["error"] = f"文件错误: {str(e)}"
+        except Exception as e:
+            item["error"] = f"处理失败: {str(e)}"
+        return item
+    
+    def _run_prepared(self, batch: List[Dict]) -> List[Dict]:
+        """对预处理成功的图像整批推理，按 batch 顺序返回结果"""
+        ready = [item for item in batch if item["inputs"] is not None]
+        error = None
+        if ready:
+            try:
+                for item, prediction in zip(ready, self.infer_preprocessed([item["inputs"] for item in ready])):
+                    item["prediction"] = prediction
+                    self.remember(item["key"], prediction)
+            except Exception as e:
+                error = f"处理失败: {str(e)}"
+                logger.error(f"❌ 批量推理失败 ({len(ready)} 张): {str(e)}")
+        finished = time.time()
+        
+        results = []
+        for item in batch:
+            result = self.new_result(item["path"])
+            if "prediction" in item:
+                result["success"] = True
+                result.update(item["prediction"])
+            else:
+                result["error"] = item["error"] or error
+                logger.error(f"❌ {result['error']}")
+            result["batch_size"] = len(ready) if item["inputs"] is not None else 0
+            result["processing_time_ms"] = round((finished - item["started"]) * 1000, 2)
+            results.append(result)
         return results
     
     def cleanup(self):
@@ -254,6 +510,18 @@ class InkSightExtractor:
         logger.info("🗑️ 模型资源已清理")
 
 
+def _stack(tensors: List[torch.Tensor]) -> torch.Tensor:
+    """按批次维拼接单张输入；图像张量尺寸不同时（未统一缩放的处理器）在右侧和下方补零到最大尺寸"""
+    if len({tuple(t.shape[1:]) for t in tensors}) > 1 and tensors[0].dim() >= 3:
+        height = max(t.shape[-2] for t in tensors)
+        width = max(t.shape[-1] for t in tensors)
+        tensors = [
+            torch.nn.functional.pad(t, (0, width - t.shape[-1], 0, height - t.shape[-2]))
+            for t in tensors
+        ]
+    return torch.cat(tensors, dim=0)
+
+
 # 全局提取器实例（延迟初始化）
 _extractor = None
 
@@ -266,6 +534,13 @@ def get_extractor(device: Optional[str] = None) -> InkSightExtractor:
     return _extractor
 
 
+def preload_model(device: Optional[str] = None) -> InkSightExtractor:
+    """预先加载全局提取器的模型权重（启动预热时调用，首个请求不再等待加载）"""
+    extractor = get_extractor(device)
+    extractor._load_model()
+    return extractor
+
+
 def extract_digital_ink(image_path: str, device: Optional[str] = None) -> Dict:
     """
     快捷函数：提取图像中的数字笔迹